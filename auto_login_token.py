@@ -11,8 +11,10 @@ import yaml
 from pathlib import Path
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from browser_waits import (
+    wait_for_page_ready, wait_for_element, wait_for_input_value,
+    wait_for_login, wait_for_cookie,
+)
 
 def auto_login():
     """Automated login with cookie banner handling via JavaScript"""
@@ -51,7 +53,7 @@ def auto_login():
 
         # Wait for page to load
         print("\n2. Waiting for page to load...")
-        time.sleep(8)  # Give Angular time to initialize
+        wait_for_page_ready(driver, timeout=20)  # Give Angular time to initialize
 
         # Remove any overlays/modals/cookie banners with JavaScript
         print("\n3. Removing cookie banners and overlays...")
@@ -82,13 +84,11 @@ def auto_login():
         """
         driver.execute_script(js_remove_overlays)
         print("✓ Removed overlays with JavaScript")
-        time.sleep(2)
 
         # Find username field using multiple strategies
         print("\n4. Finding login fields...")
-        username_field = None
 
-        # Try different selectors for Angular apps
+        # Try different selectors for Angular apps (all checked together)
         selectors = [
             "input[type='text']",
             "input[name='username']",
@@ -98,21 +98,9 @@ def auto_login():
             "//input[@type='text']",
         ]
 
-        for selector in selectors:
-            try:
-                if selector.startswith('//'):
-                    username_field = WebDriverWait(driver, 3).until(
-                        EC.presence_of_element_located((By.XPATH, selector))
-                    )
-                else:
-                    username_field = WebDriverWait(driver, 3).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                if username_field:
-                    print(f"✓ Found username field with: {selector}")
-                    break
-            except:
-                continue
+        username_field, selector = wait_for_element(driver, selectors, timeout=18)
+        if username_field:
+            print(f"✓ Found username field with: {selector}")
 
         if not username_field:
             print("✗ Could not find username field!")
@@ -122,20 +110,18 @@ def auto_login():
             # Enter username
             print("\n5. Entering credentials...")
             username_field.click()
-            time.sleep(0.5)
             username_field.clear()
             username_field.send_keys(username)
+            wait_for_input_value(driver, username_field, username)
             print(f"✓ Entered username: {username}")
-            time.sleep(1)
 
             # Find password field
             password_field = driver.find_element(By.CSS_SELECTOR, "input[type='password']")
             password_field.click()
-            time.sleep(0.5)
             password_field.clear()
             password_field.send_keys(password)
+            wait_for_input_value(driver, password_field, password)
             print(f"✓ Entered password")
-            time.sleep(1)
 
             # Submit form - try Enter key first (more reliable than finding button)
             print("\n6. Submitting login form...")
@@ -148,30 +134,13 @@ def auto_login():
             print("⚠️  Waiting up to 2 minutes...")
 
             # Wait for URL to change or token to appear
-            start_time = time.time()
-            logged_in = False
+            signal, value = wait_for_login(driver, timeout=120, host=None)  # 2 minutes
+            logged_in = signal is not None
 
-            while time.time() - start_time < 120:  # 2 minutes
-                current_url = driver.current_url
-
-                # Check if URL changed (logged in)
-                if 'login' not in current_url.lower():
-                    print(f"✓ Login successful - URL changed to: {current_url[:50]}...")
-                    logged_in = True
-                    break
-
-                # Check for token in cookies
-                cookies = driver.get_cookies()
-                for cookie in cookies:
-                    if cookie['name'] == 'webToken':
-                        print("✓ Found webToken in cookies!")
-                        logged_in = True
-                        break
-
-                if logged_in:
-                    break
-
-                time.sleep(2)
+            if signal == 'url':
+                print(f"✓ Login successful - URL changed to: {value[:50]}...")
+            elif signal == 'cookie':
+                print("✓ Found webToken in cookies!")
 
             if not logged_in:
                 print("⚠️  Login didn't complete automatically")
@@ -180,15 +149,7 @@ def auto_login():
 
         # Extract token
         print("\n8. Extracting token from cookies...")
-        time.sleep(3)  # Give it time to set all cookies
-
-        cookies = driver.get_cookies()
-        web_token = None
-
-        for cookie in cookies:
-            if cookie['name'] == 'webToken':
-                web_token = cookie['value']
-                break
+        web_token = wait_for_cookie(driver, 'webToken', timeout=3)  # Give it time to set all cookies
 
         if not web_token:
             print("✗ Could not find webToken cookie!")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Login latency benchmark: fixed sleeps vs condition-based waits
+
+Runs the browser login for a configured student several times with the old
+fixed-sleep schedule ("legacy") and with the browser_waits toolkit
+("conditions"), and prints the time spent in each phase.
+
+Browsers come from a warm ChromeDriverPool, so Chrome startup is excluded
+and both strategies are measured on the same footing.
+
+Usage:
+    python benchmark_login.py
+    python benchmark_login.py --runs 5 --student 1 --gui
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import yaml
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+from chrome_pool import ChromeDriverPool
+from browser_waits import (
+    wait_for_page_ready, wait_for_element, wait_for_input_value,
+    wait_for_login, wait_for_cookie,
+)
+
+LOGIN_URL = "https://webtop.smartschool.co.il/account/login"
+USERNAME_SELECTORS = ["input[type='text']", "input[name='username']"]
+PHASES = ['page_ready', 'form_filled', 'logged_in', 'token', 'total']
+
+
+class LegacyWaits:
+    """The fixed sleeps the login scripts used before browser_waits"""
+
+    name = 'legacy'
+
+    def page_ready(self, driver):
+        time.sleep(10)
+
+    def username_field(self, driver):
+        element, _ = wait_for_element(driver, USERNAME_SELECTORS, timeout=20)
+        return element
+
+    def typed(self, driver, element, value):
+        time.sleep(0.5)  # after click
+        time.sleep(1)    # after send_keys
+
+    def login(self, driver, timeout):
+        time.sleep(5)  # captcha check delay
+        start = time.time()
+        while time.time() - start < timeout:
+            if 'login' not in driver.current_url.lower() or driver.get_cookie('webToken'):
+                return True
+            time.sleep(2)
+        return False
+
+    def token(self, driver):
+        time.sleep(3)
+        cookie = driver.get_cookie('webToken')
+        return cookie['value'] if cookie else None
+
+
+class ConditionWaits:
+    """Waits from the browser_waits toolkit"""
+
+    name = 'conditions'
+
+    def page_ready(self, driver):
+        wait_for_page_ready(driver, timeout=20)
+
+    def username_field(self, driver):
+        element, _ = wait_for_element(driver, USERNAME_SELECTORS, timeout=20)
+        return element
+
+    def typed(self, driver, element, value):
+        wait_for_input_value(driver, element, value)
+
+    def login(self, driver, timeout):
+        signal, _ = wait_for_login(driver, timeout=timeout, host=None)
+        return signal is not None
+
+    def token(self, driver):
+        return wait_for_cookie(driver, 'webToken', timeout=3)
+
+
+def run_login(driver, strategy, username, password, timeout=60):
+    """Run one login and return the elapsed seconds per phase"""
+    timings = {}
+    start = time.perf_counter()
+    mark = start
+
+    def lap(phase):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[phase] = now - mark
+        mark = now
+
+    driver.get(LOGIN_URL)
+    strategy.page_ready(driver)
+    lap('page_ready')
+
+    username_field = strategy.username_field(driver)
+    if not username_field:
+        raise RuntimeError("username field not found")
+    username_field.click()
+    username_field.send_keys(username)
+    strategy.typed(driver, username_field, username)
+
+    password_field = driver.find_element(By.CSS_SELECTOR, "input[type='password']")
+    password_field.click()
+    password_field.send_keys(password)
+    strategy.typed(driver, password_field, password)
+    lap('form_filled')
+
+    password_field.send_keys(Keys.RETURN)
+    if not strategy.login(driver, timeout):
+        raise RuntimeError("login did not complete (captcha?)")
+    lap('logged_in')
+
+    if not strategy.token(driver):
+        raise RuntimeError("webToken cookie not found")
+    lap('token')
+
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark browser login latency")
+    parser.add_argument('--runs', type=int, default=3, help="logins per strategy")
+    parser.add_argument('--student', type=int, default=0, help="index of the student in config.yaml")
+    parser.add_argument('--gui', action='store_true', help="show the browser window")
+    parser.add_argument('--strategy', choices=['legacy', 'conditions', 'both'], default='both')
+    args = parser.parse_args()
+
+    with open(Path("config/config.yaml"), 'r', encoding='utf-8') as f:
+        student = yaml.safe_load(f)['students'][args.student]
+
+    strategies = [LegacyWaits(), ConditionWaits()]
+    if args.strategy != 'both':
+        strategies = [s for s in strategies if s.name == args.strategy]
+
+    pool = ChromeDriverPool(size=1, headless=not args.gui)
+    pool.warm()
+
+    results = {}
+    try:
+        for strategy in strategies:
+            results[strategy.name] = []
+            for run in range(1, args.runs + 1):
+                with pool.acquire() as driver:
+                    try:
+                        timings = run_login(driver, strategy, student['username'], student['password'])
+                    except Exception as e:
+                        print(f"{strategy.name} run {run}: failed - {e}")
+                        continue
+                results[strategy.name].append(timings)
+                print(f"{strategy.name} run {run}: {timings['total']:.2f}s")
+    finally:
+        pool.close()
+
+    print()
+    print(f"{'strategy':<12}" + "".join(f"{phase:>13}" for phase in PHASES))
+    for name, runs in results.items():
+        if not runs:
+            print(f"{name:<12} no successful runs")
+            continue
+        medians = [statistics.median(r[phase] for r in runs) for phase in PHASES]
+        print(f"{name:<12}" + "".join(f"{m:>12.2f}s" for m in medians))
+
+    if all(results.get(name) for name in ('legacy', 'conditions')):
+        before = statistics.median(r['total'] for r in results['legacy'])
+        after = statistics.median(r['total'] for r in results['conditions'])
+        print(f"\nMedian login: {before:.2f}s -> {after:.2f}s ({before - after:.2f}s saved)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the page parsers
+
+text:  Builds realistic pupil-card text (the inner text Playwright reads from
+       the homework page: day headers, lesson cards with subject, lesson
+       number, teacher, homework and the UI noise around them) and times the
+       original line parser ("legacy") against homework_text_parser.
+login: Wraps page_source.html into a mobile default.aspx page and times the
+       original platform/captchaWrapper regexes against login_page_scanner.
+
+Both implementations must return the same results.
+
+Usage:
+    python benchmark_parsers.py
+    python benchmark_parsers.py --weeks 4 --repeat 50
+    python benchmark_parsers.py --only login
+"""
+
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+
+from homework_text_parser import SUBJECTS, parse_homework_text
+from login_page_scanner import scan_login_page
+
+TEACHERS = ['רונית כהן', 'דנה לוי', "ג'ני מזרחי", 'אבי פרץ', 'מיכל ביטון',
+            'יוסי אברהם', 'שירה פרידמן', 'נועה אזולאי']
+HOMEWORK = ['עמוד 45 תרגילים 1-6', 'לקרוא את הפרק השלישי ולסכם',
+            'דף עבודה שחולק בכיתה', 'להביא מחברת משבצות', 'לא הוזן',
+            'תרגול 12 סעיפים א-ד, להגיש ביום ראשון']
+DAYS = ['ראשון', 'שני', 'שלישי', 'רביעי', 'חמישי', 'שישי']
+NOISE = ['הצג הכל', 'נושא השיעור', 'לא הוזן', 'חומרי למידה', 'הערות', 'נוכחות: נוכח']
+
+
+def build_pupil_card_text(weeks=1, lessons_per_day=7, seed=1):
+    """Synthetic inner text of the pupil card for the given number of weeks"""
+    rng = random.Random(seed)
+    lines = ['WEBTOP', 'מערכת שעות ושיעורי בית', 'שבוע קודם', 'שבוע הבא']
+
+    for week in range(weeks):
+        for day_index, day in enumerate(DAYS):
+            lines.append(f"יום {day} {day_index + 1 + week * 7}.10")
+            for lesson in range(1, lessons_per_day + 1):
+                lines.append(f"  {rng.choice(SUBJECTS)}{rng.choice(['', ' - ז1', ' מקבצה'])}")
+                lines.append(f"שיעור {lesson}")
+                lines.append(rng.choice(TEACHERS))
+                lines.append(rng.choice(NOISE))
+                lines.append(f"שיעורי בית: {rng.choice(HOMEWORK)}")
+                lines.append('')
+
+    lines += ['מדיניות הפרטיות', 'הצהרת נגישות', '© כל הזכויות שמורות לחברת סמארט סקול בע"מ']
+    return '\n'.join(lines)
+
+
+def legacy_parse(text, date):
+    """parse_homework_from_text as it was before homework_text_parser"""
+    homework_items = []
+    lines = text.split('\n')
+
+    current_subject = None
+    current_teacher = None
+    in_homework = False
+    homework_text = ""
+
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+
+        subjects = ['מתמטיקה', 'חשבון', 'גיאומטריה', 'עברית', 'שפה', 'אנגלית',
+                   'מדע', 'מדעים', 'היסטוריה', 'גאוגרפיה', 'תנ"ך', 'ספרות',
+                   'מדע וטכנולוגיה', 'חינוך גופני', 'אמנות', 'מוזיקה']
+
+        for subj in subjects:
+            if line.startswith(subj) or line == subj:
+                current_subject = line
+                break
+
+        if re.match(r'שיעור \d+', line):
+            pass
+
+        if re.match(r'^[א-ת]+(\')?[א-ת]* [א-ת]+$', line):
+            current_teacher = line
+
+        if 'שיעורי בית:' in line or 'שיעורי בית' in line:
+            in_homework = True
+            if ':' in line:
+                hw = line.split(':', 1)[1].strip()
+                if hw and hw != 'לא הוזן':
+                    homework_text = hw
+
+        if homework_text and current_subject:
+            homework_items.append({
+                'date': date,
+                'subject': current_subject,
+                'teacher': current_teacher or 'Unknown',
+                'homework': homework_text,
+                'description': ''
+            })
+            homework_text = ""
+            in_homework = False
+
+        i += 1
+
+    return homework_items
+
+
+def build_mobile_login_page(filler_path=Path("page_source.html")):
+    """page_source.html with the mobile login's platform input and captchaWrapper"""
+    filler = filler_path.read_text(encoding='utf-8')
+    middle = len(filler) // 2
+    return (
+        '<html><body><form id="loginForm">'
+        '<input type="hidden" id="platform" value="mobile"/>'
+        + filler[:middle]
+        + '<div class="captcha" id="captchaWrapper"><span>אבטחה</span>'
+          '<input type="hidden" id="sec_5f2a" value="Q2FwdGNoYVRva2Vu=="/></div>'
+        + filler[middle:]
+        + '</form></body></html>'
+    )
+
+
+def legacy_extract_platform(html):
+    """_extract_platform as it was before login_page_scanner"""
+    match = re.search(r'<input[^>]*id=["\']platform["\'][^>]*value=["\']([^"\']+)["\']', html, re.IGNORECASE)
+    if match:
+        return match.group(1)
+    match = re.search(r'<input[^>]*value=["\']([^"\']+)["\'][^>]*id=["\']platform["\']', html, re.IGNORECASE)
+    if match:
+        return match.group(1)
+    return None
+
+
+def legacy_extract_security_data(html):
+    """_extract_security_data as it was before login_page_scanner"""
+    captcha_wrapper_match = re.search(
+        r'<div[^>]*id=["\']captchaWrapper["\'][^>]*>(.*?)</div>',
+        html,
+        re.IGNORECASE | re.DOTALL
+    )
+    if captcha_wrapper_match:
+        wrapper_content = captcha_wrapper_match.group(1)
+        hidden_match = re.search(
+            r'<input[^>]*type=["\']hidden["\'][^>]*id=["\']([^"\']+)["\'][^>]*value=["\']([^"\']*)["\']',
+            wrapper_content,
+            re.IGNORECASE
+        )
+        if hidden_match:
+            return hidden_match.group(1), hidden_match.group(2)
+        hidden_match = re.search(
+            r'<input[^>]*id=["\']([^"\']+)["\'][^>]*value=["\']([^"\']*)["\']',
+            wrapper_content,
+            re.IGNORECASE
+        )
+        if hidden_match:
+            return hidden_match.group(1), hidden_match.group(2)
+    return None, None
+
+
+def legacy_scan(html):
+    return legacy_extract_platform(html), legacy_extract_security_data(html)
+
+
+def scanner_scan(html):
+    page = scan_login_page(html)
+    return page.platform, page.security
+
+
+def measure(func, *args, repeat=30):
+    """Best per-call time of `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(rows):
+    """Print timings of (name, seconds) rows and the speedup of the last over the first"""
+    for name, seconds in rows:
+        print(f"{name:<10}{seconds * 1000:>10.3f} ms")
+    print(f"Speedup: {rows[0][1] / rows[-1][1]:.1f}x")
+
+
+def benchmark_text(args):
+    text = build_pupil_card_text(weeks=args.weeks)
+    expected = legacy_parse(text, '2026-01-01')
+    actual = parse_homework_text(text, '2026-01-01')
+    if actual != expected:
+        raise SystemExit(f"Parsers disagree: legacy found {len(expected)} items, new parser {len(actual)}")
+
+    print(f"Page text: {len(text) / 1024:.1f} KB, {text.count(chr(10)) + 1} lines, {len(actual)} homework items")
+    report([
+        ('legacy', measure(legacy_parse, text, '2026-01-01', repeat=args.repeat)),
+        ('compiled', measure(parse_homework_text, text, '2026-01-01', repeat=args.repeat)),
+    ])
+
+
+def benchmark_login(args):
+    for label, html in (('login page', build_mobile_login_page()),
+                        ('page_source.html', Path("page_source.html").read_text(encoding='utf-8'))):
+        expected = legacy_scan(html)
+        if scanner_scan(html) != expected:
+            raise SystemExit(f"Login page scanners disagree on {label}: {scanner_scan(html)} != {expected}")
+
+        print(f"{label}: {len(html) / 1024:.1f} KB, platform={expected[0]}, security field={expected[1][0]}")
+        report([
+            ('legacy', measure(legacy_scan, html, repeat=args.repeat)),
+            ('scanner', measure(scanner_scan, html, repeat=args.repeat)),
+        ])
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the page parsers")
+    parser.add_argument('--weeks', type=int, default=1, help="weeks of lessons in the page text")
+    parser.add_argument('--repeat', type=int, default=30, help="timed runs per parser")
+    parser.add_argument('--only', choices=['text', 'login'], help="run a single benchmark")
+    args = parser.parse_args()
+
+    if args.only in (None, 'text'):
+        benchmark_text(args)
+        print()
+    if args.only in (None, 'login'):
+        benchmark_login(args)
+
+
+if __name__ == "__main__":
+    main()
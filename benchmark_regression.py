@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Parser and extractor regression benchmark
+
+Runs the monitor's parsing hot paths over a fixed corpus and compares the
+results with a stored baseline:
+
+    extract_homework_items     synthetic GetPupilLessonsAndHomework payloads
+                               (1, 4 and 16 weeks) plus any recorded payloads
+                               in benchmark_corpus/*.json
+    hash_homework              every item of the 4-week payload, one by one
+                               and as a batch (HomeworkBatch.hashes)
+    parse_homework_from_text   synthetic pupil card text (1 and 4 weeks)
+    _extract_security_data     page_source.html and the mobile login page
+
+For every case it records ops/sec and the peak memory allocated by one call
+(tracemalloc). Ops/sec is normalized by a fixed calibration loop so a
+baseline recorded on one machine is usable on another.
+
+Recorded payloads are checked for correctness first: the extraction must
+match benchmark_corpus/<name>.expected.json (the days covered and every
+row), or the run fails before timing anything.
+
+To add a recorded payload, save a GetPupilLessonsAndHomework response (or
+its "data" array), with names anonymized, as benchmark_corpus/<name>.json.
+--update-baseline writes its <name>.expected.json if there is none yet;
+check that file by hand, existing ones are never overwritten.
+
+Usage:
+    python benchmark_regression.py                     # compare with baseline
+    python benchmark_regression.py --update-baseline   # record a new baseline
+    python benchmark_regression.py --threshold 0.15    # fail on >15% regression
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+from loguru import logger
+
+import smartschool_monitor
+import smartschool_monitor_v2
+from benchmark_parsers import TEACHERS, HOMEWORK, build_pupil_card_text, build_mobile_login_page
+from homework_text_parser import SUBJECTS
+
+CORPUS_DIR = Path("benchmark_corpus")
+BASELINE_FILE = CORPUS_DIR / "baseline.json"
+EXPECTED_SUFFIX = ".expected.json"
+DEFAULT_THRESHOLD = 0.25
+# Each case runs in batches of about BATCH_SECONDS; the fastest batch counts
+BATCH_SECONDS = 0.05
+BATCHES = 9
+# Peak memory growth below this is noise, whatever the percentage
+MEMORY_SLACK_BYTES = 4096
+
+# The parsers log every call, which would dominate the timings
+logger.disable("smartschool_monitor")
+logger.disable("smartschool_monitor_v2")
+
+
+def build_pupil_lessons_payload(weeks=1, hours_per_day=8, seed=7):
+    """Synthetic GetPupilLessonsAndHomework "data" array"""
+    rng = random.Random(seed)
+    start = date(2026, 9, 6)
+    days = []
+
+    for day_index in range(weeks * 7):
+        day = start + timedelta(days=day_index)
+        if day.weekday() == 5:  # no school on Saturday
+            continue
+
+        hours = []
+        for hour in range(1, hours_per_day + 1):
+            slots = []
+            for _ in range(rng.choice([1, 1, 1, 2])):
+                has_homework = rng.random() < 0.35
+                slots.append({
+                    'hourNum': hour,
+                    'subject_name': rng.choice(SUBJECTS),
+                    'teacher': rng.choice(TEACHERS),
+                    'homeWork': f" {rng.choice(HOMEWORK)} " if has_homework else rng.choice([None, '', ' ']),
+                    'descClass': rng.choice([None, '', 'נושא: חזרה למבחן', 'פרק ב']),
+                    'absence': None,
+                    'events': [],
+                })
+            hours.append({'hour': hour, 'scheduale': slots})
+
+        days.append({'date': f"{day.isoformat()}T00:00:00", 'dayIndex': day.isoweekday() % 7 + 1, 'hoursData': hours})
+
+    return days
+
+
+def load_recorded_payloads():
+    """Recorded payloads dropped into the corpus directory"""
+    payloads = {}
+    for path in sorted(CORPUS_DIR.glob("*.json")):
+        if path == BASELINE_FILE or path.name.endswith(EXPECTED_SUFFIX):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        payloads[path.stem] = data.get('data', data) if isinstance(data, dict) else data
+    return payloads
+
+
+def extraction_of(payload):
+    """What the expected files record: the days covered and the rows"""
+    v2 = smartschool_monitor_v2.SmartSchoolMonitor.__new__(smartschool_monitor_v2.SmartSchoolMonitor)
+    batch = v2.extract_homework_items(payload)
+    return {'days': batch.days, 'rows': batch.rows()}
+
+
+def check_recorded_extractions(write_missing=False):
+    """Compare the extraction of every recorded payload with its expected file, returns the mismatches"""
+    mismatches = []
+    for name, payload in load_recorded_payloads().items():
+        path = CORPUS_DIR / f"{name}{EXPECTED_SUFFIX}"
+        actual = extraction_of(payload)
+        if not path.exists():
+            if write_missing:
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(actual, f, ensure_ascii=False, indent=1)
+                print(f"Expected extraction of {name} written to {path}, check it by hand")
+            else:
+                print(f"No expected extraction for {name} ({path})")
+            continue
+
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+        if actual != expected:
+            mismatches.append(name)
+            print(f"Extraction of {name} differs from {path}:")
+            if actual['days'] != expected['days']:
+                print(f"   days: {actual['days']} != {expected['days']}")
+            for index in range(max(len(actual['rows']), len(expected['rows']))):
+                got = actual['rows'][index] if index < len(actual['rows']) else None
+                want = expected['rows'][index] if index < len(expected['rows']) else None
+                if got != want:
+                    print(f"   row {index}: {got} != {want}")
+    return mismatches
+
+
+def build_cases():
+    """(name, function, argument) for every benchmark case"""
+    v2 = smartschool_monitor_v2.SmartSchoolMonitor.__new__(smartschool_monitor_v2.SmartSchoolMonitor)
+    v1 = smartschool_monitor.SmartSchoolMonitor.__new__(smartschool_monitor.SmartSchoolMonitor)
+
+    cases = []
+    for weeks in (1, 4, 16):
+        cases.append((f"extract_homework_items/synthetic_{weeks}w", v2.extract_homework_items,
+                      build_pupil_lessons_payload(weeks)))
+    for name, payload in load_recorded_payloads().items():
+        cases.append((f"extract_homework_items/recorded_{name}", v2.extract_homework_items, payload))
+
+    batch = v2.extract_homework_items(build_pupil_lessons_payload(4))
+    rows = batch.rows()
+    cases.append(("hash_homework/items_4w", lambda items: [v2.hash_homework(item) for item in items], rows))
+    cases.append(("hash_homework/batch_4w", lambda items: items.hashes(), batch))
+
+    for weeks in (1, 4):
+        cases.append((f"parse_homework_from_text/pupil_card_{weeks}w", v2.parse_homework_from_text,
+                      build_pupil_card_text(weeks=weeks)))
+
+    cases.append(("_extract_security_data/page_source", v1._extract_security_data,
+                  Path("page_source.html").read_text(encoding='utf-8')))
+    cases.append(("_extract_security_data/mobile_login", v1._extract_security_data, build_mobile_login_page()))
+
+    return cases
+
+
+def calibration_workload():
+    """Fixed pure-Python workload the case timings are normalized by"""
+    total = 0
+    for i in range(100000):
+        total += i * i % 7
+    return total
+
+
+def run_case(function, argument):
+    """
+    ops/sec, calibration seconds and peak bytes allocated by one call
+
+    Batches of the case alternate with runs of the calibration workload and
+    the fastest of each is kept, so both are measured under the same load.
+    """
+    # Warm up and size the batches
+    start = time.perf_counter()
+    function(argument)
+    single = max(time.perf_counter() - start, 1e-6)
+    calls = max(1, int(BATCH_SECONDS / single))
+
+    # (garbage collection is paused while timing, like timeit does)
+    best = calibration = float('inf')
+    gc.disable()
+    try:
+        for _ in range(BATCHES):
+            start = time.perf_counter()
+            calibration_workload()
+            calibration = min(calibration, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(calls):
+                function(argument)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    function(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return calls / best, calibration, peak
+
+
+def compare(results, baseline, threshold):
+    """Print the result table, return the names of regressed cases"""
+    regressions = []
+
+    print(f"{'case':<48}{'ops/s':>10}{'score':>10}{'peak KB':>10}{'vs base':>10}  status")
+    for name, result in results.items():
+        base = baseline.get(name)
+        status = 'new'
+        change = ''
+
+        if base:
+            speed = result['score'] / base['score'] - 1
+            memory = (result['peak_bytes'] - base['peak_bytes']) / max(base['peak_bytes'], 1)
+            change = f"{speed:+.0%}"
+            status = 'ok'
+            if speed < -threshold:
+                status = 'SLOWER'
+            if memory > threshold and result['peak_bytes'] - base['peak_bytes'] > MEMORY_SLACK_BYTES:
+                status = 'SLOWER+MEM' if status == 'SLOWER' else 'MEMORY'
+            if status != 'ok':
+                regressions.append(name)
+
+        print(f"{name:<48}{result['ops_per_sec']:>10.1f}{result['score']:>10.3f}"
+              f"{result['peak_bytes'] / 1024:>10.1f}{change:>10}  {status}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser and extractor regression benchmark")
+    parser.add_argument('--update-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed regression as a fraction (default: 0.25)")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE, help="baseline file")
+    parser.add_argument('--rounds', type=int, default=3, help="runs over the corpus, the best score counts")
+    args = parser.parse_args()
+
+    mismatches = check_recorded_extractions(write_missing=args.update_baseline)
+    if mismatches:
+        print(f"\n{len(mismatches)} recorded payload(s) extracted wrongly: {', '.join(mismatches)}")
+        sys.exit(1)
+
+    results = {}
+    calibrations = []
+    cases = build_cases()
+    for _ in range(max(1, args.rounds)):
+        for name, function, argument in cases:
+            ops_per_sec, calibration, peak = run_case(function, argument)
+            calibrations.append(calibration)
+            # Machine-independent speed: calls per calibration run
+            score = round(ops_per_sec * calibration, 4)
+
+            if name not in results or score > results[name]['score']:
+                results[name] = {
+                    'ops_per_sec': round(ops_per_sec, 2),
+                    'score': score,
+                    'peak_bytes': peak,
+                }
+
+    calibration = min(calibrations)
+    print(f"Calibration: {calibration * 1000:.1f} ms\n")
+
+    baseline = {}
+    if args.baseline.exists() and not args.update_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('cases', {})
+
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(exist_ok=True, parents=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': sys.version.split()[0],
+                'calibration_seconds': round(calibration, 5),
+                'cases': results,
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}, run with --update-baseline first")
+        return
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark the homework state backends at realistic and large sizes
+
+Builds a state of --students students with --weeks weeks of synthetic
+homework each (the defaults give 10k+ tracked items) and times, for every
+backend in state_store.BACKENDS:
+
+    save all      first save of the whole state
+    load          loading it back with a fresh store
+    check         saving after one student's check changed a few items
+    no-op check   saving after a check that changed nothing
+
+--format binary writes the json backend's files and the journal snapshot as
+binary snapshots (STATE_SNAPSHOT_FORMAT).
+
+Usage:
+    python benchmark_state.py
+    python benchmark_state.py --students 40 --weeks 52 --repeat 20
+    python benchmark_state.py --format binary --backend json --backend journal
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from benchmark_regression import build_pupil_lessons_payload
+from homework_columns import HomeworkBatch
+from homework_model import HomeworkItem, TrackedHomework
+from state_codec import FORMATS
+from state_store import BACKENDS, open_state_store
+
+logger.disable("state_store")
+logger.disable("state_sqlite")
+logger.disable("state_journal")
+
+
+def build_state(students, weeks):
+    """{student: {key: TrackedHomework}} with synthetic homework"""
+    state = {}
+    for index in range(students):
+        batch = HomeworkBatch.from_payload(build_pupil_lessons_payload(weeks, seed=index))
+        state[f"Student {index}"] = {
+            item.key: TrackedHomework(item, f"2026-09-06T12:{index % 60:02d}:00") for item in batch.items()
+        }
+    return state
+
+
+def simulate_check(state, student, rng, changes=3):
+    """Edit, add and remove a few items of one student, like a check would"""
+    entries = state[student]
+    for _ in range(changes):
+        key = rng.choice(list(entries))
+        old = entries.pop(key).item
+        item = HomeworkItem(old.date, old.subject, old.teacher, f"{old.homework} ({rng.random():.6f})",
+                            old.description, old.lesson)
+        entries[item.key] = TrackedHomework(item, "2026-10-18T16:00:00")
+
+
+def directory_size(path):
+    return sum(file.stat().st_size for file in Path(path).rglob('*') if file.is_file())
+
+
+def benchmark_backend(backend, state, repeat):
+    rng = random.Random(1)
+    student = next(iter(state))
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = Path(directory) / "homework_state.json"
+
+        store = open_state_store(json_path, backend=backend)
+        store.load()
+        start = time.perf_counter()
+        store.save(state)
+        results['save all'] = time.perf_counter() - start
+        store.close()
+
+        start = time.perf_counter()
+        store = open_state_store(json_path, backend=backend)
+        loaded = store.load()
+        results['load'] = time.perf_counter() - start
+        if loaded != state:
+            raise SystemExit(f"{backend}: loaded state differs from the saved one")
+
+        best = float('inf')
+        for _ in range(repeat):
+            simulate_check(state, student, rng)
+            start = time.perf_counter()
+            store.save(state, [student])
+            best = min(best, time.perf_counter() - start)
+        results['check'] = best
+
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            store.save(state, [student])
+            best = min(best, time.perf_counter() - start)
+        results['no-op check'] = best
+
+        store.close()
+        results['size'] = directory_size(directory)
+
+        # The state on disk must match after all the incremental saves
+        store = open_state_store(json_path, backend=backend)
+        if store.load() != state:
+            raise SystemExit(f"{backend}: state on disk differs after incremental saves")
+        store.close()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the homework state backends")
+    parser.add_argument('--students', type=int, default=10, help="number of students")
+    parser.add_argument('--weeks', type=int, default=52, help="weeks of homework per student")
+    parser.add_argument('--repeat', type=int, default=10, help="timed incremental saves per backend")
+    parser.add_argument('--backend', choices=BACKENDS, action='append', help="only these backends")
+    parser.add_argument('--format', choices=FORMATS, default='json', help="snapshot format (default: json)")
+    args = parser.parse_args()
+
+    state = build_state(args.students, args.weeks)
+    items = sum(len(entries) for entries in state.values())
+    print(f"State: {len(state)} students, {items} tracked items\n")
+
+    os.environ.pop('STATE_BACKEND', None)
+    os.environ['STATE_SNAPSHOT_FORMAT'] = args.format
+    print(f"{'backend':<10}{'save all':>12}{'load':>12}{'check':>12}{'no-op check':>14}{'size KB':>12}")
+    for backend in args.backend or BACKENDS:
+        results = benchmark_backend(backend, {k: dict(v) for k, v in state.items()}, args.repeat)
+        print(f"{backend:<10}"
+              f"{results['save all'] * 1000:>10.1f}ms{results['load'] * 1000:>10.1f}ms"
+              f"{results['check'] * 1000:>10.2f}ms{results['no-op check'] * 1000:>12.3f}ms"
+              f"{results['size'] / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Crash-safe file writes
+
+write_durable() never modifies a file in place:
+
+1. The new content goes to <file>.tmp and is fsynced.
+2. Its SHA-256 goes to <file>.sha256.tmp and is fsynced.
+3. The current file and its checksum become <file>.prev and
+   <file>.prev.sha256 (the last good generation).
+4. Both temp files are renamed into place and the directory is fsynced.
+
+A crash at any point leaves either the old or the new generation complete
+and verifiable. read_durable() checks the file against the stored checksums
+and falls back to the previous generation when it is missing or damaged.
+
+Files other programs write as well (token_cache.json is written by the
+token helper scripts) have no matching checksum after such a write. Their
+readers pass allow_external=True, which accepts such a file when it parses
+and is newer than the checksum file. Everything else only trusts verified
+content, so damage that also touched the modification time still falls
+back to the previous generation. A file without any checksum was written
+before these helpers existed and is read as it is; the first write_durable()
+gives it a checksum as it becomes the previous generation, so it can be
+recovered (a previous generation without a checksum file is read as it is
+too).
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+from loguru import logger
+
+TEMP_SUFFIX = '.tmp'
+CHECKSUM_SUFFIX = '.sha256'
+PREVIOUS_SUFFIX = '.prev'
+
+
+class CorruptFileError(Exception):
+    """No generation of a file could be read"""
+
+
+def _sibling(path, suffix):
+    return path.with_name(path.name + suffix)
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # not supported on this platform
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_synced(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def checksum(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def atomic_write(path, data):
+    """Replace path with data (temp file + fsync + rename), without generations"""
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    path.parent.mkdir(exist_ok=True, parents=True)
+    temp_path = _sibling(path, TEMP_SUFFIX)
+    _write_synced(temp_path, data)
+    os.replace(temp_path, path)
+    _fsync_directory(path.parent)
+
+
+def write_durable(path, data):
+    """Replace path with data, keeping the previous generation and checksums of both"""
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    path.parent.mkdir(exist_ok=True, parents=True)
+
+    temp_path = _sibling(path, TEMP_SUFFIX)
+    checksum_path = _sibling(path, CHECKSUM_SUFFIX)
+    temp_checksum_path = _sibling(checksum_path, TEMP_SUFFIX)
+    previous_path = _sibling(path, PREVIOUS_SUFFIX)
+    previous_checksum_path = _sibling(previous_path, CHECKSUM_SUFFIX)
+
+    _write_synced(temp_path, data)
+    _write_synced(temp_checksum_path, checksum(data).encode('ascii'))
+
+    if path.exists():
+        if checksum_path.exists():
+            os.replace(path, previous_path)
+            os.replace(checksum_path, previous_checksum_path)
+        else:
+            # Written before checksums existed: checksum it as it becomes the previous generation
+            temp_previous_checksum_path = _sibling(previous_checksum_path, TEMP_SUFFIX)
+            _write_synced(temp_previous_checksum_path, checksum(path.read_bytes()).encode('ascii'))
+            os.replace(path, previous_path)
+            os.replace(temp_previous_checksum_path, previous_checksum_path)
+
+    os.replace(temp_path, path)
+    os.replace(temp_checksum_path, checksum_path)
+    _fsync_directory(path.parent)
+
+
+def durable_remove(path):
+    """Delete every generation of path"""
+    path = Path(path)
+    previous_path = _sibling(path, PREVIOUS_SUFFIX)
+    for candidate in (path, previous_path, _sibling(path, CHECKSUM_SUFFIX), _sibling(path, TEMP_SUFFIX),
+                      _sibling(previous_path, CHECKSUM_SUFFIX),
+                      _sibling(_sibling(previous_path, CHECKSUM_SUFFIX), TEMP_SUFFIX)):
+        candidate.unlink(missing_ok=True)
+
+
+def durable_files(directory, pattern):
+    """Files matching pattern in directory, including ones only their previous generation is left of"""
+    directory = Path(directory)
+    names = {candidate.name for candidate in directory.glob(pattern)}
+    names.update(candidate.name[:-len(PREVIOUS_SUFFIX)] for candidate in directory.glob(pattern + PREVIOUS_SUFFIX))
+    return [directory / name for name in sorted(names)]
+
+
+def _known_checksums(path):
+    """Checksums of every generation that was completely written"""
+    checksums = set()
+    for candidate in (_sibling(path, CHECKSUM_SUFFIX),
+                      _sibling(_sibling(path, CHECKSUM_SUFFIX), TEMP_SUFFIX),
+                      _sibling(_sibling(path, PREVIOUS_SUFFIX), CHECKSUM_SUFFIX)):
+        try:
+            checksums.add(candidate.read_text(encoding='ascii').strip())
+        except (OSError, ValueError):
+            pass
+    return checksums
+
+
+def durable_exists(path):
+    """True if any generation of path exists"""
+    path = Path(path)
+    return path.exists() or _sibling(path, PREVIOUS_SUFFIX).exists()
+
+
+def read_durable(path, parse, allow_external=False):
+    """
+    parse(bytes) of the newest good generation of path
+
+    allow_external: accept an unverified path that is newer than its
+    checksum (rewritten by another program).
+
+    Raises FileNotFoundError if no generation exists and CorruptFileError if
+    none of them can be read.
+    """
+    path = Path(path)
+    previous_path = _sibling(path, PREVIOUS_SUFFIX)
+    checksums = _known_checksums(path)
+    checksum_path = _sibling(path, CHECKSUM_SUFFIX)
+    # Neither generation has a checksum file: written before checksums existed
+    unchecksummed = not checksum_path.exists()
+    previous_unchecksummed = not _sibling(previous_path, CHECKSUM_SUFFIX).exists()
+
+    found = False
+    failures = []
+    for candidate in (path, previous_path):
+        try:
+            data = candidate.read_bytes()
+        except FileNotFoundError:
+            continue
+        found = True
+
+        verified = checksum(data) in checksums
+        if not verified:
+            if candidate == path:
+                # Never written by write_durable (a file from older versions), or,
+                # for callers that allow it, rewritten by another program since
+                external = (unchecksummed and previous_unchecksummed) or allow_external and (
+                    unchecksummed or path.stat().st_mtime >= checksum_path.stat().st_mtime
+                )
+            else:
+                # A file from older versions a write moved aside before checksumming it
+                external = previous_unchecksummed
+            if not external:
+                failures.append(f"{candidate.name}: checksum mismatch")
+                continue
+
+        try:
+            value = parse(data)
+        except Exception as e:
+            failures.append(f"{candidate.name}: {e}")
+            continue
+
+        if candidate != path:
+            logger.warning(f"Recovered {path.name} from the previous generation ({'; '.join(failures)})")
+        return value
+
+    if not found:
+        raise FileNotFoundError(str(path))
+    raise CorruptFileError(f"{path}: no readable generation ({'; '.join(failures)})")
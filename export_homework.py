@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Export homework to columnar files for analytics (see homework_export)
+
+Usage:
+    python export_homework.py                       # new history records -> config/export/history/
+    python export_homework.py --source state        # tracked homework -> config/export/state/
+    python export_homework.py --format csv --output /data/homework
+
+The state is opened read-only, with the backend detected from the files in
+--config.
+"""
+
+import argparse
+from pathlib import Path
+
+from history_archive import HistoryArchive
+from homework_export import DEFAULT_BATCH_SIZE, FORMATS, export_history, export_state
+from state_store import open_state_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export homework to columnar files for analytics")
+    parser.add_argument('--source', choices=('history', 'state'), default='history',
+                        help="history archive (incremental, default) or the tracked state")
+    parser.add_argument('--output', type=Path, default=Path("config/export"), help="export directory")
+    parser.add_argument('--format', choices=FORMATS, help="parquet (default with pyarrow) or csv")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows per row group")
+    parser.add_argument('--config', type=Path, default=Path("config"), help="config directory")
+    args = parser.parse_args()
+
+    if args.source == 'history':
+        archive = HistoryArchive(args.config / "history")
+        if not archive.exists():
+            print(f"❌ No homework history found in {archive.directory}. Run the monitor first!")
+            return
+        written = export_history(archive, args.output, args.format, args.batch_size)
+    else:
+        # Read-only: never migrates or compacts, safe while the monitor runs
+        store = open_state_store(args.config / "homework_state.json", read_only=True)
+        written = export_state(store, args.output, args.format, args.batch_size)
+        store.close()
+
+    if not written:
+        print("✅ Nothing new to export")
+        return
+    for month, rows in sorted(written.items()):
+        print(f"   {month}: {rows} rows")
+    print(f"✅ Exported {sum(written.values())} rows to {args.output / args.source}")
+
+
+if __name__ == "__main__":
+    main()
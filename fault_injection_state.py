@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Fault-injection test for the persisted state
+
+Faults and checks, for every state backend:
+
+crash points   write_durable() is interrupted before each of its file
+               operations in turn; the file must read back as the old or the
+               new generation (json backend files, snapshots, token cache),
+               also when the old one predates checksums
+corruption     the current generation is truncated, has bytes flipped or is
+               rewritten, with or without a newer modification time; the
+               previous generation must be recovered (only token cache
+               readers accept a newer unverified file)
+kill -9        a child process saves a new generation of the state in a loop
+               and is SIGKILLed at a random moment; every student's state on
+               disk must be the last acknowledged save or the one in flight,
+               never older, never mixed, never missing (the json backend
+               writes one file per student, so students may differ by one
+               generation)
+cache          students are set into a full StudentStateCache the way a
+               check does (assign, then mark dirty) while the others still
+               have unflushed changes; none may be evicted before it is
+               saved (backends that load per student)
+readers        while a store is open for writing, another process opens it
+               read-only, loads and closes it between saves; every save
+               must still be there after a restart, and a second writer
+               must be refused where the backend can't share its files
+retention      a retention run drops removed students, expired items, their
+               tokens and old detections and compacts the store
+
+Usage:
+    python fault_injection_state.py
+    python fault_injection_state.py --kills 50 --backend journal
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+from loguru import logger
+
+import durable_io
+from durable_io import read_durable, write_durable, CorruptFileError
+from homework_model import HomeworkItem, TrackedHomework
+from state_retention import RetentionJob, RetentionPolicy
+from state_store import BACKENDS, StudentStateCache, open_state, open_state_store
+
+logger.remove()
+
+
+class SimulatedCrash(Exception):
+    pass
+
+
+def generation_state(generation, students=3, items=40):
+    """Deterministic state for a generation number"""
+    state = {}
+    for student in range(students):
+        entries = {}
+        for index in range(items):
+            item = HomeworkItem(f"2026-10-{index % 28 + 1:02d}T00:00:00", f"Subject {index % 7}", "Teacher",
+                                f"Homework {index} of generation {generation}", '', index % 8 + 1)
+            entries[item.key] = TrackedHomework(item, f"2026-10-18T{generation % 24:02d}:00:00")
+        state[f"Student {student}"] = entries
+    return state
+
+
+def generations_of(state):
+    """Generation each student's loaded state was saved as (None if a student's items are mixed)"""
+    result = {}
+    for student, entries in state.items():
+        generations = {int(tracked.item.homework.rsplit(' ', 1)[1]) for tracked in entries.values()}
+        result[student] = generations.pop() if len(generations) == 1 else None
+    return result
+
+
+# Crash points
+
+def check_crash_points(directory, legacy=False):
+    """Interrupt write_durable before every file operation (legacy: over a file without checksums)"""
+    path = Path(directory) / "crash.json"
+    old, new = b'{"generation": 1}', b'{"generation": 2}'
+    failures = []
+
+    point = 0
+    while True:
+        for leftover in Path(directory).glob("crash.json*"):
+            leftover.unlink()
+        if legacy:
+            path.write_bytes(old)
+        else:
+            write_durable(path, old)
+
+        calls = {'count': 0}
+        original_replace, original_write = os.replace, durable_io._write_synced
+
+        def counting(function):
+            def wrapper(*args, **kwargs):
+                if calls['count'] == point:
+                    raise SimulatedCrash()
+                calls['count'] += 1
+                return function(*args, **kwargs)
+            return wrapper
+
+        os.replace = counting(original_replace)
+        durable_io._write_synced = counting(original_write)
+        try:
+            write_durable(path, new)
+            finished = True
+        except SimulatedCrash:
+            finished = False
+        finally:
+            os.replace, durable_io._write_synced = original_replace, original_write
+
+        try:
+            value = read_durable(path, json.loads)
+        except (FileNotFoundError, CorruptFileError) as e:
+            failures.append(f"{'legacy ' if legacy else ''}crash before operation {point}: {e}")
+        else:
+            if value not in (json.loads(old), json.loads(new)):
+                failures.append(f"{'legacy ' if legacy else ''}crash before operation {point}: read {value}")
+
+        if finished:
+            break
+        point += 1
+
+    return point, failures
+
+
+# Corruption
+
+def check_corruption(directory):
+    path = Path(directory) / "corrupt.json"
+    failures = []
+
+    def two_generations():
+        for leftover in Path(directory).glob("corrupt.json*"):
+            leftover.unlink()
+        write_durable(path, b'{"generation": 1}')
+        write_durable(path, b'{"generation": 2}')
+
+    for name, damage in (('truncated', lambda data: data[:len(data) // 2]),
+                         ('bit flip', lambda data: data[:5] + bytes([data[5] ^ 0x20]) + data[6:]),
+                         ('emptied', lambda data: b''),
+                         ('rewritten', lambda data: b'{"generation": 7}')):
+        for touched in (False, True):
+            two_generations()
+
+            # Damage in place, keeping the modification time (bit rot, torn
+            # sector) or bumping it (a partial write by something else)
+            stat = path.stat()
+            path.write_bytes(damage(path.read_bytes()))
+            mtime = stat.st_mtime_ns + (10 ** 9 if touched else 0)
+            os.utime(path, ns=(stat.st_atime_ns, mtime))
+
+            label = f"{name}{' and touched' if touched else ''}"
+            try:
+                value = read_durable(path, json.loads)
+            except Exception as e:
+                failures.append(f"{label}: {e}")
+                continue
+            if value != {"generation": 1}:
+                failures.append(f"{label}: read {value}, expected the previous generation")
+
+    # Files other programs rewrite (token cache) opt in to newer unverified content
+    two_generations()
+    stat = path.stat()
+    path.write_bytes(b'{"generation": 7}')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    value = read_durable(path, json.loads, allow_external=True)
+    if value != {"generation": 7}:
+        failures.append(f"external rewrite: read {value}, expected the rewritten file")
+
+    # A file from before checksums existed is read as it is
+    for leftover in Path(directory).glob("corrupt.json*"):
+        leftover.unlink()
+    path.write_bytes(b'{"generation": 0}')
+    try:
+        value = read_durable(path, json.loads)
+    except Exception as e:
+        value = e
+    if value != {"generation": 0}:
+        failures.append(f"file without checksums: read {value}")
+
+    # Its first durable write keeps it as a recoverable previous generation
+    write_durable(path, b'{"generation": 1}')
+    stat = path.stat()
+    path.write_bytes(b'{"generation": 1')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    try:
+        value = read_durable(path, json.loads)
+    except Exception as e:
+        value = e
+    if value != {"generation": 0}:
+        failures.append(f"damaged first write over a file without checksums: read {value}")
+
+    # Even if a crash left it without its checksum file
+    Path(str(path) + ".prev.sha256").unlink(missing_ok=True)
+    try:
+        value = read_durable(path, json.loads)
+    except Exception as e:
+        value = e
+    if value != {"generation": 0}:
+        failures.append(f"previous generation without a checksum file: read {value}")
+
+    return failures
+
+
+# kill -9
+
+def child(backend, directory):
+    """Save generation after generation, acknowledging each on stdout"""
+    store = open_state_store(Path(directory) / "homework_state.json", backend=backend)
+    store.load()
+    generation = 0
+    while True:
+        generation += 1
+        store.save(generation_state(generation))
+        print(generation, flush=True)
+
+
+def check_kills(backend, kills, seed):
+    rng = random.Random(seed)
+    failures = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for kill in range(kills):
+            process = subprocess.Popen(
+                [sys.executable, __file__, '--child', backend, directory],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            )
+            # Let it get going, then kill it at a random moment
+            acknowledged = int(process.stdout.readline() or 0)
+            time.sleep(rng.uniform(0, 0.3))
+            process.send_signal(signal.SIGKILL)
+            for line in process.stdout:
+                acknowledged = int(line)
+            process.wait()
+
+            try:
+                store = open_state_store(Path(directory) / "homework_state.json", backend=backend)
+                state = store.load()
+                store.close()
+            except Exception as e:
+                failures.append(f"kill {kill}: state unreadable: {e}")
+                continue
+
+            loaded = generations_of(state)
+            # The in-flight save may or may not have made it; anything older is lost data
+            expected = set(generation_state(0))
+            if set(loaded) != expected or any(g is None or g < acknowledged for g in loaded.values()):
+                failures.append(f"kill {kill}: acknowledged generation {acknowledged}, loaded {loaded}")
+
+    return failures
+
+
+# Per-student cache
+
+def check_cache(backend, students=4, capacity=2):
+    """None if the backend loads the whole state, else the failures"""
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "homework_state.json"
+        store = open_state_store(path, backend=backend)
+        store.load()
+        state = open_state(store, capacity=capacity)
+        if not isinstance(state, StudentStateCache):
+            store.close()
+            return None
+
+        for student, entries in generation_state(1, students=students).items():
+            # Like check_homework: the new state first, then save_state marks it dirty
+            state[student] = entries
+            if student not in state.resident:
+                failures.append(f"{backend} cache: {student} was evicted right after being set")
+            store.mark_dirty([student])
+        store.flush(state, force=True)
+        state.trim()
+        if len(state.resident) != capacity:
+            failures.append(f"{backend} cache: {len(state.resident)} students resident after a flush, "
+                            f"capacity {capacity}")
+        store.close()
+
+        store = open_state_store(path, backend=backend)
+        loaded = generations_of(store.load())
+        store.close()
+        if loaded != generations_of(generation_state(1, students=students)):
+            failures.append(f"{backend} cache: loaded {loaded} after a restart")
+    return failures
+
+
+# Readers
+
+def reader(backend, directory):
+    """Open the state read-only, as view_homework.py does"""
+    store = open_state_store(Path(directory) / "homework_state.json", backend=backend, read_only=True)
+    store.load()
+    store.close()
+
+
+def check_readers(backend, saves=3):
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "homework_state.json"
+        store = open_state_store(path, backend=backend)
+        store.load()
+        for generation in range(1, saves + 1):
+            store.save(generation_state(generation))
+            subprocess.run([sys.executable, __file__, '--reader', backend, directory], check=True)
+
+        if backend == 'journal':
+            try:
+                open_state_store(path, backend=backend).load()
+                failures.append(f"{backend}: a second writer was let in")
+            except RuntimeError:
+                pass
+        store.close()
+
+        store = open_state_store(path, backend=backend)
+        loaded = generations_of(store.load())
+        store.close()
+        if loaded != {student: saves for student in generation_state(0)}:
+            failures.append(f"{backend} readers: saved generation {saves}, loaded {loaded}")
+    return failures
+
+
+# Retention
+
+def check_retention(backend):
+    """
+    A RetentionJob run on a real store, partly through a two-student cache
+    (lazy backends): removed students and expired items are gone after a
+    restart, old detection history is pruned and compaction leaves an empty
+    WAL or journal
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "homework_state.json"
+        store = open_state_store(path, backend=backend)
+        store.load()
+        cache = open_state(store, capacity=2)
+        lazy = isinstance(cache, StudentStateCache)
+
+        state = generation_state(1, students=4)
+        old = HomeworkItem("2020-01-06T00:00:00", "Subject 0", "Teacher", "Homework 0 of generation 1", '', 1)
+        state["Student 0"][old.key] = TrackedHomework(old, "2020-01-06T00:00:00")
+
+        for student, entries in state.items():
+            cache[student] = entries
+            store.mark_dirty([student])
+        store.flush(cache, force=True)
+        if lazy:
+            cache.trim()
+        if lazy and len(cache.resident) != 2:
+            failures.append(f"{backend} retention: {len(cache.resident)} students resident after a flush, capacity 2")
+
+        token_file = Path(directory) / "token_cache.json"
+        write_durable(token_file, json.dumps({f"u{index}": {} for index in range(4)}))
+
+        monitor = SimpleNamespace(
+            students=[{'name': f"Student {index}", 'username': f"u{index}"} for index in range(3)],
+            homework_state=cache, state_lock=threading.RLock(), state_store=store,
+            token_file=token_file, token_lock=threading.Lock(),
+        )
+        dropped, expired, tokens, detections = RetentionJob(monitor, RetentionPolicy(True, 90, 24)).run_once(
+            today=date(2026, 10, 19))
+        expected = (["Student 3"], 1, ["u3"], 1 if backend == 'sqlite' else 0)
+        if (dropped, expired, tokens, detections) != expected:
+            failures.append(f"{backend} retention: run returned {(dropped, expired, tokens, detections)}, "
+                            f"expected {expected}")
+
+        if backend == 'sqlite':
+            wal = Path(directory) / "homework_state.db-wal"
+            if wal.exists() and wal.stat().st_size:
+                failures.append(f"{backend} retention: {wal.stat().st_size} bytes left in the WAL after compaction")
+        if backend == 'journal' and store.journal_ops:
+            failures.append(f"{backend} retention: {store.journal_ops} journal operations left after compaction")
+        store.close()
+
+        store = open_state_store(path, backend=backend)
+        loaded = {student: len(entries) for student, entries in store.load().items()}
+        store.close()
+        if loaded != {f"Student {index}": 40 for index in range(3)}:
+            failures.append(f"{backend} retention: loaded {loaded} after a restart")
+    return failures
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+        return
+    if len(sys.argv) == 4 and sys.argv[1] == '--reader':
+        reader(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description="Fault-injection test for the persisted state")
+    parser.add_argument('--kills', type=int, default=20, help="SIGKILLs per backend")
+    parser.add_argument('--backend', choices=BACKENDS, action='append', help="only these backends")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        points, crash_failures = check_crash_points(directory)
+        print(f"crash points: {points} interruptions of write_durable, {len(crash_failures)} failures")
+        failures += crash_failures
+
+        points, crash_failures = check_crash_points(directory, legacy=True)
+        print(f"crash points: {points} interruptions of a first write over a file without checksums, "
+              f"{len(crash_failures)} failures")
+        failures += crash_failures
+
+        corruption_failures = check_corruption(directory)
+        print(f"corruption:   4 kinds of damage, {len(corruption_failures)} failures")
+        failures += corruption_failures
+
+    for backend in args.backend or BACKENDS:
+        kill_failures = check_kills(backend, args.kills, args.seed)
+        print(f"kill -9:      {backend:<8} {args.kills} kills, {len(kill_failures)} failures")
+        failures += kill_failures
+
+        cache_failures = check_cache(backend)
+        if cache_failures is not None:
+            print(f"cache:        {backend:<8} {len(cache_failures)} failures")
+            failures += cache_failures
+
+        reader_failures = check_readers(backend)
+        print(f"readers:      {backend:<8} {len(reader_failures)} failures")
+        failures += reader_failures
+
+        retention_failures = check_retention(backend)
+        print(f"retention:    {backend:<8} {len(retention_failures)} failures")
+        failures += retention_failures
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f"FAIL {failure}")
+        sys.exit(1)
+
+    print("\nNo state lost")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Condition-based waits for SmartSchool browser logins
+
+Replaces fixed time.sleep() calls with waits that return as soon as the
+page, element, URL or cookie is actually ready, and still give up after
+the same worst-case timeout.
+"""
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+# How often conditions are re-checked (seconds)
+POLL_INTERVAL = 0.2
+
+LOGIN_HOST = 'webtop.smartschool.co.il'
+
+
+def _wait(driver, timeout):
+    return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL)
+
+
+def _locator(selector):
+    """XPath for selectors starting with //, CSS otherwise"""
+    if selector.startswith('//'):
+        return (By.XPATH, selector)
+    return (By.CSS_SELECTOR, selector)
+
+
+def wait_for_page_ready(driver, timeout=20):
+    """
+    Wait until the document is loaded and Angular has no pending work
+
+    Returns True when ready, False on timeout.
+    """
+    script = """
+    if (document.readyState !== 'complete') return false;
+    if (window.getAllAngularTestabilities) {
+        return window.getAllAngularTestabilities().every(t => t.isStable());
+    }
+    return true;
+    """
+    try:
+        _wait(driver, timeout).until(lambda d: d.execute_script(script))
+        return True
+    except TimeoutException:
+        return False
+
+
+def wait_for_element(driver, selectors, timeout=20, clickable=False):
+    """
+    Wait for the first of several selectors to match
+
+    All selectors are checked on every poll, so a fallback selector doesn't
+    have to wait for the previous ones to time out.
+
+    Returns (element, selector), or (None, None) on timeout.
+    """
+    if isinstance(selectors, str):
+        selectors = [selectors]
+
+    def find_any(d):
+        for selector in selectors:
+            for element in d.find_elements(*_locator(selector)):
+                if not clickable or (element.is_displayed() and element.is_enabled()):
+                    return element, selector
+        return False
+
+    try:
+        return _wait(driver, timeout).until(find_any)
+    except TimeoutException:
+        return None, None
+
+
+def wait_for_input_value(driver, element, value, timeout=5):
+    """Wait until an input shows the text typed into it"""
+    try:
+        _wait(driver, timeout).until(lambda d: element.get_attribute('value') == value)
+        return True
+    except TimeoutException:
+        return False
+
+
+def wait_for_frame(driver, selector, timeout=20):
+    """Wait for an iframe and switch into it"""
+    try:
+        _wait(driver, timeout).until(EC.frame_to_be_available_and_switch_to_it(_locator(selector)))
+        return True
+    except TimeoutException:
+        return False
+
+
+def wait_for_url(driver, predicate, timeout=60):
+    """
+    Wait until predicate(current_url) is true
+
+    Returns the matching URL, or None on timeout.
+    """
+    def check(d):
+        url = d.current_url
+        return url if predicate(url) else False
+
+    try:
+        return _wait(driver, timeout).until(check)
+    except TimeoutException:
+        return None
+
+
+def wait_for_cookie(driver, name='webToken', timeout=10):
+    """
+    Wait until a cookie with a value is visible on the current page
+
+    Returns the cookie value, or None on timeout.
+    """
+    def check(d):
+        cookie = d.get_cookie(name)
+        if cookie and cookie.get('value'):
+            return cookie['value']
+        return False
+
+    try:
+        return _wait(driver, timeout).until(check)
+    except TimeoutException:
+        return None
+
+
+def left_login_page(url, host=LOGIN_HOST):
+    """True once the browser navigated from the login page to the app"""
+    url = url.lower()
+    return 'login' not in url and (host is None or host in url)
+
+
+def login_signal(driver, host=LOGIN_HOST, cookie_name='webToken'):
+    """
+    ('url', url) once the URL left the login page, ('cookie', token) once the
+    token cookie is set, else None - checked once, without waiting
+    """
+    url = driver.current_url
+    if left_login_page(url, host):
+        return 'url', url
+
+    cookie = driver.get_cookie(cookie_name)
+    if cookie and cookie.get('value'):
+        return 'cookie', cookie['value']
+
+    return None
+
+
+def wait_for_login(driver, timeout=90, host=LOGIN_HOST, cookie_name='webToken'):
+    """
+    Wait until login completes: the URL leaves the login page or the token
+    cookie is set, whichever happens first
+
+    Returns ('url', url) or ('cookie', token), or (None, None) on timeout.
+    """
+    def check(d):
+        return login_signal(d, host, cookie_name) or False
+
+    try:
+        return _wait(driver, timeout).until(check)
+    except TimeoutException:
+        return None, None
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Pool of warm undetected-Chrome drivers for SmartSchool logins
+
+Starting Chrome is the slowest part of a Selenium login. The pool keeps a few
+browsers running and hands them out one login at a time. Between logins the
+session is wiped (cookies, storage, extra tabs) so the next account starts
+from a clean profile, while the HTTP cache of the Angular bundles is kept warm.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+import undetected_chromedriver as uc
+from loguru import logger
+
+from network_capture import enable_performance_log
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36'
+
+# Origins whose cookies and storage hold SmartSchool session data
+SESSION_ORIGINS = [
+    "https://webtop.smartschool.co.il",
+    "https://webtopserver.smartschool.co.il",
+    "https://www.webtop.co.il",
+]
+
+
+def build_chrome_options(headless=True, extra_arguments=None):
+    """
+    Build ChromeOptions for a SmartSchool login browser
+
+    undetected-chromedriver refuses to reuse an options object, so every
+    driver gets a fresh one from here.
+    """
+    options = uc.ChromeOptions()
+
+    if headless:
+        options.add_argument('--headless=new')
+        options.add_argument('--disable-gpu')
+
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument(f'--user-agent={USER_AGENT}')
+
+    for argument in extra_arguments or []:
+        options.add_argument(argument)
+
+    # Network events are used to capture the login response
+    enable_performance_log(options)
+
+    return options
+
+
+class ChromeDriverPool:
+    """Keeps up to `size` undetected-Chrome drivers alive for reuse"""
+
+    def __init__(self, size=1, headless=True, extra_arguments=None):
+        """
+        Args:
+            size: Maximum number of browsers kept alive
+            headless: Run browsers without a window
+            extra_arguments: Additional Chrome command line arguments
+        """
+        self.size = max(1, int(size))
+        self.headless = headless
+        self.extra_arguments = list(extra_arguments or [])
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _create_driver(self):
+        """Launch a new Chrome instance"""
+        options = build_chrome_options(self.headless, self.extra_arguments)
+        driver = uc.Chrome(options=options, use_subprocess=True, version_main=None)
+        logger.info(f"Launched pooled Chrome ({self._created}/{self.size})")
+        return driver
+
+    def warm(self, count=None):
+        """Launch browsers up front so the first logins don't pay startup"""
+        count = self.size if count is None else min(count, self.size)
+        drivers = [self.checkout() for _ in range(count)]
+        for driver in drivers:
+            self.checkin(driver)
+
+    def checkout(self, timeout=None):
+        """
+        Take a driver from the pool, launching one if the pool isn't full
+
+        Blocks until a driver is returned when all of them are in use.
+        """
+        if self._closed:
+            raise RuntimeError("Chrome pool is closed")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return self._create_driver()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._idle.get(timeout=timeout)
+
+    def checkin(self, driver):
+        """Wipe the session of a driver and return it to the pool"""
+        if self._closed or not self.reset_session(driver):
+            self._discard(driver)
+            return
+
+        self._idle.put(driver)
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Context manager around checkout/checkin"""
+        driver = self.checkout(timeout=timeout)
+        try:
+            yield driver
+        finally:
+            self.checkin(driver)
+
+    def reset_session(self, driver):
+        """
+        Clear everything that ties the browser to the previous account
+
+        Returns False if the browser is no longer usable.
+        """
+        try:
+            # Close any tabs or popups the login opened
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            for origin in SESSION_ORIGINS:
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                    'origin': origin,
+                    'storageTypes': 'cookies,local_storage,session_storage,indexeddb,service_workers,cache_storage',
+                })
+
+            driver.get('about:blank')
+            return True
+
+        except Exception as e:
+            logger.warning(f"Failed to reset pooled browser, discarding it: {e}")
+            return False
+
+    def _discard(self, driver):
+        """Quit a driver and free its slot"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+        with self._lock:
+            self._created -= 1
+
+    def close(self):
+        """Quit all idle browsers"""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+        logger.info("Chrome pool closed")
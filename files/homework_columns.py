@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Columnar homework batches
+
+GetPupilLessonsAndHomework returns days -> hours -> lesson slots. Instead of
+building one dict per homework item, the extraction stage flattens the
+payload into parallel columns (date, subject, teacher, homework,
+description, lesson). Dates, subjects and teachers repeat across thousands of rows,
+so they are interned and stored once. Hashing then runs over whole columns,
+and the rows are bucketed by day once (day_index) for every consumer that
+filters by date.
+"""
+
+import sys
+
+from homework_index import DayIndex
+from homework_model import HomeworkItem, key_digest
+from homework_normalize import normalize_text
+
+FIELDS = ('date', 'subject', 'teacher', 'homework', 'description', 'lesson')
+
+
+def _intern(value):
+    """Intern strings, leave anything else as is"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _lesson_of(hour, position):
+    """The timetable hour of an hoursData entry; its position in the day only if it has none"""
+    number = hour.get('hour')
+    if number is None:
+        number = next((item.get('hourNum') for item in hour.get('scheduale') or ()
+                       if item.get('hourNum') is not None), None)
+    try:
+        return int(number) if number is not None else position
+    except (TypeError, ValueError):
+        return position
+
+
+class HomeworkBatch:
+    """Parallel columns of homework items, one entry per item"""
+
+    __slots__ = FIELDS + ('days', '_day_index')
+
+    def __init__(self, date=None, subject=None, teacher=None, homework=None, description=None,
+                 lesson=None, days=None):
+        self.date = date if date is not None else []
+        self.subject = subject if subject is not None else []
+        self.teacher = teacher if teacher is not None else []
+        self.homework = homework if homework is not None else []
+        self.description = description if description is not None else []
+        # Lesson number (the timetable hour), None if unknown
+        self.lesson = lesson if lesson is not None else [None] * len(self.homework)
+        # Days (YYYY-MM-DD) the source covered, including days without homework
+        self.days = days
+        self._day_index = None
+
+    @classmethod
+    def from_payload(cls, homework_data):
+        """Flatten a GetPupilLessonsAndHomework payload, keeping slots with homework"""
+        batch = cls()
+        if not homework_data:
+            return batch
+
+        dates, subjects, teachers = batch.date, batch.subject, batch.teacher
+        homeworks, descriptions, lessons = batch.homework, batch.description, batch.lesson
+        batch.days = []
+
+        for day in homework_data:
+            date = _intern(day.get('date', ''))
+            batch.days.append((date or '')[:10])
+            for position, hour in enumerate(day.get('hoursData') or (), 1):
+                lesson = hour.get('hour')
+                if type(lesson) is not int:
+                    lesson = _lesson_of(hour, position)
+                for item in hour.get('scheduale') or ():
+                    homework_text = item.get('homeWork')
+                    if not homework_text:
+                        continue
+                    homework_text = homework_text.strip()
+                    if not homework_text:
+                        continue
+
+                    dates.append(date)
+                    subjects.append(_intern(item.get('subject_name') or 'Unknown'))
+                    teachers.append(_intern(item.get('teacher') or 'Unknown'))
+                    homeworks.append(homework_text)
+                    descriptions.append(item.get('descClass') or '')
+                    lessons.append(lesson)
+
+        return batch
+
+    @classmethod
+    def from_items(cls, items):
+        """Build a batch from homework item dicts"""
+        items = items or []
+        return cls(
+            [_intern(item.get('date', '')) for item in items],
+            [_intern(item.get('subject', 'Unknown')) for item in items],
+            [_intern(item.get('teacher', 'Unknown')) for item in items],
+            [item.get('homework', '') for item in items],
+            [item.get('description', '') for item in items],
+            [item.get('lesson') for item in items],
+        )
+
+    def __len__(self):
+        return len(self.homework)
+
+    def row(self, index):
+        """Homework item dict at index"""
+        item = {
+            'date': self.date[index],
+            'subject': self.subject[index],
+            'teacher': self.teacher[index],
+            'homework': self.homework[index],
+            'description': self.description[index],
+        }
+        if self.lesson[index] is not None:
+            item['lesson'] = self.lesson[index]
+        return item
+
+    def rows(self):
+        """All items as dicts, in the shape the state file and notifiers use"""
+        return [self.row(index) for index in range(len(self))]
+
+    def items(self):
+        """All rows as HomeworkItem objects, keyed with the batch hashes"""
+        return [
+            HomeworkItem(d, s, t, h, desc, lesson, key=key)
+            for d, s, t, h, desc, lesson, key in zip(self.date, self.subject, self.teacher, self.homework,
+                                                      self.description, self.lesson, self.hashes())
+        ]
+
+    def take(self, indices):
+        """New batch with the rows at the given indices"""
+        return HomeworkBatch(
+            [self.date[i] for i in indices],
+            [self.subject[i] for i in indices],
+            [self.teacher[i] for i in indices],
+            [self.homework[i] for i in indices],
+            [self.description[i] for i in indices],
+            [self.lesson[i] for i in indices],
+            self.days,
+        )
+
+    def day_index(self):
+        """DayIndex of row positions, built on first use"""
+        if self._day_index is None:
+            days = {value: (value or '')[:10] for value in set(self.date)}
+            self._day_index = DayIndex(range(len(self)), lambda index: days[self.date[index]])
+        return self._day_index
+
+    def on_date(self, date):
+        """Rows whose date (YYYY-MM-DD prefix) equals date"""
+        return self.take(self.day_index().on(date))
+
+    def hashes(self):
+        """Identity key of every row (same as HomeworkItem.key)"""
+        normalize = normalize_text
+        # Subjects and teachers repeat, normalize each distinct value once
+        subjects = {value: normalize(value) for value in set(self.subject)}
+        teachers = {value: normalize(value) for value in set(self.teacher)}
+        return [
+            key_digest(d, subjects[s], teachers[t], normalize(h), normalize(desc))
+            for d, s, t, h, desc in zip(self.date, self.subject, self.teacher, self.homework, self.description)
+        ]
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Keyed diff between the tracked homework of a student and a fresh fetch
+
+Items are matched in two steps:
+
+1. By identity key (same content) - unchanged.
+2. By timetable slot (day, lesson, subject) - the teacher edited the
+   homework of that lesson, so it is reported as modified instead of as a
+   removed and a new item. Entries stored before lesson numbers were
+   tracked are matched on (day, subject) when that is unambiguous.
+
+Whatever is left is added (new homework) or removed. Tracked items from
+days the fetch didn't cover have simply aged out of the window and are
+dropped without being reported.
+
+Both sides are bucketed by day first. A day whose fetched (key, lesson)
+pairs are exactly the tracked ones keeps its tracked entries as they are,
+so the matching above only runs for the days that changed. The bucketing
+is still one pass over the tracked state, which is cheap next to the
+matching it skips.
+"""
+
+from dataclasses import dataclass, field
+
+from homework_index import DayIndex
+from homework_model import TrackedHomework
+
+
+@dataclass
+class HomeworkDiff:
+    """Result of diff_homework"""
+
+    added: list = field(default_factory=list)       # HomeworkItem
+    modified: list = field(default_factory=list)    # (TrackedHomework before, HomeworkItem after)
+    removed: list = field(default_factory=list)     # TrackedHomework
+    unchanged: int = 0
+    state: dict = field(default_factory=dict)       # new {key: TrackedHomework}
+    _indexes: tuple = field(default=None, repr=False, compare=False)
+
+    @property
+    def changed(self):
+        return bool(self.added or self.modified or self.removed)
+
+    def on_day(self, day):
+        """The changes of one day (modified items count on the day of their new version)"""
+        if self._indexes is None:
+            self._indexes = (
+                DayIndex(self.added),
+                DayIndex(self.modified, lambda change: change[1].day),
+                DayIndex(self.removed),
+            )
+        added, modified, removed = self._indexes
+        return HomeworkDiff(added.on(day), modified.on(day), removed.on(day))
+
+    def summary(self):
+        return f"{len(self.added)} added, {len(self.modified)} modified, {len(self.removed)} removed, {self.unchanged} unchanged"
+
+
+def _index_unique(entries, slot_of):
+    """{slot: entry} for slots held by exactly one entry"""
+    index = {}
+    duplicates = set()
+    for entry in entries:
+        slot = slot_of(entry)
+        if slot in index:
+            duplicates.add(slot)
+        index[slot] = entry
+    for slot in duplicates:
+        del index[slot]
+    return index
+
+
+def _fingerprint(items):
+    """What decides whether a day changed: its keys and their lesson slots"""
+    return {(item.key, item.lesson) for item in items}
+
+
+def diff_homework(previous, current, detected_at, covered_days=None):
+    """
+    Diff tracked homework against the current items
+
+    Args:
+        previous: {key: TrackedHomework} from the state
+        current: HomeworkItem list from the latest fetch
+        detected_at: timestamp recorded for added and modified items
+        covered_days: days (YYYY-MM-DD) the fetch covered. Defaults to the
+                      range spanned by the current items.
+    """
+    diff = HomeworkDiff()
+
+    if covered_days is None:
+        days = [item.day for item in current if item.day]
+        first, last = (min(days), max(days)) if days else (None, None)
+        covered = (lambda day: first <= day <= last) if days else (lambda day: False)
+    else:
+        covered_days = set(covered_days)
+        covered = covered_days.__contains__
+
+    # 0. Unchanged days keep their tracked entries
+    previous_by_day = {}
+    for tracked in previous.values():
+        bucket = previous_by_day.get(tracked.item.day)
+        if bucket is None:
+            previous_by_day[tracked.item.day] = [tracked]
+        else:
+            bucket.append(tracked)
+
+    changed_days = set()
+    changed_current = []
+    for day, items in DayIndex(current).buckets.items():
+        tracked_items = previous_by_day.get(day)
+        if tracked_items and _fingerprint(items) == _fingerprint(tracked.item for tracked in tracked_items):
+            for tracked in tracked_items:
+                diff.state[tracked.item.key] = tracked
+            diff.unchanged += len(tracked_items)
+        else:
+            changed_days.add(day)
+            changed_current.extend(items)
+
+    # 1. Same content
+    unmatched_current = []
+    for item in changed_current:
+        if item.key in diff.state:
+            continue
+        tracked = previous.get(item.key)
+        if tracked is not None:
+            # Keep the first detection, take the fresh item (it may carry the lesson number)
+            diff.state[item.key] = TrackedHomework(item, tracked.detected_at)
+            diff.unchanged += 1
+        else:
+            unmatched_current.append(item)
+
+    # Only changed and covered days can match or lose items; the rest age out
+    unmatched_previous = [
+        tracked
+        for day, tracked_items in previous_by_day.items() if day in changed_days or covered(day)
+        for tracked in tracked_items if tracked.item.key not in diff.state
+    ]
+
+    # 2. Same slot, different content
+    if unmatched_current and unmatched_previous:
+        by_slot = _index_unique(unmatched_previous, lambda tracked: tracked.item.slot)
+        by_day_subject = _index_unique(unmatched_previous, lambda tracked: (tracked.item.day, tracked.item.subject))
+        current_by_day_subject = _index_unique(unmatched_current, lambda item: (item.day, item.subject))
+
+        still_unmatched = []
+        matched = set()
+        for item in unmatched_current:
+            tracked = by_slot.get(item.slot) if item.lesson is not None else None
+            if tracked is None:
+                candidate = by_day_subject.get((item.day, item.subject))
+                # Legacy entries have no lesson number; only match when unambiguous
+                if candidate is not None and candidate.item.lesson is None \
+                        and current_by_day_subject.get((item.day, item.subject)) is item:
+                    tracked = candidate
+            if tracked is not None and id(tracked) not in matched:
+                matched.add(id(tracked))
+                diff.modified.append((tracked, item))
+                diff.state[item.key] = TrackedHomework(item, detected_at)
+            else:
+                still_unmatched.append(item)
+
+        unmatched_current = still_unmatched
+        unmatched_previous = [tracked for tracked in unmatched_previous if id(tracked) not in matched]
+
+    # 3. New homework
+    for item in unmatched_current:
+        diff.added.append(item)
+        diff.state[item.key] = TrackedHomework(item, detected_at)
+
+    # 4. Gone from a day the fetch covered
+    diff.removed = [tracked for tracked in unmatched_previous if covered(tracked.item.day)]
+    return diff
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Per-date homework index
+
+Homework is almost always consumed by day: today's items for notifications
+and MQTT, day-by-day listings in the CLI views. DayIndex buckets entries by
+their YYYY-MM-DD day once, so each consumer looks up the days it needs
+instead of scanning and re-grouping the whole list.
+"""
+
+
+def item_day(entry):
+    """Day of a HomeworkItem, TrackedHomework or item dict"""
+    item = getattr(entry, 'item', entry)
+    if isinstance(item, dict):
+        return (item.get('date') or '')[:10]
+    return item.day
+
+
+class DayIndex:
+    """Entries bucketed by day, each bucket in insertion order"""
+
+    __slots__ = ('buckets',)
+
+    def __init__(self, entries=(), day_of=item_day):
+        buckets = {}
+        for entry in entries:
+            day = day_of(entry)
+            bucket = buckets.get(day)
+            if bucket is None:
+                buckets[day] = [entry]
+            else:
+                bucket.append(entry)
+        self.buckets = buckets
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def __contains__(self, day):
+        return day in self.buckets
+
+    def on(self, day):
+        """Entries of one day (empty list if none)"""
+        return self.buckets.get(day, [])
+
+    def days(self):
+        """Days with entries, oldest first"""
+        return sorted(self.buckets)
+
+    def between(self, start=None, end=None):
+        """(day, entries) for days in [start, end], oldest first; None leaves a side open"""
+        for day in self.days():
+            if start is not None and day < start:
+                continue
+            if end is not None and day > end:
+                break
+            yield day, self.buckets[day]
+
+    def __iter__(self):
+        """(day, entries) for every day, oldest first"""
+        return self.between()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Homework text normalization
+
+Teachers' edits that don't change what was written - trailing spaces, RTL/LTR
+marks pasted from Word, different line breaks, precomposed vs combining
+Hebrew points - would otherwise change the identity key of an item and turn
+up as a modified homework. Texts are normalized before they are hashed.
+
+Steps (HOMEWORK_NORMALIZATION, comma-separated, default all):
+    nfc          Unicode NFC
+    bidi         strip bidi control marks and zero-width characters
+    whitespace   collapse every run of whitespace (line breaks too) to one space
+
+Results are cached per raw string, so the same text repeated across checks
+and students is normalized once.
+"""
+
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+from loguru import logger
+
+STEPS = ('nfc', 'bidi', 'whitespace')
+CACHE_SIZE = 8192
+
+# LRM, RLM, ALM, LRE/RLE/PDF/LRO/RLO, LRI/RLI/FSI/PDI, plus ZWSP and BOM
+BIDI_PATTERN = re.compile('[\u200b\u200e\u200f\u061c\u202a-\u202e\u2066-\u2069\ufeff]')
+
+
+def configured_steps():
+    """Normalization steps from HOMEWORK_NORMALIZATION ('none' disables)"""
+    value = os.getenv('HOMEWORK_NORMALIZATION', ','.join(STEPS)).strip().lower()
+    if value in ('', 'none', 'off'):
+        return ()
+
+    steps = []
+    for step in value.split(','):
+        step = step.strip()
+        if step in STEPS:
+            steps.append(step)
+        elif step:
+            logger.warning(f"Unknown HOMEWORK_NORMALIZATION step '{step}', ignored")
+    # Fixed order: NFC before stripping, whitespace last
+    return tuple(step for step in STEPS if step in steps)
+
+
+def make_normalizer(steps=None):
+    """
+    Cached normalization function for the given steps (default: configured)
+
+    Anything that isn't a string is returned as is. The cache sits in front of
+    the whole function, so a repeated text costs one lookup.
+    """
+    steps = configured_steps() if steps is None else tuple(steps)
+
+    @lru_cache(maxsize=CACHE_SIZE)
+    def normalize(text):
+        if type(text) is not str:
+            return text
+        if 'nfc' in steps:
+            text = unicodedata.normalize('NFC', text)
+        if 'bidi' in steps:
+            text = BIDI_PATTERN.sub('', text)
+        if 'whitespace' in steps:
+            text = ' '.join(text.split())
+        return text
+
+    normalize.steps = steps
+    return normalize
+
+
+normalize_text = make_normalizer()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Filtered, paged homework queries against a state store
+
+HomeworkQuery describes what to return: one student, a day range, subject
+and teacher (case-insensitive substrings), and a page (offset, limit).
+StateStore.query() answers it without keeping the whole state in memory:
+the SQLite backend turns it into one indexed SQL query; the json backend
+reads one student file at a time and keeps only the requested page. The
+journal backend and a single homework_state.json from older versions have
+no per-student files, so they are read whole for every query (migrate to
+sqlite for large states).
+
+A state store only holds the current items: the fetched window, minus what
+STATE_RETENTION_DAYS expired. Older and removed homework is only in the
+history archive; HistoryArchive.query() answers the same query over every
+archived version, reading the months the day range covers.
+
+Results are ordered by day, student, lesson and subject.
+"""
+
+import heapq
+from dataclasses import dataclass
+
+DEFAULT_LIMIT = 50
+
+
+@dataclass
+class HomeworkQuery:
+    student: str = None
+    start: str = None       # first day, YYYY-MM-DD
+    end: str = None         # last day, YYYY-MM-DD
+    subject: str = None
+    teacher: str = None
+    offset: int = 0
+    limit: int = DEFAULT_LIMIT
+
+    def matches(self, tracked):
+        """True if a TrackedHomework passes the day, subject and teacher filters"""
+        item = tracked.item
+        day = item.day
+        if self.start and day < self.start:
+            return False
+        if self.end and day > self.end:
+            return False
+        if self.subject and self.subject.casefold() not in (item.subject or '').casefold():
+            return False
+        if self.teacher and self.teacher.casefold() not in (item.teacher or '').casefold():
+            return False
+        return True
+
+
+@dataclass
+class QueryResult:
+    total: int      # matches before paging
+    rows: list      # (student, TrackedHomework) on the requested page
+
+
+def result_order(row):
+    student, tracked = row
+    item = tracked.item
+    lesson = item.lesson if type(item.lesson) is int else -1
+    return item.day, student, lesson, item.subject or ''
+
+
+def page_of(query, students):
+    """
+    Answer query from (student, {key: TrackedHomework}) pairs, read one at a
+    time; only the rows up to the end of the page are kept
+    """
+    return page_of_rows(query, (
+        (student, tracked)
+        for student, entries in students if query.student is None or student == query.student
+        for tracked in entries.values()
+    ))
+
+
+def page_of_rows(query, rows):
+    """Answer query from a stream of (student, tracked) rows; anything with .item works as tracked"""
+    total = 0
+
+    def matching():
+        nonlocal total
+        for row in rows:
+            if query.matches(row[1]):
+                total += 1
+                yield row
+
+    page = heapq.nsmallest(query.offset + query.limit, matching(), key=result_order)
+    return QueryResult(total, page[query.offset:])
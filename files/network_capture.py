@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Capture the SmartSchool login response from Chrome's network log
+
+Instead of navigating around and polling cookies, localStorage and
+sessionStorage after login, the browser's DevTools Protocol network events
+are read directly: the webToken Set-Cookie header and the JSON body of
+LoginByUserNameAndPassword are picked up the moment the server answers.
+
+The driver must be started with performance logging enabled, see
+enable_performance_log().
+"""
+
+import base64
+import json
+import time
+
+from loguru import logger
+
+LOGIN_ENDPOINT = 'LoginByUserNameAndPassword'
+POLL_INTERVAL = 0.2
+
+
+def enable_performance_log(options):
+    """Turn on the performance log that carries the Network.* events"""
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return options
+
+
+def parse_set_cookie(header_value, name='webToken'):
+    """Find a cookie value in a (possibly multi-line) Set-Cookie header"""
+    for line in header_value.split('\n'):
+        cookie = line.split(';', 1)[0].strip()
+        if '=' not in cookie:
+            continue
+        key, value = cookie.split('=', 1)
+        if key.strip() == name and value:
+            return value
+    return None
+
+
+class LoginResponseCapture:
+    """Watches network events for the login response of one browser"""
+
+    def __init__(self, driver, endpoint=LOGIN_ENDPOINT, cookie_name='webToken'):
+        self.driver = driver
+        self.endpoint = endpoint
+        self.cookie_name = cookie_name
+        self.token = None
+        self.login_data = None
+        self.finished = False
+        self._request_ids = set()
+        self.available = False
+        # What the until condition of wait() returned, if it ended the wait
+        self.until_result = None
+
+    def start(self):
+        """
+        Enable the network domain and drop events from earlier pages
+
+        Returns False if the browser has no performance log.
+        """
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.get_log('performance')
+            self.available = True
+        except Exception as e:
+            logger.debug(f"Network capture unavailable: {e}")
+            self.available = False
+        return self.available
+
+    def poll(self):
+        """Process the network events logged since the last poll"""
+        if not self.available:
+            return
+
+        for entry in self.driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+
+            if method == 'Network.requestWillBeSent':
+                # Skip the CORS preflight, only the POST carries the answer
+                request = params.get('request', {})
+                if self.endpoint in request.get('url', '') and request.get('method') == 'POST':
+                    self._request_ids.add(params.get('requestId'))
+
+            elif method == 'Network.responseReceivedExtraInfo':
+                # Raw response headers, including Set-Cookie - of the login POST only
+                if not self.token and params.get('requestId') in self._request_ids:
+                    for header, value in params.get('headers', {}).items():
+                        if header.lower() == 'set-cookie':
+                            self.token = parse_set_cookie(value, self.cookie_name) or self.token
+
+            elif method == 'Network.loadingFinished':
+                if params.get('requestId') in self._request_ids:
+                    self._read_login_body(params['requestId'])
+
+            elif method == 'Network.loadingFailed':
+                if params.get('requestId') in self._request_ids:
+                    logger.warning(f"Login request failed: {params.get('errorText')}")
+                    self.finished = True
+
+    def _read_login_body(self, request_id):
+        """Fetch and decode the JSON body of the login response"""
+        self.finished = True
+        try:
+            body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            text = body.get('body', '')
+            if body.get('base64Encoded'):
+                text = base64.b64decode(text).decode('utf-8')
+            self.login_data = json.loads(text)
+        except Exception as e:
+            logger.debug(f"Could not read login response body: {e}")
+
+    def wait(self, timeout=90, until_token=False, until=None):
+        """
+        Wait for the login response
+
+        Returns (token, login_data). Returns as soon as the response has
+        finished loading, even if it carried no token (failed login), unless
+        until_token is set - then failed attempts are skipped, for flows where
+        the user retries after solving a captcha.
+
+        until: condition checked on every poll as well (e.g. login_signal
+        from browser_waits), for logins the capture doesn't see; the wait
+        ends as soon as it returns something true, kept in until_result.
+        """
+        self.until_result = None
+        if not self.available:
+            return None, None
+
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            self.poll()
+            if self.finished:
+                # The cookie header can be logged right after the body
+                self.poll()
+                if self.token or not until_token:
+                    break
+                self.finished = False
+            if until is not None:
+                self.until_result = until()
+                if self.until_result:
+                    # The response may have been logged meanwhile
+                    self.poll()
+                    break
+            time.sleep(POLL_INTERVAL)
+
+        return self.token, self.login_data
@@ -1,5 +1,9 @@
 import os
 import json
+import atexit
+import signal
+import sys
+import threading
 import requests
 import schedule
 import time
@@ -9,13 +13,24 @@ from loguru import logger
 import apprise
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-import hashlib
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from urllib.parse import unquote
+from chrome_pool import ChromeDriverPool
+from browser_waits import wait_for_page_ready, wait_for_element, wait_for_input_value, wait_for_login, wait_for_cookie, \
+    login_signal
+from network_capture import LoginResponseCapture
+from login_outcomes import LoginOutcomeCache
+from homework_columns import HomeworkBatch
+from homework_model import HomeworkItem, item_key
+from homework_diff import diff_homework
+from homework_normalize import normalize_text
+from state_store import open_state_store, open_state, StudentStateCache
+from history_archive import HistoryArchive
+from state_retention import RetentionJob
+from durable_io import read_durable, write_durable, durable_exists, CorruptFileError
 
 try:
     import paho.mqtt.client as mqtt
@@ -34,14 +49,26 @@ class SmartSchoolMonitor:
         self.config_path = Path("/app/config/config.yaml") if Path("/app/config").exists() else Path("./config/config.yaml")
         self.state_file = Path("/app/config/homework_state.json") if Path("/app/config").exists() else Path("./config/homework_state.json")
         self.token_file = Path("/app/config/token_cache.json") if Path("/app/config").exists() else Path("./config/token_cache.json")
+        self.outcomes_file = Path("/app/config/login_outcomes.json") if Path("/app/config").exists() else Path("./config/login_outcomes.json")
         self.students = []
         self.notifiers = []
         self.mqtt_client = None
         self.mqtt_connected = False
+        # Last count/details published per student, to skip unchanged MQTT updates
+        self.mqtt_published = {}
+        self.driver_pool = None
+        self.login_outcomes = LoginOutcomeCache(self.outcomes_file)
+        self._login_failure_reason = None
         self.load_config()
         self.setup_notifiers()
         self.setup_mqtt()
+        # Held while the state changes; the retention job edits it in the background
+        self.state_lock = threading.RLock()
+        self.token_lock = threading.Lock()
+        self.state_store = open_state_store(self.state_file)
         self.load_state()
+        self.setup_history()
+        self.retention = RetentionJob(self)
 
     def load_config(self):
         """Load configuration from YAML file"""
@@ -227,34 +254,37 @@ class SmartSchoolMonitor:
 
         # Filter to today's homework
         today = datetime.now().strftime('%Y-%m-%d')
-        today_homework = [hw for hw in homework_list if hw.get('date', '')[:10] == today]
-
-        # Publish count
-        count = len(today_homework)
-        self.mqtt_client.publish(
-            f"smartschool/{entity_id}/homework/count",
-            payload=str(count),
-            qos=1,
-            retain=True
-        )
+        today_homework = homework_list.on_date(today).rows()
 
         # Format details for sensor
+        count = len(today_homework)
         if today_homework:
             details = f"📚 Today ({today}):\n"
             for idx, hw in enumerate(today_homework, 1):
                 subject = hw.get('subject', 'Unknown')
                 teacher = hw.get('teacher', 'Unknown')
-                homework_text = hw.get('homework', '')[:100]
+                homework_text = normalize_text(hw.get('homework', ''))[:100]
                 details += f"{idx}. {subject} - {teacher}\n   {homework_text}...\n"
         else:
             details = f"No homework for today ({today})"
 
-        self.mqtt_client.publish(
-            f"smartschool/{entity_id}/homework/details",
-            payload=details,
-            qos=1,
-            retain=True
-        )
+        # Count and details are retained, only republish them when they changed
+        if self.mqtt_published.get(student_name) != (count, details):
+            self.mqtt_client.publish(
+                f"smartschool/{entity_id}/homework/count",
+                payload=str(count),
+                qos=1,
+                retain=True
+            )
+            self.mqtt_client.publish(
+                f"smartschool/{entity_id}/homework/details",
+                payload=details,
+                qos=1,
+                retain=True
+            )
+            self.mqtt_published[student_name] = (count, details)
+        else:
+            logger.debug(f"MQTT state for {student_name} unchanged, not republished")
 
         # Publish last check timestamp
         self.mqtt_client.publish(
@@ -268,34 +298,80 @@ class SmartSchoolMonitor:
 
     def load_state(self):
         """Load previous homework state"""
-        if self.state_file.exists():
-            try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    self.homework_state = json.load(f)
+        try:
+            self.homework_state = open_state(self.state_store)
+            if isinstance(self.homework_state, StudentStateCache):
+                logger.info(f"Homework state is loaded per student on demand "
+                            f"(up to {self.homework_state.capacity} in memory)")
+            elif self.homework_state:
                 logger.info("Loaded previous homework state")
-            except Exception as e:
-                logger.error(f"Failed to load state: {e}")
-                self.homework_state = {}
-        else:
+        except CorruptFileError as e:
+            # Starting empty would report every tracked homework as new again
+            logger.critical(f"Homework state is damaged and no good generation is left: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to load state: {e}")
             self.homework_state = {}
 
-    def save_state(self):
-        """Save homework state to file"""
+    def setup_history(self):
+        """Open the long-term history archive (HISTORY_ARCHIVE=false disables it)"""
+        self.history = None
+        if os.getenv('HISTORY_ARCHIVE', 'true').lower() != 'true':
+            return
+        self.history = HistoryArchive(self.state_file.parent / "history")
+        if not self.history.exists() and self.homework_state:
+            # Start the archive with what is already tracked
+            try:
+                count = self.history.seed(self.homework_state)
+                logger.info(f"Seeded homework history with {count} tracked items")
+            except Exception as e:
+                logger.error(f"Failed to seed homework history: {e}")
+
+    def archive_history(self, student_name, diff, detected_at):
+        """Record a check's changes in the history archive"""
+        if self.history is None or not diff.changed:
+            return
+        try:
+            self.history.record(student_name, diff, detected_at)
+        except Exception as e:
+            logger.error(f"Failed to archive homework history: {e}")
+
+    def save_state(self, students=None, force=False):
+        """Mark students as changed (None = all) and flush if the flush interval allows"""
+        self.state_store.mark_dirty(students)
+        self.flush_state(force)
+
+    def flush_state(self, force=False):
+        """Write the students changed since the last flush (coalesced to STATE_FLUSH_INTERVAL)"""
         try:
-            self.state_file.parent.mkdir(exist_ok=True, parents=True)
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.homework_state, f, ensure_ascii=False, indent=2)
+            with self.state_lock:
+                if self.state_store.flush(self.homework_state, force):
+                    logger.debug("Saved state")
+                    if isinstance(self.homework_state, StudentStateCache):
+                        self.homework_state.trim()
         except Exception as e:
             logger.error(f"Failed to save state: {e}")
 
-    def load_token_cache(self, username):
-        """Load cached token for a user"""
-        if not self.token_file.exists():
+    def shutdown(self):
+        """Flush pending state and close the store; safe to call more than once"""
+        if getattr(self, '_shut_down', False):
+            return
+        self._shut_down = True
+        self.retention.stop()
+        self.flush_state(force=True)
+        try:
+            self.state_store.close()
+        except Exception as e:
+            logger.error(f"Failed to close state store: {e}")
+        logger.info("State flushed")
+
+    def load_token_cache(self, username, allow_expired=False):
+        """Load cached token for a user (allow_expired: also return tokens past 23h)"""
+        if not durable_exists(self.token_file):
             return None
 
         try:
-            with open(self.token_file, 'r') as f:
-                cache = json.load(f)
+            cache = read_durable(self.token_file, json.loads, allow_external=True)
 
             user_cache = cache.get(username)
             if not user_cache:
@@ -304,8 +380,10 @@ class SmartSchoolMonitor:
             # Check if token is expired (tokens usually last 24 hours)
             cached_time = datetime.fromisoformat(user_cache['timestamp'])
             if (datetime.now() - cached_time).total_seconds() > 23 * 3600:  # 23 hours
-                logger.info(f"Cached token for {username} is expired (time-based)")
-                return None
+                if not allow_expired:
+                    logger.info(f"Cached token for {username} is expired (time-based)")
+                    return None
+                logger.info(f"Trying expired cached token for {username}")
 
             # URL-decode the token if it's encoded
             token = user_cache.get('token', '')
@@ -340,20 +418,21 @@ class SmartSchoolMonitor:
     def save_token_cache(self, username, token, student_params):
         """Save token to cache"""
         try:
-            cache = {}
-            if self.token_file.exists():
-                with open(self.token_file, 'r') as f:
-                    cache = json.load(f)
-
-            cache[username] = {
-                'token': token,
-                'student_params': student_params,
-                'timestamp': datetime.now().isoformat()
-            }
-
-            self.token_file.parent.mkdir(exist_ok=True, parents=True)
-            with open(self.token_file, 'w') as f:
-                json.dump(cache, f, indent=2)
+            with self.token_lock:
+                cache = {}
+                if durable_exists(self.token_file):
+                    try:
+                        cache = read_durable(self.token_file, json.loads, allow_external=True)
+                    except CorruptFileError as e:
+                        logger.warning(f"Token cache unreadable, starting a new one: {e}")
+
+                cache[username] = {
+                    'token': token,
+                    'student_params': student_params,
+                    'timestamp': datetime.now().isoformat()
+                }
+
+                write_durable(self.token_file, json.dumps(cache, indent=2))
 
             logger.info(f"Saved token cache for {username}")
 
@@ -364,35 +443,13 @@ class SmartSchoolMonitor:
         """Fully automated login using undetected-chromedriver"""
         logger.info(f"Starting automated login for {username}")
 
-        # Check if we're running in Docker (headless)
-        is_docker = os.path.exists('/.dockerenv')
-        headless = is_docker or os.getenv('HEADLESS', 'false').lower() == 'true'  # Changed default to false
-
-        # Setup undetected Chrome
-        options = uc.ChromeOptions()
-
-        if headless:
-            logger.info("Running in headless mode")
-            options.add_argument('--headless=new')
-            options.add_argument('--disable-gpu')
-        else:
-            logger.info("Running in non-headless mode (better for reCAPTCHA)")
-
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-blink-features=AutomationControlled')
-        options.add_argument('--window-size=1920,1080')
-        options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36')
-
-        # Additional options to help with reCAPTCHA
-        options.add_argument('--disable-web-security')
-        options.add_argument('--allow-running-insecure-content')
-
         driver = None
+        pool = self.get_driver_pool()
+        self._login_failure_reason = 'rejected'
 
         try:
-            driver = uc.Chrome(options=options, use_subprocess=True, version_main=None)
-            logger.info("Browser initialized")
+            driver = pool.checkout()
+            logger.info("Browser ready")
 
             # Navigate to login
             login_url = "https://webtop.smartschool.co.il/account/login"
@@ -400,7 +457,7 @@ class SmartSchoolMonitor:
             logger.info("Loaded login page")
 
             # Wait for page
-            time.sleep(10)
+            wait_for_page_ready(driver, timeout=20)
 
             # Remove overlays with JavaScript
             js_cleanup = """
@@ -415,43 +472,37 @@ class SmartSchoolMonitor:
             wait = WebDriverWait(driver, 20)
             username_field = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='text']")))
             username_field.click()
-            time.sleep(0.5)
             username_field.send_keys(username)
+            wait_for_input_value(driver, username_field, username)
             logger.info("Entered username")
-            time.sleep(1)
 
             # Find and fill password
             password_field = driver.find_element(By.CSS_SELECTOR, "input[type='password']")
             password_field.click()
-            time.sleep(0.5)
             password_field.send_keys(password)
+            wait_for_input_value(driver, password_field, password)
             logger.info("Entered password")
-            time.sleep(2)
 
             # Handle reCAPTCHA checkbox
             logger.info("Looking for reCAPTCHA checkbox...")
             try:
-                # Wait for reCAPTCHA iframe to load
-                time.sleep(3)
-
-                # Switch to reCAPTCHA iframe
+                # Switch to reCAPTCHA iframe once it has loaded
                 recaptcha_iframe = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "iframe[src*='recaptcha']")))
                 driver.switch_to.frame(recaptcha_iframe)
                 logger.info("Switched to reCAPTCHA iframe")
 
                 # Click the checkbox
-                time.sleep(2)
                 recaptcha_checkbox = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, ".recaptcha-checkbox-border")))
                 recaptcha_checkbox.click()
                 logger.info("Clicked reCAPTCHA checkbox")
 
+                # Wait for reCAPTCHA to validate
+                wait_for_element(driver, "#recaptcha-anchor[aria-checked='true']", timeout=5)
+
                 # Switch back to main content
                 driver.switch_to.default_content()
                 logger.info("Switched back to main content")
 
-                # Wait for reCAPTCHA to validate
-                time.sleep(5)
-
             except Exception as e:
                 logger.warning(f"Could not handle reCAPTCHA: {e}")
                 # Switch back to main content in case we're stuck in iframe
@@ -460,6 +511,10 @@ class SmartSchoolMonitor:
                 except:
                     pass
 
+            # Listen for the login response before submitting
+            capture = LoginResponseCapture(driver)
+            capture.start()
+
             # Submit
             logger.info("Submitting form...")
             try:
@@ -474,54 +529,52 @@ class SmartSchoolMonitor:
 
             # Wait for login (max 90 seconds - increased for reCAPTCHA)
             logger.info("Waiting for login to complete (this may take longer with reCAPTCHA)...")
-            start_time = time.time()
-            web_token = None
-            login_successful = False
-
-            while time.time() - start_time < 90:
-                current_url = driver.current_url.lower()
+            # A URL change or token cookie ends the wait too, in case the capture misses the response
+            web_token, login_data = capture.wait(timeout=90, until=lambda: login_signal(driver))
 
-                # Check if we've left the login page
-                if 'login' not in current_url and 'webtop.smartschool.co.il' in current_url:
-                    logger.info(f"Login successful - URL changed to: {driver.current_url}")
-                    login_successful = True
-                    break
-
-                # Check for token in cookies during wait
-                cookies = driver.get_cookies()
-                for cookie in cookies:
-                    if cookie['name'] == 'webToken' and cookie['value']:
-                        web_token = cookie['value']
-                        logger.info("Token found in cookies during wait")
-                        login_successful = True
-                        break
+            if web_token:
+                # URL-decode if needed
+                if '%' in web_token:
+                    web_token = unquote(web_token)
+                logger.info("✓ Captured webToken from login response")
+                return web_token, None
 
-                if login_successful:
-                    break
-
-                time.sleep(2)
+            if capture.finished:
+                logger.warning(f"Login response carried no webToken: {login_data}")
+                self._login_failure_reason = 'rejected'
 
-            if not login_successful:
+            web_token = None
+            signal, value = capture.until_result or (None, None)
+            if not capture.available or (signal is None and capture.finished):
+                # Fall back to watching the page and cookies
+                signal, value = wait_for_login(driver, timeout=10 if capture.available else 90)
+
+            if signal == 'url':
+                logger.info(f"Login successful - URL changed to: {value}")
+            elif signal == 'cookie':
+                web_token = value
+                logger.info("Token found in cookies during wait")
+            else:
                 logger.error("Login did not complete within timeout period")
                 logger.info(f"Final URL: {driver.current_url}")
+                if driver.find_elements(By.CSS_SELECTOR, "iframe[src*='recaptcha']"):
+                    self._login_failure_reason = 'captcha'
                 driver.save_screenshot("login_timeout.png")
                 return None, None
 
             # Give the app time to set all cookies and tokens
             logger.info("Login successful, waiting for tokens to be set...")
-            time.sleep(5)
+            wait_for_page_ready(driver, timeout=5)
 
             # Navigate to API server domain to get the token cookie
             try:
                 logger.info("Navigating to API server to get token cookie...")
                 driver.get("https://webtopserver.smartschool.co.il/")
-                time.sleep(3)
+                # Extract final token from API server domain
+                wait_for_cookie(driver, 'webToken', timeout=5)
             except Exception as e:
                 logger.warning(f"Failed to navigate to API server: {e}")
 
-            # Extract final token from API server domain
-            time.sleep(2)
-
             # Debug: Print all cookies from API server
             cookies = driver.get_cookies()
             logger.info(f"All cookies found on API server: {[c['name'] for c in cookies]}")
@@ -598,6 +651,7 @@ class SmartSchoolMonitor:
 
             if not web_token:
                 logger.error("Failed to extract token from cookies, localStorage, or sessionStorage")
+                self._login_failure_reason = 'half_authenticated'
                 logger.info("Saving screenshot and page source for debugging...")
                 driver.save_screenshot("login_failed.png")
                 with open("page_source.html", "w", encoding="utf-8") as f:
@@ -610,6 +664,7 @@ class SmartSchoolMonitor:
 
         except Exception as e:
             logger.error(f"Login failed: {e}")
+            self._login_failure_reason = 'error'
             import traceback
             traceback.print_exc()
 
@@ -623,8 +678,29 @@ class SmartSchoolMonitor:
 
         finally:
             if driver:
-                driver.quit()
-                logger.info("Browser closed")
+                pool.checkin(driver)
+                logger.info("Browser returned to pool")
+
+    def get_driver_pool(self):
+        """Create the shared Chrome pool on first use"""
+        if self.driver_pool is None:
+            # Check if we're running in Docker (headless)
+            is_docker = os.path.exists('/.dockerenv')
+            headless = is_docker or os.getenv('HEADLESS', 'false').lower() == 'true'  # Changed default to false
+
+            if headless:
+                logger.info("Running in headless mode")
+            else:
+                logger.info("Running in non-headless mode (better for reCAPTCHA)")
+
+            self.driver_pool = ChromeDriverPool(
+                size=int(os.getenv('CHROME_POOL_SIZE', '1')),
+                headless=headless,
+                # Additional options to help with reCAPTCHA
+                extra_arguments=['--disable-web-security', '--allow-running-insecure-content'],
+            )
+
+        return self.driver_pool
 
     def get_homework(self, token, student_params):
         """
@@ -674,40 +750,15 @@ class SmartSchoolMonitor:
             return None
 
     def extract_homework_items(self, homework_data):
-        """Extract actual homework from the schedule data"""
-        homework_items = []
-
-        if not homework_data:
-            return homework_items
-
-        for day in homework_data:
-            date = day.get('date', '')
-            hours_data = day.get('hoursData', [])
-
-            for hour in hours_data:
-                schedule = hour.get('scheduale', [])
-
-                for item in schedule:
-                    homework_text = item.get('homeWork') or ''
-                    if homework_text:
-                        homework_text = homework_text.strip()
-
-                    if homework_text:  # Only include if there's actual homework
-                        homework_items.append({
-                            'date': date,
-                            'subject': item.get('subject_name') or 'Unknown',
-                            'teacher': item.get('teacher') or 'Unknown',
-                            'homework': homework_text,
-                            'description': item.get('descClass') or ''
-                        })
-
-        return homework_items
+        """Extract actual homework from the schedule data as a columnar HomeworkBatch"""
+        return HomeworkBatch.from_payload(homework_data)
 
     def hash_homework(self, homework_item):
         """Create a hash of homework item to detect changes"""
+        if isinstance(homework_item, HomeworkItem):
+            return homework_item.key
         try:
-            hw_str = json.dumps(homework_item, sort_keys=True, ensure_ascii=False)
-            return hashlib.md5(hw_str.encode()).hexdigest()
+            return item_key(homework_item)
         except:
             return None
 
@@ -735,6 +786,22 @@ class SmartSchoolMonitor:
                 logger.info(f"No cached token for {student_name}")
                 need_new_token = True
 
+            # Don't retry a login that recently failed - fall back to an expired cached token
+            if need_new_token:
+                remaining = self.login_outcomes.backoff_remaining(username, 'selenium')
+                if remaining:
+                    reason = self.login_outcomes.failure_reason(username, 'selenium')
+                    logger.info(f"Login for {student_name} is backing off ({reason}), retry in {remaining / 60:.0f} min")
+
+                    stale = None if cached else self.load_token_cache(username, allow_expired=True)
+                    if stale and self.validate_token(stale['token'], student_params or stale.get('student_params')):
+                        token = stale['token']
+                        student_params = student_params or stale.get('student_params')
+                        need_new_token = False
+                    else:
+                        logger.warning(f"Skipping check for {student_name} until login backoff expires")
+                        return
+
             # Get new token if needed
             if need_new_token:
                 logger.info(f"Getting new token for {student_name}...")
@@ -742,8 +809,11 @@ class SmartSchoolMonitor:
 
                 if not token:
                     logger.error(f"Failed to get token for {student_name}")
+                    self.login_outcomes.record_failure(username, 'selenium', self._login_failure_reason)
                     return
 
+                self.login_outcomes.record_success(username, 'selenium')
+
                 if params_from_login:
                     student_params = params_from_login
 
@@ -770,35 +840,30 @@ class SmartSchoolMonitor:
             # Check if this is first time for this student (for MQTT discovery)
             is_first_check = student_name not in self.homework_state
 
-            # Initialize state for this student if needed
-            if student_name not in self.homework_state:
-                self.homework_state[student_name] = {}
-
-            # Check for new homework
-            new_homework = []
-            current_hashes = {}
-
-            for item in homework_items:
-                item_hash = self.hash_homework(item)
-                if not item_hash:
-                    continue
-
-                current_hashes[item_hash] = item
-
-                # Check if this is new homework
-                if item_hash not in self.homework_state[student_name]:
-                    new_homework.append(item)
-                    self.homework_state[student_name][item_hash] = {
-                        'detected_at': datetime.now().isoformat(),
-                        'item': item
-                    }
-                    logger.info(f"New homework detected: {item['subject']}")
-
-            # Remove old homework from state
-            self.homework_state[student_name] = {
-                k: v for k, v in self.homework_state[student_name].items()
-                if k in current_hashes
-            }
+            with self.state_lock:
+                # Initialize state for this student if needed
+                if student_name not in self.homework_state:
+                    self.homework_state[student_name] = {}
+
+                # Diff against the tracked homework: new, edited and removed items
+                detected_at = datetime.now().isoformat()
+                diff = diff_homework(
+                    self.homework_state[student_name],
+                    homework_items.items(),
+                    detected_at,
+                    covered_days=homework_items.days,
+                )
+                state_changed = diff.state != self.homework_state[student_name]
+                self.homework_state[student_name] = diff.state
+
+            for item in diff.added:
+                logger.info(f"New homework detected: {item.subject}")
+            for _, item in diff.modified:
+                logger.info(f"Homework changed: {item.subject}")
+            for tracked in diff.removed:
+                logger.info(f"Homework removed: {tracked.item.subject}")
+            logger.info(f"Homework diff for {student_name}: {diff.summary()}")
+            self.archive_history(student_name, diff, detected_at)
 
             # Publish MQTT discovery on first check for this student
             if self.mqtt_client and is_first_check:
@@ -808,20 +873,37 @@ class SmartSchoolMonitor:
             if self.mqtt_client:
                 self.publish_mqtt_state(student_name, username, homework_items)
 
-            # Send notifications if new homework found
-            if new_homework:
-                self.send_notification(student_name, new_homework)
+            # Send notifications if homework was added, changed or removed
+            if diff.changed:
+                self.send_notification(student_name, diff)
 
-            # Save state
-            self.save_state()
+            # Save state (only if this student's state changed)
+            if state_changed:
+                self.save_state([student_name])
 
         except Exception as e:
             logger.error(f"Error checking homework for {student_name}: {e}")
             import traceback
             traceback.print_exc()
 
-    def send_notification(self, student_name, homework_list):
-        """Send notification via webhook or Apprise"""
+    def _format_homework(self, idx, hw, previous=None):
+        """One homework entry of a notification; previous: the item before an edit"""
+        subject = hw.subject or 'Unknown'
+        homework = hw.homework or ''
+        teacher = hw.teacher or ''
+
+        lesson = f", lesson {hw.lesson}" if hw.lesson is not None else ''
+        text = f"{idx}. {subject} ({hw.day}{lesson})\n"
+        text += f"   👨‍🏫 {teacher}\n"
+        if previous is not None and (previous.homework or '') != homework:
+            text += f"   ❌ {(previous.homework or '')[:200]}\n"
+        text += f"   📝 {homework[:200]}\n"  # Limit length
+        if len(homework) > 200:
+            text += f"   ...\n"
+        return text + "\n"
+
+    def send_notification(self, student_name, diff):
+        """Send notification via webhook or Apprise (diff: HomeworkDiff)"""
         try:
             if not hasattr(self, 'apobj') or len(self.apobj) == 0:
                 logger.warning("No notifiers configured")
@@ -829,27 +911,31 @@ class SmartSchoolMonitor:
 
             # Filter to only today's homework
             today = datetime.now().strftime('%Y-%m-%d')
-            today_homework = [hw for hw in homework_list if hw.get('date', '')[:10] == today]
+            changes = diff.on_day(today)
+            added, modified = changes.added, changes.modified
+            removed = [old.item for old in changes.removed]
 
-            if not today_homework:
-                logger.info(f"No homework for today ({today}), skipping notification")
+            if not changes.changed:
+                logger.info(f"No homework changes for today ({today}), skipping notification")
                 return
 
             # Format homework message
-            message = f"📚 New homework for {student_name} (Today: {today}):\n\n"
+            message = f"📚 Homework updates for {student_name} (Today: {today}):\n\n"
 
-            for idx, hw in enumerate(today_homework, 1):
-                date_str = hw.get('date', '')[:10]  # Just the date part
-                subject = hw.get('subject', 'Unknown')
-                homework = hw.get('homework', '')
-                teacher = hw.get('teacher', '')
+            if added:
+                message += "🆕 New:\n"
+                for idx, hw in enumerate(added, 1):
+                    message += self._format_homework(idx, hw)
+
+            if modified:
+                message += "✏️ Changed:\n"
+                for idx, (old, hw) in enumerate(modified, 1):
+                    message += self._format_homework(idx, hw, previous=old.item)
 
-                message += f"{idx}. {subject} ({date_str})\n"
-                message += f"   👨‍🏫 {teacher}\n"
-                message += f"   📝 {homework[:200]}\n"  # Limit length
-                if len(homework) > 200:
-                    message += f"   ...\n"
-                message += "\n"
+            if removed:
+                message += "🗑️ Removed:\n"
+                for idx, hw in enumerate(removed, 1):
+                    message += self._format_homework(idx, hw)
 
             title = f"SmartSchool Homework - {student_name}"
 
@@ -952,11 +1038,19 @@ class SmartSchoolMonitor:
             # Small delay between checks
             time.sleep(2)
 
+        # Write whatever the coalescing held back
+        self.flush_state(force=True)
+
     def start(self):
         """Start the monitor"""
         logger.info("Starting SmartSchool Homework Monitor v2 (with Selenium)")
 
+        # Flush the state on exit; docker stop sends SIGTERM
+        atexit.register(self.shutdown)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
         self.schedule_checks()
+        self.retention.start()
 
         # Run first check immediately
         self.run_all_checks()
@@ -965,9 +1059,13 @@ class SmartSchoolMonitor:
         while True:
             try:
                 schedule.run_pending()
+                self.flush_state()
                 time.sleep(60)
             except KeyboardInterrupt:
                 logger.info("Monitor stopped by user")
+                self.shutdown()
+                if self.driver_pool:
+                    self.driver_pool.close()
                 break
             except Exception as e:
                 logger.error(f"Scheduler error: {e}")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Background retention and compaction of the homework state
+
+Left alone, the state and token_cache.json keep every student that was
+ever in config.yaml and the store keeps every item it was ever handed. A
+RetentionJob runs on its own thread every RETENTION_INTERVAL hours (and
+once at startup) and
+
+    drops students that are no longer in config.yaml from the state
+        (STATE_DROP_REMOVED_STUDENTS, default true)
+    drops their cached tokens from token_cache.json
+    drops items whose homework day is more than STATE_RETENTION_DAYS days
+        old (0 keeps everything); they stay in the history archive
+        (history_archive) when HISTORY_ARCHIVE is on
+    deletes detection history older than that (SQLite backend)
+    then compacts the store (journal snapshot, SQLite WAL checkpoint)
+
+Checks never wait for a run: the job takes the monitor's state lock for one
+student at a time, to change or to write that student, and the slow parts
+(scanning students that aren't in memory, pruning, compaction) happen
+outside it. An empty or unreadable config.yaml never drops anything.
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from loguru import logger
+
+from durable_io import read_durable, write_durable, durable_exists
+from state_store import StudentStateCache
+
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_INTERVAL_HOURS = 24
+
+
+@dataclass
+class RetentionPolicy:
+    drop_removed_students: bool = True
+    max_age_days: int = DEFAULT_RETENTION_DAYS      # 0 keeps items of any age
+    interval_hours: float = DEFAULT_INTERVAL_HOURS
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            drop_removed_students=os.getenv('STATE_DROP_REMOVED_STUDENTS', 'true').lower() == 'true',
+            max_age_days=int(os.getenv('STATE_RETENTION_DAYS', str(DEFAULT_RETENTION_DAYS))),
+            interval_hours=float(os.getenv('RETENTION_INTERVAL', str(DEFAULT_INTERVAL_HOURS))),
+        )
+
+    def cutoff(self, today=None):
+        """First day that is kept (YYYY-MM-DD), None if items never expire"""
+        if self.max_age_days <= 0:
+            return None
+        return ((today or date.today()) - timedelta(days=self.max_age_days)).isoformat()
+
+
+def expire_entries(entries, cutoff):
+    """entries without the items of days before cutoff; entries itself if nothing expired"""
+    kept = {key: tracked for key, tracked in entries.items() if not tracked.item.day or tracked.item.day >= cutoff}
+    return entries if len(kept) == len(entries) else kept
+
+
+def prune_token_cache(token_file, usernames):
+    """Remove the cached tokens of users not in usernames, returns the removed usernames"""
+    if not durable_exists(token_file):
+        return []
+    cache = read_durable(token_file, json.loads, allow_external=True)
+    removed = [username for username in cache if username not in usernames]
+    if removed:
+        for username in removed:
+            del cache[username]
+        write_durable(token_file, json.dumps(cache, indent=2))
+    return removed
+
+
+class RetentionJob:
+    """
+    Applies a RetentionPolicy to a monitor's state in the background
+
+    Uses the monitor's students (config.yaml), homework_state, state_lock,
+    state_store, token_file and token_lock.
+    """
+
+    def __init__(self, monitor, policy=None):
+        self.monitor = monitor
+        self.policy = policy or RetentionPolicy.from_env()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="state-retention", daemon=True)
+            self._thread.start()
+            logger.info(f"State retention runs every {self.policy.interval_hours:g}h "
+                        f"(drop removed students: {self.policy.drop_removed_students}, "
+                        f"keep days: {self.policy.max_age_days or 'all'})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"State retention failed: {e}")
+            self._stop.wait(self.policy.interval_hours * 3600)
+
+    def run_once(self, today=None):
+        """Apply the policy once, returns (dropped students, expired items, removed tokens, pruned detections)"""
+        monitor = self.monitor
+        roster = [student for student in monitor.students if isinstance(student, dict)]
+        names = {student.get('name', 'Unknown') for student in roster}
+        usernames = {student.get('username') for student in roster if student.get('username')}
+        cutoff = self.policy.cutoff(today)
+
+        dropped = []
+        if self.policy.drop_removed_students and names:
+            dropped = self._drop_students(names)
+        expired, expiring = self._expire_items(cutoff) if cutoff else (0, [])
+
+        tokens = []
+        if self.policy.drop_removed_students and usernames:
+            with monitor.token_lock:
+                tokens = prune_token_cache(monitor.token_file, usernames)
+
+        self._flush(dropped + expiring)
+
+        store = monitor.state_store
+        detections = store.prune_history(cutoff) if cutoff else 0
+        if dropped or expired or detections:
+            store.compact()
+
+        if dropped or expired or tokens or detections:
+            logger.info(f"State retention: dropped students {dropped or 'none'}, {expired} items before "
+                        f"{cutoff}, tokens of {tokens or 'none'}, {detections} detections")
+        return dropped, expired, tokens, detections
+
+    def _drop_students(self, names):
+        monitor = self.monitor
+        with monitor.state_lock:
+            removed = [student for student in monitor.homework_state if student not in names]
+            for student in removed:
+                del monitor.homework_state[student]
+            if removed:
+                monitor.state_store.mark_dirty(removed)
+        return removed
+
+    def _expiring_students(self, cutoff):
+        """Students that may have expired items"""
+        monitor = self.monitor
+        with monitor.state_lock:
+            if not isinstance(monitor.homework_state, StudentStateCache):
+                return list(monitor.homework_state)
+            students = set(monitor.homework_state.resident)
+
+        # Students that aren't in memory are read from the store outside the
+        # lock; only those with something to expire are loaded into the state
+        for student, entries in monitor.state_store.iter_students():
+            if entries and expire_entries(entries, cutoff) is not entries:
+                students.add(student)
+        return sorted(students)
+
+    def _expire_items(self, cutoff):
+        """(items expired, students that lost items)"""
+        monitor = self.monitor
+        expired = 0
+        students = []
+        for student in self._expiring_students(cutoff):
+            if self._stop.is_set():
+                break
+            # One student per lock, so a check waits for one student at most
+            with monitor.state_lock:
+                if student not in monitor.homework_state:
+                    continue
+                entries = monitor.homework_state[student]
+                kept = expire_entries(entries, cutoff)
+                if kept is not entries:
+                    monitor.homework_state[student] = kept
+                    monitor.state_store.mark_dirty([student])
+                    expired += len(entries) - len(kept)
+                    students.append(student)
+        return expired, students
+
+    def _flush(self, students):
+        """Write the changed students one per lock, instead of a whole flush_state() under it"""
+        monitor = self.monitor
+        for student in students:
+            with monitor.state_lock:
+                monitor.state_store.flush_students(monitor.homework_state, [student])
+                if isinstance(monitor.homework_state, StudentStateCache):
+                    monitor.homework_state.trim()
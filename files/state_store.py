@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Homework state persistence
+
+The monitor keeps {student: {key: TrackedHomework}} in memory and hands it
+to a StateStore after every check. The backend is chosen with STATE_BACKEND:
+
+    json     homework_state/, one JSON file per student; a save rewrites the
+             files of the students that changed (default)
+    sqlite   homework_state.db (SQLite, WAL); only rows that changed are written
+    journal  snapshot plus an append-only journal of changes, compacted in
+             the background
+
+Stores remember what they last persisted, so a save only has to look at the
+students that were checked and only writes what differs.
+
+The json backend's files and the journal snapshot are JSON, or binary
+snapshots with STATE_SNAPSHOT_FORMAT=binary (state_codec); either is read
+back whatever the setting.
+
+Every file is written with durable_io (temp file, fsync, rename, checksum),
+so a crash mid-write leaves the previous generation to recover from.
+
+Checks mark their student dirty instead of saving right away; flush() writes
+the dirty students at most once per STATE_FLUSH_INTERVAL seconds (forced
+after a round of checks and on shutdown).
+
+The json and sqlite backends can load one student at a time. open_state()
+then returns a StudentStateCache: a student's homework is loaded when a
+check first touches it, and only STATE_CACHE_STUDENTS students are kept in
+memory (least recently used ones are dropped once their changes are saved).
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+
+from loguru import logger
+
+from durable_io import read_durable, write_durable, durable_exists, durable_files, durable_remove
+
+from homework_model import stale_key_count, state_from_json, student_state_from_json, student_state_to_json
+from homework_query import page_of
+from state_codec import decode_state, encode_state, is_binary, snapshot_format
+
+BACKENDS = ('json', 'sqlite', 'journal')
+DEFAULT_FLUSH_INTERVAL = 30
+DEFAULT_CACHE_STUDENTS = 4
+
+
+class StateStore:
+    """Base class: tracks the persisted copy of every student's state"""
+
+    # True if the backend can load one student without reading the others
+    lazy = False
+
+    def __init__(self, path, flush_interval=None, read_only=False):
+        self.path = Path(path)
+        # Readers never change the files (see open_state_store)
+        self.read_only = read_only
+        self._persisted = {}
+        self._stored = None
+        if flush_interval is None:
+            flush_interval = float(os.getenv('STATE_FLUSH_INTERVAL', str(DEFAULT_FLUSH_INTERVAL)))
+        self.flush_interval = flush_interval
+        self._dirty = set()
+        self._dirty_all = False
+        self._last_flush = None
+
+    def load(self):
+        """Whole state as {student: {key: TrackedHomework}}"""
+        state = self._load()
+        self._persisted = {student: dict(entries) for student, entries in state.items()}
+        self._stored = set(state)
+        return state
+
+    def students(self):
+        """Names of the stored students"""
+        if self._stored is None:
+            self._stored = set(self._students())
+        return self._stored
+
+    def has_student(self, student):
+        if self._stored is not None:
+            return student in self._stored
+        return self._has_student(student)
+
+    def load_student(self, student):
+        """One student's {key: TrackedHomework}, None if the student isn't stored"""
+        entries = self._load_student(student)
+        if entries is not None:
+            self._persisted[student] = dict(entries)
+        return entries
+
+    def forget(self, student):
+        """Drop the persisted copy of a student that is no longer kept in memory"""
+        self._persisted.pop(student, None)
+
+    def query(self, query):
+        """Answer a HomeworkQuery (homework_query) without keeping the whole state in memory"""
+        if query.student is not None:
+            entries = self._load_student(query.student)
+            students = [(query.student, entries)] if entries is not None else []
+        else:
+            students = self.iter_students()
+        return page_of(query, students)
+
+    def save(self, state, students=None):
+        """Persist state; students: names that may have changed (None = all)"""
+        if self.read_only:
+            raise RuntimeError(f"{self.path} was opened read-only")
+        if students is None:
+            students = list(state)
+            dropped = [student for student in self.students() if student not in state]
+        else:
+            dropped = [student for student in students if student not in state and self.has_student(student)]
+            students = [student for student in students if student in state]
+
+        changes = {}
+        for student in students:
+            upserts, removed = self._changes(student, state[student])
+            if upserts or removed or student not in self._persisted:
+                changes[student] = (upserts, removed)
+
+        if not changes and not dropped:
+            return False
+
+        self._save(state, changes, dropped)
+
+        for student in changes:
+            self._persisted[student] = dict(state[student])
+        for student in dropped:
+            self._persisted.pop(student, None)
+        if self._stored is not None:
+            self._stored.update(changes)
+            self._stored.difference_update(dropped)
+        return True
+
+    @property
+    def pending(self):
+        """True if there are changes that haven't been flushed"""
+        return bool(self._dirty) or self._dirty_all
+
+    def is_pending(self, student):
+        return self._dirty_all or student in self._dirty
+
+    def mark_dirty(self, students=None):
+        """Mark students as changed; None marks the whole state (students may have been removed)"""
+        if students is None:
+            self._dirty_all = True
+        else:
+            self._dirty.update(students)
+
+    def flush(self, state, force=False):
+        """Save the dirty students if the flush interval has passed (or force), returns True if saved"""
+        if not self._dirty and not self._dirty_all:
+            return False
+        now = time.monotonic()
+        if not force and self._last_flush is not None and now - self._last_flush < self.flush_interval:
+            return False
+
+        students = None if self._dirty_all else sorted(self._dirty)
+        self.save(state, students)
+        self._dirty.clear()
+        self._dirty_all = False
+        self._last_flush = now
+        return True
+
+    def flush_students(self, state, students):
+        """Save some of the dirty students now, regardless of the flush interval"""
+        students = [student for student in students if self.is_pending(student)]
+        if not students:
+            return False
+        self.save(state, students)
+        self._dirty.difference_update(students)
+        return True
+
+    def _changes(self, student, entries):
+        """(upserted {key: TrackedHomework}, removed keys) since the last save"""
+        persisted = self._persisted.get(student, {})
+        upserts = {key: tracked for key, tracked in entries.items() if persisted.get(key) != tracked}
+        removed = [key for key in persisted if key not in entries]
+        return upserts, removed
+
+    def prune_history(self, before):
+        """Delete history the backend keeps of detections before a day (YYYY-MM-DD), returns the count"""
+        return 0
+
+    def compact(self):
+        """Reclaim the space of dropped students and items"""
+
+    def close(self):
+        pass
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _students(self):
+        return list(self._read_all())
+
+    def iter_students(self):
+        """(student, {key: TrackedHomework}) for every stored student"""
+        return iter(self._read_all().items())
+
+    def _has_student(self, student):
+        return student in self.students()
+
+    def _load_student(self, student):
+        return self._read_all().get(student)
+
+    def _read_all(self):
+        """Whole state for the readers above, without the side effects of load()"""
+        return self._load()
+
+    def _save(self, state, changes, dropped):
+        """changes: {student: (upserts, removed keys)}, dropped: students to delete"""
+        raise NotImplementedError
+
+
+def student_file_name(student):
+    """File name of a student's state (names are Hebrew, so a hash of the name)"""
+    return hashlib.blake2b(student.encode('utf-8'), digest_size=8).hexdigest() + '.json'
+
+
+class JsonStateStore(StateStore):
+    """
+    One JSON file per student in homework_state/
+
+    A single homework_state.json from older versions is read when the
+    directory doesn't exist yet, and renamed to homework_state.json.migrated
+    after the first save has written every student's file.
+    """
+
+    def __init__(self, path, flush_interval=None, read_only=False):
+        super().__init__(path, flush_interval, read_only)
+        self.directory = self.path.with_suffix('')
+        self.snapshot_format = snapshot_format()
+        self._legacy = False
+
+    @property
+    def lazy(self):
+        # A single legacy file has to be read whole
+        return self.directory.exists() or not durable_exists(self.path)
+
+    def exists(self):
+        return self.directory.exists() or durable_exists(self.path)
+
+    def _students(self):
+        return [student for student, _ in self.iter_students()]
+
+    def iter_students(self):
+        if not self.directory.exists():
+            return super().iter_students()
+        return (next(iter(self._read_student_file(student_file).items()))
+                for student_file in durable_files(self.directory, '*.json'))
+
+    def _has_student(self, student):
+        if not self.directory.exists():
+            return super()._has_student(student)
+        return durable_exists(self.directory / student_file_name(student))
+
+    def _load_student(self, student):
+        if not self.directory.exists():
+            return super()._load_student(student)
+        student_file = self.directory / student_file_name(student)
+        if not durable_exists(student_file):
+            return None
+        return self._read_student_file(student_file).get(student, {})
+
+    def _load(self):
+        if self.directory.exists():
+            state = {}
+            for student_file in durable_files(self.directory, '*.json'):
+                state.update(self._read_student_file(student_file))
+            return state
+
+        if durable_exists(self.path):
+            self._legacy = True
+            raw = read_durable(self.path, json.loads)
+            state = state_from_json(raw)
+            _log_rekeyed(sum(stale_key_count(raw[student], entries) for student, entries in state.items()))
+            return state
+        return {}
+
+    def _read_student_file(self, student_file):
+        state, rekeyed = read_durable(student_file, _parse_student_file)
+        _log_rekeyed(rekeyed)
+        return state
+
+    def _save(self, state, changes, dropped):
+        self.directory.mkdir(exist_ok=True, parents=True)
+        students = list(state) if self._legacy else list(changes)
+
+        for student in students:
+            self._write_student(student, state[student])
+        for student in dropped:
+            durable_remove(self.directory / student_file_name(student))
+
+        if self._legacy:
+            self.path.rename(self.path.with_name(self.path.name + '.migrated'))
+            self._legacy = False
+            logger.info(f"Split {self.path.name} into per-student files in {self.directory}")
+
+    def _write_student(self, student, entries):
+        if self.snapshot_format == 'binary':
+            data = encode_state({student: entries})
+        else:
+            data = json.dumps({'student': student, 'homework': student_state_to_json(entries)}, ensure_ascii=False)
+        write_durable(self.directory / student_file_name(student), data)
+
+
+def _parse_student_file(data):
+    """({student: entries}, entries re-keyed) from a student's file, binary or JSON"""
+    if is_binary(data):
+        return decode_state(data)
+    data = json.loads(data)
+    homework = data.get('homework', {})
+    entries = student_state_from_json(homework)
+    return {data['student']: entries}, stale_key_count(homework, entries)
+
+
+def _log_rekeyed(count):
+    if count:
+        logger.info(f"Re-keyed {count} homework state entries")
+
+
+class StudentStateCache(MutableMapping):
+    """
+    {student: {key: TrackedHomework}} that loads students from the store on
+    first access and keeps the capacity most recently used ones in memory
+
+    Students with changes that haven't been flushed are never dropped; call
+    trim() after a flush to drop them.
+    """
+
+    def __init__(self, store, capacity):
+        self.store = store
+        self.capacity = capacity
+        self._resident = OrderedDict()
+        self._removed = set()
+
+    def __getitem__(self, student):
+        entries = self._resident.get(student)
+        if entries is not None:
+            self._resident.move_to_end(student)
+            return entries
+        if student in self._removed:
+            raise KeyError(student)
+
+        entries = self.store.load_student(student)
+        if entries is None:
+            raise KeyError(student)
+        self._resident[student] = entries
+        self.trim()
+        return entries
+
+    def __setitem__(self, student, entries):
+        self._resident[student] = entries
+        self._resident.move_to_end(student)
+        self._removed.discard(student)
+        self.trim()
+
+    def __delitem__(self, student):
+        if student not in self:
+            raise KeyError(student)
+        self._resident.pop(student, None)
+        self._removed.add(student)
+
+    def __contains__(self, student):
+        if student in self._resident:
+            return True
+        return student not in self._removed and self.store.has_student(student)
+
+    def __iter__(self):
+        students = list(self._resident)
+        students += [student for student in sorted(self.store.students())
+                     if student not in self._resident and student not in self._removed]
+        return iter(students)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    @property
+    def resident(self):
+        """Students currently in memory"""
+        return list(self._resident)
+
+    def trim(self):
+        """Drop least recently used students beyond capacity whose changes are saved"""
+        while len(self._resident) > self.capacity:
+            # Never the student just used: a check assigns its new state
+            # before marking it dirty
+            newest = next(reversed(self._resident))
+            for student in self._resident:
+                if student != newest and not self.store.is_pending(student):
+                    break
+            else:
+                return
+            del self._resident[student]
+            self.store.forget(student)
+
+
+def open_state(store, capacity=None):
+    """
+    The state to check against: a StudentStateCache if the backend loads
+    students one at a time, else the whole state
+    """
+    if capacity is None:
+        capacity = int(os.getenv('STATE_CACHE_STUDENTS', str(DEFAULT_CACHE_STUDENTS)))
+    if capacity <= 0 or not store.lazy:
+        return store.load()
+    return StudentStateCache(store, capacity)
+
+
+def migrate_json_state(json_path, store):
+    """Import the JSON state (per-student files or homework_state.json) into another store, returns the number of items"""
+    state = JsonStateStore(json_path).load()
+    store.load()
+    store.save(state)
+    return sum(len(entries) for entries in state.values())
+
+
+def open_state_store(json_path, backend=None, read_only=False):
+    """
+    State store for STATE_BACKEND (json_path: the homework_state.json location)
+
+    A new SQLite database or journal is seeded from an existing
+    homework_state.json.
+
+    read_only: for tools that read the state while the monitor may be
+    running. Nothing on disk is migrated, repaired, re-keyed or compacted,
+    and saving raises. Without a backend, it's the one whose files are
+    there (detect_backend) rather than the tool's own STATE_BACKEND.
+    """
+    json_path = Path(json_path)
+    if read_only and not backend:
+        backend = detect_backend(json_path)
+    backend = (backend or os.getenv('STATE_BACKEND', 'json')).strip().lower()
+
+    if read_only:
+        return _open_read_only(json_path, backend)
+
+    if backend == 'sqlite':
+        from state_sqlite import SQLiteStateStore
+        db_path = json_path.with_suffix('.db')
+        is_new = not db_path.exists()
+        store = SQLiteStateStore(db_path)
+        if is_new and JsonStateStore(json_path).exists():
+            count = migrate_json_state(json_path, store)
+            logger.info(f"Imported {count} homework items from {json_path} into {db_path}")
+        return store
+
+    if backend == 'journal':
+        from state_journal import JournalStateStore
+        store = JournalStateStore(json_path)
+        if not store.snapshot_path.exists() and not store.journal_path.exists() \
+                and JsonStateStore(json_path).exists():
+            count = migrate_json_state(json_path, store)
+            logger.info(f"Imported {count} homework items from {json_path} into {store.journal_path}")
+        return store
+
+    if backend != 'json':
+        logger.warning(f"Unknown STATE_BACKEND '{backend}', using json")
+    return JsonStateStore(json_path)
+
+
+def detect_backend(json_path):
+    """
+    Backend whose files next to json_path were written last, None if there
+    is no state yet
+
+    A migrated JSON state stays behind next to the SQLite database or
+    journal, so the newest files are the ones in use.
+    """
+    json_path = Path(json_path)
+    files = {
+        'sqlite': (json_path.with_suffix('.db'), json_path.with_suffix('.db-wal')),
+        'journal': (json_path.with_suffix('.snapshot.json'), json_path.with_suffix('.journal')),
+        'json': (json_path.with_suffix(''), json_path),
+    }
+    written = {}
+    for backend, paths in files.items():
+        times = [path.stat().st_mtime_ns for path in paths if path.exists()]
+        if times:
+            written[backend] = max(times)
+    return max(written, key=written.get) if written else None
+
+
+def _open_read_only(json_path, backend):
+    if backend == 'sqlite':
+        db_path = json_path.with_suffix('.db')
+        if db_path.exists():
+            from state_sqlite import SQLiteStateStore
+            return SQLiteStateStore(db_path, read_only=True)
+    elif backend == 'journal':
+        from state_journal import JournalStateStore
+        store = JournalStateStore(json_path, read_only=True)
+        if store.snapshot_path.exists() or store.journal_path.exists():
+            return store
+    elif backend != 'json':
+        logger.warning(f"Unknown STATE_BACKEND '{backend}', using json")
+    # Not migrated yet: the JSON state is still the current one
+    return JsonStateStore(json_path, read_only=True)
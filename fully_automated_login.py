@@ -4,30 +4,44 @@ Fully automated login using undetected-chromedriver in headless mode
 No manual interaction required
 """
 
-import time
 import json
-import undetected_chromedriver as uc
 from datetime import datetime
 import yaml
 from pathlib import Path
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from chrome_pool import ChromeDriverPool
+from browser_waits import (
+    wait_for_page_ready, wait_for_element, wait_for_input_value,
+    wait_for_login, wait_for_cookie,
+)
+
+def load_students():
+    """Load students from config"""
+    config_path = Path("config/config.yaml")
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
 
-def fully_automated_login(headless=True):
-    """Fully automated login - no user interaction"""
+    return config['students']
+
+def fully_automated_login(headless=True, student=None, pool=None):
+    """
+    Fully automated login - no user interaction
+
+    Args:
+        headless: Run the browser without a window
+        student: Student entry from config (default: the first one)
+        pool: ChromeDriverPool to borrow a warm browser from. Pass the same
+              pool for a batch of logins so Chrome only starts once.
+    """
 
     print("=" * 60)
     print("SmartSchool FULLY Automated Login")
     print("=" * 60)
 
-    # Load config
-    config_path = Path("config/config.yaml")
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    if student is None:
+        student = load_students()[0]
 
-    student = config['students'][0]
     username = student['username']
     password = student['password']
     student_params = student.get('student_params')
@@ -36,23 +50,13 @@ def fully_automated_login(headless=True):
     print(f"Headless mode: {headless}")
     print("=" * 60)
 
-    # Setup undetected Chrome
+    # Borrow a browser from the pool (a private one for single logins)
     print("\n1. Initializing browser...")
-    options = uc.ChromeOptions()
-
-    if headless:
-        options.add_argument('--headless=new')  # New headless mode
-        options.add_argument('--disable-gpu')
+    owns_pool = pool is None
+    if owns_pool:
+        pool = ChromeDriverPool(size=1, headless=headless)
 
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_argument('--window-size=1920,1080')
-
-    # Add realistic user agent
-    options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36')
-
-    driver = uc.Chrome(options=options, use_subprocess=True, version_main=None)
+    driver = pool.checkout()
 
     try:
         # Navigate to login page
@@ -63,7 +67,7 @@ def fully_automated_login(headless=True):
 
         # Wait for Angular to initialize
         print("\n3. Waiting for page initialization...")
-        time.sleep(10)
+        wait_for_page_ready(driver, timeout=20)
 
         # Inject JavaScript to remove overlays and prepare page
         print("\n4. Preparing page...")
@@ -85,11 +89,7 @@ def fully_automated_login(headless=True):
         # Find and fill login form
         print("\n5. Filling login form...")
 
-        # Wait for input fields
-        wait = WebDriverWait(driver, 20)
-
         # Find username field (try multiple selectors)
-        username_field = None
         username_selectors = [
             "input[type='text']",
             "input[name='username']",
@@ -97,40 +97,27 @@ def fully_automated_login(headless=True):
             "//input[contains(@placeholder, 'שם')]",
         ]
 
-        for selector in username_selectors:
-            try:
-                if selector.startswith('//'):
-                    username_field = wait.until(EC.presence_of_element_located((By.XPATH, selector)))
-                else:
-                    username_field = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-
-                if username_field:
-                    print(f"✓ Found username field")
-                    break
-            except:
-                continue
-
-        if not username_field:
+        username_field, _ = wait_for_element(driver, username_selectors, timeout=20)
+        if username_field:
+            print(f"✓ Found username field")
+        else:
             print("✗ Could not find username field")
             driver.save_screenshot("error_screenshot.png")
             print("✓ Saved screenshot to error_screenshot.png")
-            driver.quit()
             return None
 
         # Fill username
         username_field.click()
-        time.sleep(0.5)
         username_field.send_keys(username)
+        wait_for_input_value(driver, username_field, username)
         print(f"✓ Entered username")
-        time.sleep(1)
 
         # Find password field
         password_field = driver.find_element(By.CSS_SELECTOR, "input[type='password']")
         password_field.click()
-        time.sleep(0.5)
         password_field.send_keys(password)
+        wait_for_input_value(driver, password_field, password)
         print(f"✓ Entered password")
-        time.sleep(1)
 
         # Submit form
         print("\n6. Submitting form...")
@@ -140,13 +127,13 @@ def fully_automated_login(headless=True):
         # Wait for login to complete or captcha to appear
         print("\n7. Waiting for login response...")
 
-        # Check for captcha
-        time.sleep(5)
+        # Give the login a few seconds before checking for captcha
+        signal, value = wait_for_login(driver, timeout=5, host=None)
 
-        # Check if recaptcha is present
+        # Check if recaptcha is present (only if we're still on the login page)
         captcha_present = False
         try:
-            captcha_iframe = driver.find_elements(By.CSS_SELECTOR, "iframe[src*='recaptcha']")
+            captcha_iframe = [] if signal else driver.find_elements(By.CSS_SELECTOR, "iframe[src*='recaptcha']")
             if captcha_iframe:
                 print("⚠️  reCAPTCHA detected on page")
                 captcha_present = True
@@ -169,52 +156,26 @@ def fully_automated_login(headless=True):
             print("   - Set environment variable: export CAPTCHA_API_KEY='your_key'")
             print("   - Re-run this script")
             print("=" * 60)
-            driver.quit()
             return None
 
         # Wait for successful login (URL change or token in cookies)
-        start_time = time.time()
-        token = None
-
-        while time.time() - start_time < 60:  # 1 minute timeout
-            current_url = driver.current_url
-
-            # Check if logged in
-            if 'login' not in current_url.lower():
-                print(f"✓ Login successful - redirected to: {current_url[:50]}...")
-                break
-
-            # Check for token
-            cookies = driver.get_cookies()
-            for cookie in cookies:
-                if cookie['name'] == 'webToken' and cookie['value']:
-                    token = cookie['value']
-                    print("✓ Token received")
-                    break
-
-            if token:
-                break
+        if not signal:
+            signal, value = wait_for_login(driver, timeout=60, host=None)  # 1 minute timeout
 
-            time.sleep(2)
+        if signal == 'url':
+            print(f"✓ Login successful - redirected to: {value[:50]}...")
+        elif signal == 'cookie':
+            print("✓ Token received")
 
         # Extract final token
         print("\n8. Extracting token...")
-        time.sleep(3)
-
-        cookies = driver.get_cookies()
-        web_token = None
-
-        for cookie in cookies:
-            if cookie['name'] == 'webToken':
-                web_token = cookie['value']
-                break
+        web_token = wait_for_cookie(driver, 'webToken', timeout=3)
 
         if not web_token:
             print("✗ Could not extract token")
             print("   Login may have failed or captcha was required")
             driver.save_screenshot("login_failed.png")
             print("✓ Saved screenshot to login_failed.png")
-            driver.quit()
             return None
 
         print(f"✓ Token extracted: {web_token[:50]}...")
@@ -243,7 +204,6 @@ def fully_automated_login(headless=True):
         print("✓ SUCCESS! Fully automated login completed")
         print("=" * 60)
 
-        driver.quit()
         return web_token
 
     except Exception as e:
@@ -257,19 +217,35 @@ def fully_automated_login(headless=True):
         except:
             pass
 
-        driver.quit()
         return None
 
+    finally:
+        # Wipes the session so the next account starts clean
+        pool.checkin(driver)
+        if owns_pool:
+            pool.close()
+
 if __name__ == "__main__":
     import sys
 
     # Check if user wants headless or with GUI
     headless = True
-    if len(sys.argv) > 1 and sys.argv[1] == '--gui':
+    if '--gui' in sys.argv[1:]:
         headless = False
         print("Running with GUI (you can see the browser)")
 
-    result = fully_automated_login(headless=headless)
+    if '--all' in sys.argv[1:]:
+        # Log in every configured student with one warm browser
+        pool = ChromeDriverPool(size=1, headless=headless)
+        try:
+            results = [fully_automated_login(headless=headless, student=student, pool=pool)
+                       for student in load_students()]
+        finally:
+            pool.close()
+        result = all(results)
+        print(f"\n{sum(1 for r in results if r)}/{len(results)} logins succeeded")
+    else:
+        result = fully_automated_login(headless=headless)
 
     if result:
         print("\n✓ You can now run: python smartschool_monitor_v2.py")
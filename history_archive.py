@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Long-term homework history
+
+The homework state only holds what is currently on the timetable; items
+that were removed or aged out of the fetched window are dropped from it.
+The archive keeps every version of every item ever detected, outside the
+hot state:
+
+    history/
+        2026-03/
+            00000001773910800123456789.jsonl.gz
+            00000001773997200987654321.jsonl.gz
+        2026-04/
+            ...
+
+Items are partitioned by the month of their homework date, so "what
+homework was given in March" reads one directory. Every check that changed
+something writes one gzip-compressed segment of JSON lines per month it
+touched ("added", "modified" and "removed" events); segments are written
+atomically and never modified. When a month has more than
+HISTORY_MAX_SEGMENTS segments they are merged into one.
+"""
+
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from durable_io import atomic_write
+from homework_model import HomeworkItem
+from homework_query import page_of_rows
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+UNDATED = 'undated'
+DEFAULT_MAX_SEGMENTS = 16
+
+
+@dataclass
+class ArchivedHomework:
+    """One version of a homework item as recorded in the archive"""
+
+    student: str
+    item: HomeworkItem
+    detected_at: str
+    removed_at: str = None     # when it disappeared from the timetable
+    replaced: bool = False     # removed because the teacher edited it
+
+
+def partition_of(day):
+    """Partition (YYYY-MM) of a YYYY-MM-DD day"""
+    return day[:7] if len(day) >= 7 else UNDATED
+
+
+def _months_between(start, end):
+    """Partition names from the month of start to the month of end (YYYY-MM-DD)"""
+    year, month = int(start[:4]), int(start[5:7])
+    last = (int(end[:4]), int(end[5:7]))
+    while (year, month) <= last:
+        yield f"{year:04d}-{month:02d}"
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+class HistoryArchive:
+    """Date-partitioned, append-only archive of detected homework"""
+
+    def __init__(self, directory, max_segments=None):
+        self.directory = Path(directory)
+        if max_segments is None:
+            max_segments = int(os.getenv('HISTORY_MAX_SEGMENTS', str(DEFAULT_MAX_SEGMENTS)))
+        self.max_segments = max_segments
+        self._last_segment = 0
+
+    def exists(self):
+        return self.directory.exists()
+
+    # Writing
+
+    def record(self, student, diff, at):
+        """Archive the changes of a HomeworkDiff detected at timestamp at"""
+        records = []
+        for item in diff.added:
+            records.append({'event': 'added', 'at': at, 'student': student, 'item': item.to_dict()})
+        for previous, item in diff.modified:
+            records.append({'event': 'modified', 'at': at, 'student': student, 'item': item.to_dict(),
+                            'previous': previous.item.key})
+        for tracked in diff.removed:
+            records.append({'event': 'removed', 'at': at, 'student': student, 'key': tracked.item.key,
+                            'day': tracked.item.day, 'item': tracked.item.to_dict()})
+        self.append(records)
+
+    def seed(self, state):
+        """Archive the items of a whole state as added (first start with an archive)"""
+        records = [
+            {'event': 'added', 'at': tracked.detected_at, 'student': student, 'item': tracked.item.to_dict()}
+            for student, entries in state.items()
+            for tracked in entries.values()
+        ]
+        self.append(records)
+        return len(records)
+
+    def append(self, records):
+        """Write records as new segments, one per month"""
+        partitions = {}
+        for record in records:
+            day = record['day'] if 'day' in record else HomeworkItem.from_dict(record['item']).day
+            partitions.setdefault(partition_of(day), []).append(record)
+
+        for partition, partition_records in partitions.items():
+            directory = self.directory / partition
+            atomic_write(directory / self._segment_name(), _encode(partition_records))
+            segments = self.segments(partition)
+            if len(segments) > self.max_segments:
+                self._merge(partition, segments)
+
+    def _segment_name(self):
+        # Nanosecond timestamps sort in write order; never reuse one within this process
+        stamp = max(time.time_ns(), self._last_segment + 1)
+        self._last_segment = stamp
+        return f"{stamp:026d}{SEGMENT_SUFFIX}"
+
+    def _merge(self, partition, segments):
+        """Fold a month's segments into one (it takes the name of the newest)"""
+        records = []
+        for segment in segments:
+            records.extend(_read_segment(segment))
+        atomic_write(segments[-1], _encode(records))
+        for segment in segments[:-1]:
+            segment.unlink(missing_ok=True)
+        logger.debug(f"Merged {len(segments)} history segments of {partition}")
+
+    # Reading
+
+    def partitions(self):
+        """Partition names in the archive, oldest first"""
+        if not self.directory.exists():
+            return []
+        return sorted(path.name for path in self.directory.iterdir() if path.is_dir())
+
+    def segments(self, partition):
+        """Segment files of a partition, oldest first"""
+        return sorted((self.directory / partition).glob('*' + SEGMENT_SUFFIX))
+
+    def records(self, start=None, end=None):
+        """Raw records of the months overlapping start..end (YYYY-MM-DD, inclusive), in write order"""
+        if start and end:
+            partitions = [name for name in _months_between(start, end) if (self.directory / name).is_dir()]
+        else:
+            partitions = [name for name in self.partitions()
+                          if (not start or name == UNDATED or name >= start[:7])
+                          and (not end or name == UNDATED or name <= end[:7])]
+
+        seen = set()
+        for partition in partitions:
+            for segment in self.segments(partition):
+                for record in _read_segment(segment):
+                    # A merge interrupted before removing its sources leaves duplicates
+                    identity = (record.get('event'), record.get('at'), record.get('student'),
+                                record.get('key') or json.dumps(record.get('item'), sort_keys=True))
+                    if identity in seen:
+                        continue
+                    seen.add(identity)
+                    yield record
+
+    def items(self, start=None, end=None, student=None):
+        """Every archived version of the homework between start and end, ordered by date"""
+        versions = []
+        latest = {}     # (student, key) -> its newest ArchivedHomework
+        for record in self.records(start, end):
+            if student is not None and record['student'] != student:
+                continue
+            event = record['event']
+            if event == 'removed':
+                archived = latest.get((record['student'], record['key']))
+                if archived is not None and archived.removed_at is None:
+                    archived.removed_at = record['at']
+                continue
+
+            item = HomeworkItem.from_dict(record['item'])
+            if not _in_range(item.day, start, end):
+                continue
+            if event == 'modified':
+                previous = latest.get((record['student'], record.get('previous')))
+                if previous is not None and previous.removed_at is None:
+                    previous.removed_at = record['at']
+                    previous.replaced = True
+
+            existing = latest.get((record['student'], item.key))
+            if existing is not None and existing.removed_at is None:
+                continue  # still the same version
+            archived = ArchivedHomework(record['student'], item, record['at'])
+            versions.append(archived)
+            latest[(record['student'], item.key)] = archived
+
+        return sorted(versions, key=lambda archived: (archived.item.date or '', archived.student))
+
+    def query(self, query):
+        """Answer a HomeworkQuery (homework_query) over every archived version"""
+        versions = self.items(query.start, query.end, query.student)
+        return page_of_rows(query, ((archived.student, archived) for archived in versions))
+
+
+def _in_range(day, start, end):
+    return (not start or day >= start) and (not end or day <= end)
+
+
+def _encode(records):
+    lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+    return gzip.compress(lines.encode('utf-8'))
+
+
+def _read_segment(path):
+    return list(iter_segment(path))
+
+
+def iter_segment(path):
+    """Records of a segment file, streamed"""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+    except (OSError, EOFError, ValueError) as e:
+        logger.warning(f"Skipping the rest of unreadable history segment {path}: {e}")
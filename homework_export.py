@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Columnar export of homework for analytics
+
+Writes homework rows to Parquet files (CSV, gzipped, when pyarrow isn't
+installed) partitioned by the month of the homework date, in the layout
+pandas, DuckDB, Spark and pyarrow.dataset read as one table:
+
+    export/
+        history/month=2026-03/part-<timestamp>.parquet
+        history/_export_state.json
+        state/month=2026-03/part-<timestamp>.parquet
+
+history   every detection from the history archive (history_archive):
+          added, modified and removed events. Incremental: each run only
+          exports records newer than what the previous run exported, into
+          new part files; months whose segments haven't changed are
+          skipped without being read.
+state     the homework currently tracked, re-exported whole on every run.
+
+Rows are streamed from one segment (or one student) at a time and written
+in row groups of batch_size rows, so memory stays bounded however long the
+history is.
+"""
+
+import csv
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from durable_io import read_durable, write_durable, durable_exists
+from history_archive import iter_segment, partition_of
+from homework_model import HomeworkItem
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+COLUMNS = ('event', 'detected_at', 'student', 'key', 'day', 'date', 'subject', 'teacher', 'homework',
+           'description', 'lesson', 'previous', 'extra')
+FORMATS = ('parquet', 'csv')
+DEFAULT_BATCH_SIZE = 10000
+EXPORT_STATE = '_export_state.json'
+
+if PYARROW_AVAILABLE:
+    SCHEMA = pa.schema([(name, pa.int64() if name == 'lesson' else pa.string()) for name in COLUMNS])
+
+
+def export_format(fmt=None):
+    """fmt, or parquet if pyarrow is installed and csv otherwise"""
+    if fmt == 'parquet' and not PYARROW_AVAILABLE:
+        logger.warning("pyarrow not installed, exporting CSV instead. Install with: pip install pyarrow")
+        return 'csv'
+    return fmt or ('parquet' if PYARROW_AVAILABLE else 'csv')
+
+
+def record_row(record):
+    """Column values of a history record"""
+    item = HomeworkItem.from_dict(record.get('item') or {})
+    # Removals name the key the item was tracked under
+    key = record['key'] if 'key' in record else item.key
+    return _row(record.get('event'), record.get('at'), record.get('student'), key, item,
+                record.get('previous'), record.get('day'))
+
+
+def tracked_row(student, key, tracked):
+    """Column values of a tracked item of the current state"""
+    return _row('tracked', tracked.detected_at, student, key, tracked.item)
+
+
+def _row(event, detected_at, student, key, item, previous=None, day=None):
+    return (
+        event, detected_at, student, key, day or item.day, item.date, item.subject, item.teacher,
+        item.homework, item.description, item.lesson if type(item.lesson) is int else None, previous,
+        json.dumps(item.extra, ensure_ascii=False) if item.extra else None,
+    )
+
+
+class PartWriter:
+    """One part file of a month, written in batches"""
+
+    def __init__(self, directory, fmt, batch_size):
+        self.fmt = fmt
+        self.batch_size = batch_size
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = '.parquet' if fmt == 'parquet' else '.csv.gz'
+        self.path = directory / f"part-{time.time_ns():026d}{suffix}"
+        self.temp_path = self.path.with_name(self.path.name + '.tmp')
+        self.rows = 0
+        self._batch = []
+        if fmt == 'parquet':
+            self._writer = pq.ParquetWriter(str(self.temp_path), SCHEMA, compression='zstd')
+        else:
+            self._file = gzip.open(self.temp_path, 'wt', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(COLUMNS)
+
+    def write(self, row):
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        if self.fmt == 'parquet':
+            columns = list(zip(*self._batch))
+            self._writer.write_table(pa.table(
+                [pa.array(values, type=field.type) for values, field in zip(columns, SCHEMA)], schema=SCHEMA
+            ))
+        else:
+            self._writer.writerows(self._batch)
+        self.rows += len(self._batch)
+        self._batch = []
+
+    def close(self):
+        """Finish the file and move it into place; returns the number of rows"""
+        self._flush()
+        if self.fmt == 'parquet':
+            self._writer.close()
+        else:
+            self._file.close()
+        if self.rows:
+            os.replace(self.temp_path, self.path)
+        else:
+            self.temp_path.unlink(missing_ok=True)
+        return self.rows
+
+    def abort(self):
+        try:
+            if self.fmt == 'parquet':
+                self._writer.close()
+            else:
+                self._file.close()
+        finally:
+            self.temp_path.unlink(missing_ok=True)
+
+
+def export_history(archive, directory, fmt=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Export history records not exported yet; returns {month: rows written}
+
+    The export state remembers, per archive month, the segment files seen
+    and the newest detection time exported.
+    """
+    fmt = export_format(fmt)
+    directory = Path(directory) / 'history'
+    state_path = directory / EXPORT_STATE
+    exported = read_durable(state_path, json.loads) if durable_exists(state_path) else {}
+
+    written = {}
+    for partition in archive.partitions():
+        segments = archive.segments(partition)
+        names = [segment.name for segment in segments]
+        previous = exported.get(partition, {})
+        if previous.get('segments') == names:
+            continue
+
+        # Segments already exported are skipped; a merged segment carries
+        # records exported before, which the watermark filters out
+        known = set(previous.get('segments', ()))
+        watermark = previous.get('at')
+        newest = watermark or ''
+        writer = PartWriter(directory / f"month={partition}", fmt, batch_size)
+        try:
+            for segment in segments:
+                if segment.name in known:
+                    continue
+                for record in iter_segment(segment):
+                    at = record.get('at') or ''
+                    if watermark is not None and at <= watermark:
+                        continue
+                    writer.write(record_row(record))
+                    newest = max(newest, at)
+            rows = writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+
+        exported[partition] = {'segments': names, 'at': newest}
+        write_durable(state_path, json.dumps(exported, indent=2))
+        if rows:
+            written[partition] = rows
+            logger.info(f"Exported {rows} history records of {partition} to {writer.path}")
+
+    return written
+
+
+def export_state(store, directory, fmt=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Export the tracked homework, replacing the previous state export; returns {month: rows written}"""
+    fmt = export_format(fmt)
+    directory = Path(directory) / 'state'
+    old_parts = [path for path in directory.glob('month=*/part-*') if not path.name.endswith('.tmp')]
+
+    # One open part per month; students are read one at a time
+    writers = {}
+    try:
+        for student, entries in store.iter_students():
+            for key, tracked in entries.items():
+                month = partition_of(tracked.item.day)
+                writer = writers.get(month)
+                if writer is None:
+                    writer = writers[month] = PartWriter(directory / f"month={month}", fmt, batch_size)
+                writer.write(tracked_row(student, key, tracked))
+        written = {month: writer.close() for month, writer in writers.items()}
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    for path in old_parts:
+        path.unlink()
+    return written
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Homework item model
+
+HomeworkItem replaces the loose {date, subject, teacher, homework,
+description} dicts that flowed through extraction, state, MQTT and
+notifications. It is a frozen, slotted dataclass: no per-instance __dict__,
+subject/teacher/date strings are interned (they repeat across every item of
+a student), and the identity key used in homework_state.json is computed
+once when the item is created.
+
+Keys are BLAKE2b digests over the fixed field tuple, with the text fields
+normalized first (homework_normalize) so whitespace or bidi-mark edits keep
+the key. State files written with older keys (MD5-of-JSON, or another
+normalization) are re-keyed from their stored items on load, so an upgrade
+doesn't report every tracked item as new.
+
+Conversion to and from the JSON state format is lossless: keys the model
+doesn't know are kept in `extra`, missing fields stay missing.
+"""
+
+import hashlib
+import json
+import sys
+from dataclasses import dataclass, field
+
+from homework_normalize import normalize_text
+
+# Content fields; they make up the identity key
+FIELDS = ('date', 'subject', 'teacher', 'homework', 'description')
+# Fields stored in the state; the lesson slot is position metadata, not content
+STATE_FIELDS = FIELDS + ('lesson',)
+KEY_SEPARATOR = '\x1f'
+KEY_DIGEST_SIZE = 16
+
+
+def _intern(value):
+    """Intern strings, leave anything else as is"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _key_part(value):
+    if type(value) is str:
+        return value
+    if value is None:
+        return '\x00'
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def key_digest(date, subject, teacher, homework, description, extra=None):
+    """BLAKE2b hex over fields that are already normalized"""
+    try:
+        text = KEY_SEPARATOR.join((date, subject, teacher, homework, description))
+    except TypeError:
+        text = KEY_SEPARATOR.join(map(_key_part, (date, subject, teacher, homework, description)))
+    if extra:
+        text += KEY_SEPARATOR + json.dumps(extra, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(text.encode(), digest_size=KEY_DIGEST_SIZE).hexdigest()
+
+
+def fields_key(date, subject, teacher, homework, description, extra=None):
+    """Identity key (BLAKE2b hex) of an item given as its fields"""
+    return key_digest(date, normalize_text(subject), normalize_text(teacher),
+                      normalize_text(homework), normalize_text(description), extra)
+
+
+# Identifies how keys are computed; formats that store keys record it to know when to recompute them
+KEY_SCHEME = f"blake2b-{KEY_DIGEST_SIZE}/{'+'.join(normalize_text.steps) or 'raw'}"
+
+
+def item_key(item_dict):
+    """Identity key of an item dict (the key used in homework_state.json)"""
+    extra = {name: value for name, value in item_dict.items() if name not in STATE_FIELDS}
+    return fields_key(*(item_dict.get(name) for name in FIELDS), extra=extra)
+
+
+@dataclass(frozen=True, slots=True)
+class HomeworkItem:
+    """One homework entry; None means the field is absent from the source dict"""
+
+    date: str = None
+    subject: str = None
+    teacher: str = None
+    homework: str = None
+    description: str = None
+    lesson: int = None
+    extra: dict = field(default=None, hash=False, repr=False)
+    key: str = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'date', _intern(self.date))
+        object.__setattr__(self, 'subject', _intern(self.subject))
+        object.__setattr__(self, 'teacher', _intern(self.teacher))
+        if self.key is None:
+            key = fields_key(self.date, self.subject, self.teacher, self.homework, self.description, self.extra)
+            object.__setattr__(self, 'key', key)
+
+    @classmethod
+    def from_dict(cls, data, key=None):
+        """Build an item from a state/extraction dict (key: known identity key)"""
+        extra = {name: value for name, value in data.items() if name not in STATE_FIELDS} or None
+        return cls(
+            data.get('date'), data.get('subject'), data.get('teacher'),
+            data.get('homework'), data.get('description'), data.get('lesson'),
+            extra=extra, key=key,
+        )
+
+    def to_dict(self):
+        """The item as the dict stored in homework_state.json"""
+        data = {name: getattr(self, name) for name in STATE_FIELDS if getattr(self, name) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @property
+    def day(self):
+        """YYYY-MM-DD part of the date"""
+        return (self.date or '')[:10]
+
+    @property
+    def slot(self):
+        """Where the homework sits in the timetable: (day, lesson, subject)"""
+        return self.day, self.lesson, self.subject
+
+
+@dataclass(frozen=True, slots=True)
+class TrackedHomework:
+    """A homework item in the state with the time it was first seen"""
+
+    item: HomeworkItem
+    detected_at: str
+
+    @classmethod
+    def from_state(cls, entry):
+        """Build from a state entry; the item's key is recomputed from its fields"""
+        return cls(HomeworkItem.from_dict(entry.get('item', {})), entry.get('detected_at'))
+
+    def to_state(self):
+        return {'detected_at': self.detected_at, 'item': self.item.to_dict()}
+
+
+def student_state_from_json(entries):
+    """
+    {key: {'detected_at', 'item'}} -> {key: TrackedHomework}
+
+    Entries stored under an outdated key (MD5 keys from older versions) are
+    re-keyed. If two entries end up with the same key the earliest
+    detection is kept. Use stale_key_count() to tell whether that happened.
+    """
+    state, _ = rekey_student_state({key: TrackedHomework.from_state(entry) for key, entry in entries.items()})
+    return state
+
+
+def stale_key_count(stored_keys, entries):
+    """How many of stored_keys the loaded entries no longer use (re-keyed or folded)"""
+    return sum(key not in entries for key in stored_keys)
+
+
+def rekey_student_state(entries):
+    """
+    {stored key: TrackedHomework} -> ({key: TrackedHomework}, number re-keyed)
+
+    Entries whose stored key differs from their item's key move to the
+    item's key; on a collision the earliest detection is kept.
+    """
+    if all(key == tracked.item.key for key, tracked in entries.items()):
+        return entries, 0
+
+    state = {}
+    rekeyed = 0
+    for key, tracked in entries.items():
+        new_key = tracked.item.key
+        if new_key != key:
+            rekeyed += 1
+
+        existing = state.get(new_key)
+        if existing is None or (tracked.detected_at or '') < (existing.detected_at or ''):
+            state[new_key] = tracked
+
+    return state, rekeyed
+
+
+def student_state_to_json(state):
+    """{key: TrackedHomework} -> {key: {'detected_at', 'item'}}"""
+    return {key: tracked.to_state() for key, tracked in state.items()}
+
+
+def state_from_json(data):
+    """Whole homework_state.json content -> {student: {key: TrackedHomework}}"""
+    return {student: student_state_from_json(entries) for student, entries in data.items()}
+
+
+def state_to_json(state):
+    """{student: {key: TrackedHomework}} -> JSON-serializable state"""
+    return {student: student_state_to_json(entries) for student, entries in state.items()}
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Single-pass parser for the pupil card text scraped by Playwright
+
+The page text is read line by line once. Subject headers are found with a
+prefix trie over the known subject names instead of testing every subject
+with startswith() on every line, and the teacher pattern is compiled once.
+"""
+
+import re
+
+SUBJECTS = ('מתמטיקה', 'חשבון', 'גיאומטריה', 'עברית', 'שפה', 'אנגלית',
+            'מדע', 'מדעים', 'היסטוריה', 'גאוגרפיה', 'תנ"ך', 'ספרות',
+            'מדע וטכנולוגיה', 'חינוך גופני', 'אמנות', 'מוזיקה')
+
+HOMEWORK_MARKER = 'שיעורי בית'
+NOT_ENTERED = 'לא הוזן'
+
+# Hebrew "first last" teacher names, optionally with a geresh (e.g. ג'ני)
+TEACHER_PATTERN = re.compile(r"[א-ת]+'?[א-ת]* [א-ת]+")
+
+_END = object()
+
+
+class SubjectTrie:
+    """Prefix trie answering "does this line start with a known subject?\""""
+
+    def __init__(self, subjects=SUBJECTS):
+        self.root = {}
+        for subject in subjects:
+            node = self.root
+            for char in subject:
+                node = node.setdefault(char, {})
+            node[_END] = True
+
+    def starts_with_subject(self, line):
+        """True if any subject is a prefix of the line"""
+        node = self.root
+        for char in line:
+            node = node.get(char)
+            if node is None:
+                return False
+            if _END in node:
+                return True
+        return False
+
+
+SUBJECT_TRIE = SubjectTrie()
+
+
+def parse_homework_text(text, date, subjects=SUBJECT_TRIE):
+    """
+    Parse homework items from page text content
+
+    A line starting with a known subject opens a lesson, a "first last" name
+    line sets its teacher, and "שיעורי בית: ..." yields a homework item.
+
+    Args:
+        text: inner text of the pupil card page
+        date: date (YYYY-MM-DD) assigned to every parsed item
+        subjects: SubjectTrie of subject names
+    """
+    homework_items = []
+    starts_with_subject = subjects.starts_with_subject
+    match_teacher = TEACHER_PATTERN.fullmatch
+
+    current_subject = None
+    current_teacher = None
+    homework_text = ""
+
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        if starts_with_subject(line):
+            current_subject = line
+
+        if match_teacher(line):
+            current_teacher = line
+
+        if HOMEWORK_MARKER in line:
+            _, colon, hw = line.partition(':')
+            if colon:
+                hw = hw.strip()
+                if hw and hw != NOT_ENTERED:
+                    homework_text = hw
+
+        if homework_text and current_subject:
+            homework_items.append({
+                'date': date,
+                'subject': current_subject,
+                'teacher': current_teacher or 'Unknown',
+                'homework': homework_text,
+                'description': ''
+            })
+            homework_text = ""
+
+    return homework_items
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Per-account login outcome cache with exponential backoff
+
+Failed logins (CAPTCHA required, half-authenticated sessions, rejected
+credentials, network errors) are recorded per account and login backend.
+Until the backoff for a backend expires, checks skip it and go straight to
+cached tokens or the next backend instead of repeating an expensive login
+that is likely to fail again and may get the account locked.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+from loguru import logger
+
+from durable_io import read_durable, write_durable, durable_exists
+
+# First backoff per failure reason (seconds), doubled on every repeated failure
+REASON_BASE_DELAYS = {
+    'captcha': 3600,
+    'half_authenticated': 1800,
+    'rejected': 900,
+    'error': 300,
+}
+DEFAULT_BASE_DELAY = 600
+
+
+class LoginOutcomeCache:
+    """Records failed logins per account/backend and computes backoff"""
+
+    def __init__(self, path, max_delay=None):
+        """
+        Args:
+            path: JSON file the outcomes are persisted to
+            max_delay: Longest backoff in seconds (default: LOGIN_BACKOFF_MAX or 6 hours)
+        """
+        self.path = path
+        if max_delay is None:
+            max_delay = int(os.getenv('LOGIN_BACKOFF_MAX', str(6 * 3600)))
+        self.max_delay = max_delay
+        self.outcomes = {}
+        self.load()
+
+    def load(self):
+        """Load recorded outcomes"""
+        if not durable_exists(self.path):
+            return
+
+        try:
+            self.outcomes = read_durable(self.path, json.loads)
+        except Exception as e:
+            logger.error(f"Failed to load login outcomes: {e}")
+            self.outcomes = {}
+
+    def save(self):
+        """Persist recorded outcomes"""
+        try:
+            write_durable(self.path, json.dumps(self.outcomes, indent=2))
+        except Exception as e:
+            logger.error(f"Failed to save login outcomes: {e}")
+
+    def backoff_remaining(self, username, backend):
+        """Seconds until the backend may be tried again for this account (0 = now)"""
+        outcome = self.outcomes.get(username, {}).get(backend)
+        if not outcome:
+            return 0
+
+        retry_after = datetime.fromisoformat(outcome['retry_after'])
+        return max(0, (retry_after - datetime.now()).total_seconds())
+
+    def failure_reason(self, username, backend):
+        """Reason of the last recorded failure, or None"""
+        outcome = self.outcomes.get(username, {}).get(backend)
+        return outcome['reason'] if outcome else None
+
+    def record_failure(self, username, backend, reason):
+        """Record a failed login and start (or extend) the backoff"""
+        account = self.outcomes.setdefault(username, {})
+        previous = account.get(backend, {})
+        failures = previous.get('failures', 0) + 1
+
+        base_delay = REASON_BASE_DELAYS.get(reason, DEFAULT_BASE_DELAY)
+        delay = min(base_delay * 2 ** (failures - 1), self.max_delay)
+        now = datetime.now()
+
+        account[backend] = {
+            'reason': reason,
+            'failures': failures,
+            'last_failure': now.isoformat(),
+            'retry_after': (now + timedelta(seconds=delay)).isoformat(),
+        }
+        self.save()
+
+        logger.warning(f"{backend} login for {username} failed ({reason}, {failures}x) - backing off {delay / 60:.0f} min")
+
+    def record_success(self, username, backend):
+        """Clear the failure record after a successful login"""
+        account = self.outcomes.get(username)
+        if account and account.pop(backend, None) is not None:
+            if not account:
+                del self.outcomes[username]
+            self.save()
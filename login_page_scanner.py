@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Single-pass scanner for the mobile login page (default.aspx)
+
+The mobile login needs two things from the page: the value of the hidden
+"platform" input and the hidden security field inside the captchaWrapper
+div. Instead of running several regexes over the whole HTML, the scanner
+walks the <input> and <div> tags once, can be fed the response in chunks as
+it streams in, and stops as soon as both have been found.
+"""
+
+import codecs
+import re
+
+# Only the tags the scanner cares about in its current state; everything else
+# is skipped inside the regex engine
+OUTSIDE_PATTERN = re.compile(r'<(input)\b([^>]*)>|<(div)\b([^>]*captchawrapper[^>]*)>', re.IGNORECASE)
+WRAPPER_ONLY_PATTERN = re.compile(r'<()()(div)\b([^>]*captchawrapper[^>]*)>', re.IGNORECASE)
+INSIDE_PATTERN = re.compile(r'<(input)\b([^>]*)>|<(/div)()\s*>', re.IGNORECASE)
+ATTR_PATTERN = re.compile(r'([\w:-]+)\s*=\s*(["\'])(.*?)\2', re.DOTALL)
+
+PLATFORM_ID = 'platform'
+CAPTCHA_WRAPPER_ID = 'captchawrapper'
+
+
+def _attributes(tag_body):
+    """Attributes of a tag as a dict with lowercase names"""
+    return {name.lower(): value for name, _, value in ATTR_PATTERN.findall(tag_body)}
+
+
+class LoginPageScanner:
+    """Incremental scanner for the platform and captcha security fields"""
+
+    def __init__(self):
+        self.platform = None
+        self.security_id = None
+        self.security_value = None
+        self._buffer = ''
+        self._in_wrapper = False
+        self._wrapper_done = False
+        self._fallback = None
+
+    @property
+    def done(self):
+        """True once both fields are resolved and the rest of the page can be skipped"""
+        return self.platform is not None and self._wrapper_done
+
+    @property
+    def security(self):
+        """(id, value) of the captcha security field, or (None, None)"""
+        return self.security_id, self.security_value
+
+    def feed(self, text):
+        """Scan the next chunk of HTML, returns self.done"""
+        if self.done:
+            return True
+
+        buffer = self._buffer + text
+
+        # Keep an unfinished tag at the end of the chunk for the next feed
+        end = len(buffer)
+        last_open = buffer.rfind('<')
+        if last_open > buffer.rfind('>'):
+            end = last_open
+
+        position = 0
+        while not self.done:
+            match = self._pattern().search(buffer, position, end)
+            if not match:
+                break
+            name, body, other_name, other_body = match.groups()
+            if name:
+                self._tag('input', body)
+            else:
+                self._tag(other_name.lower(), other_body)
+            position = match.end()
+
+        self._buffer = buffer[end:]
+        return self.done
+
+    def close(self):
+        """Finish scanning (end of document)"""
+        if self._in_wrapper and not self._wrapper_done:
+            self._finish_wrapper()
+        self._buffer = ''
+
+    def _pattern(self):
+        """Tags that can still change the result"""
+        if self._in_wrapper:
+            return INSIDE_PATTERN
+        if self.platform is None:
+            return OUTSIDE_PATTERN
+        return WRAPPER_ONLY_PATTERN
+
+    def _tag(self, name, body):
+        if name == '/div':
+            if self._in_wrapper:
+                self._finish_wrapper()
+            return
+
+        if name == 'div':
+            if not self._wrapper_done and not self._in_wrapper:
+                if _attributes(body).get('id', '').lower() == CAPTCHA_WRAPPER_ID:
+                    self._in_wrapper = True
+            return
+
+        # <input>
+        attributes = _attributes(body)
+        input_id = attributes.get('id')
+
+        if self.platform is None and input_id and input_id.lower() == PLATFORM_ID and attributes.get('value'):
+            self.platform = attributes['value']
+
+        if self._in_wrapper and input_id and 'value' in attributes:
+            if attributes.get('type', '').lower() == 'hidden':
+                self.security_id, self.security_value = input_id, attributes['value']
+                self._finish_wrapper()
+            elif self._fallback is None:
+                self._fallback = (input_id, attributes['value'])
+
+    def _finish_wrapper(self):
+        """The wrapper's first </div> ends the search for the security field"""
+        if self.security_id is None and self._fallback:
+            self.security_id, self.security_value = self._fallback
+        self._in_wrapper = False
+        self._wrapper_done = True
+
+
+def scan_login_page(html):
+    """Scan a complete login page"""
+    scanner = LoginPageScanner()
+    scanner.feed(html)
+    scanner.close()
+    return scanner
+
+
+def scan_login_response(response, chunk_size=16384):
+    """
+    Scan a streamed HTTP response (requests or curl_cffi, stream=True)
+
+    Stops reading once both fields are found. The caller closes the response.
+    """
+    scanner = LoginPageScanner()
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if scanner.feed(decoder.decode(chunk)):
+            break
+    else:
+        scanner.feed(decoder.decode(b'', final=True))
+
+    scanner.close()
+    return scanner
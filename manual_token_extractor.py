@@ -24,6 +24,8 @@ from pathlib import Path
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from loguru import logger
+from browser_waits import wait_for_url, wait_for_page_ready, wait_for_cookie, left_login_page
+from network_capture import LoginResponseCapture, enable_performance_log
 
 def extract_token_manually(username):
     """Open browser for manual login and extract token"""
@@ -40,6 +42,7 @@ def extract_token_manually(username):
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
     options.add_argument('--window-size=1920,1080')
+    enable_performance_log(options)
 
     driver = None
 
@@ -52,6 +55,10 @@ def extract_token_manually(username):
         driver.get(login_url)
         logger.info("Navigated to login page")
 
+        # Listen for the login response while the user logs in
+        capture = LoginResponseCapture(driver)
+        capture.start()
+
         print("\n" + "="*70)
         print("PLEASE LOGIN MANUALLY NOW")
         print("="*70)
@@ -63,105 +70,111 @@ def extract_token_manually(username):
 
         # Wait for user to login
         logger.info("Waiting for manual login...")
-        start_time = time.time()
-        login_successful = False
 
-        while time.time() - start_time < 300:  # 5 minute timeout
-            current_url = driver.current_url.lower()
+        def login_page_left():
+            url = driver.current_url
+            return url if left_login_page(url) else None
 
-            # Check if we've left the login page
-            if 'login' not in current_url and 'webtop.smartschool.co.il' in current_url:
-                logger.info(f"Login detected! Current URL: {driver.current_url}")
-                login_successful = True
-                break
+        # The login response carries the token - no need to hunt for it. Leaving
+        # the login page ends the wait too, in case the capture misses the response
+        web_token, _ = capture.wait(timeout=300, until_token=True, until=login_page_left)  # 5 minute timeout
+        cookies = []
 
-            time.sleep(2)
+        if web_token:
+            logger.info("✓ Captured webToken from login response!")
+        else:
+            if capture.available:
+                current_url = capture.until_result
+            else:
+                # Wait until we've left the login page
+                current_url = wait_for_url(driver, left_login_page, timeout=300)  # 5 minute timeout
 
-        if not login_successful:
-            logger.error("Login was not detected within timeout period")
-            return False
+            if not current_url:
+                logger.error("Login was not detected within timeout period")
+                return False
 
-        # Give time for all cookies to be set
-        logger.info("Waiting for tokens to be set...")
-        time.sleep(5)
-
-        # The token is likely set for the API server domain, not the main site
-        # Let's try to trigger an API call or navigate to the API server
-        logger.info("Triggering API call to set token cookie on API server domain...")
-
-        try:
-            # Execute JavaScript to make an API call from the page
-            # This will cause the browser to set the cookie for the API domain
-            driver.execute_script("""
-                fetch('https://webtopserver.smartschool.co.il/server/api/PupilCard/GetPupilLessonsAndHomework', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({})
-                }).catch(() => {});
-            """)
-            logger.info("Triggered API call")
-            time.sleep(3)
-        except Exception as e:
-            logger.warning(f"Failed to trigger API call: {e}")
-
-        # Try navigating to different pages to trigger token setting
-        pages_to_try = [
-            "https://webtop.smartschool.co.il/",
-            "https://webtop.smartschool.co.il/dashboard",
-            "https://webtop.smartschool.co.il/account"
-        ]
-
-        for page_url in pages_to_try:
-            try:
-                logger.info(f"Navigating to {page_url}...")
-                driver.get(page_url)
-                time.sleep(2)
-            except Exception as e:
-                logger.warning(f"Failed to navigate to {page_url}: {e}")
+            logger.info(f"Login detected! Current URL: {current_url}")
 
-        # Extract token from cookies - check both main site and API server domain
-        web_token = None
+            # Give time for all cookies to be set
+            logger.info("Waiting for tokens to be set...")
+            wait_for_page_ready(driver, timeout=5)
 
-        # First, check cookies on the current page (main site)
-        cookies = driver.get_cookies()
-        logger.info(f"Found {len(cookies)} cookies on main site")
-        logger.info(f"Cookie names: {[c['name'] for c in cookies]}")
+            # The token is likely set for the API server domain, not the main site
+            # Let's try to trigger an API call or navigate to the API server
+            logger.info("Triggering API call to set token cookie on API server domain...")
 
-        for cookie in cookies:
-            if cookie['name'] == 'webToken':
-                web_token = cookie['value']
-                logger.info("✓ Found webToken in main site cookies!")
-                break
-
-        # If not found, navigate to the API server domain to check cookies there
-        if not web_token:
-            logger.info("Token not found on main site, checking API server domain...")
             try:
-                # Navigate to the API server domain
-                driver.get("https://webtopserver.smartschool.co.il/")
-                time.sleep(2)
-
-                # Get cookies from API server domain
-                api_cookies = driver.get_cookies()
-                logger.info(f"Found {len(api_cookies)} cookies on API server")
-                logger.info(f"API server cookie names: {[c['name'] for c in api_cookies]}")
-
-                for cookie in api_cookies:
-                    logger.debug(f"API Cookie: {cookie['name']} = {cookie.get('value', '')[:50]}...")
-                    if cookie['name'] == 'webToken':
-                        web_token = cookie['value']
-                        logger.info("✓ Found webToken in API server cookies!")
-                        break
+                # Execute JavaScript to make an API call from the page
+                # This will cause the browser to set the cookie for the API domain
+                driver.execute_script("""
+                    fetch('https://webtopserver.smartschool.co.il/server/api/PupilCard/GetPupilLessonsAndHomework', {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json',
+                        },
+                        body: JSON.stringify({})
+                    }).catch(() => {});
+                """)
+                logger.info("Triggered API call")
+                wait_for_cookie(driver, 'webToken', timeout=3)
+            except Exception as e:
+                logger.warning(f"Failed to trigger API call: {e}")
+
+            # Try navigating to different pages to trigger token setting
+            pages_to_try = [
+                "https://webtop.smartschool.co.il/",
+                "https://webtop.smartschool.co.il/dashboard",
+                "https://webtop.smartschool.co.il/account"
+            ]
+
+            for page_url in pages_to_try:
+                try:
+                    logger.info(f"Navigating to {page_url}...")
+                    driver.get(page_url)
+                    wait_for_page_ready(driver, timeout=2)
+                except Exception as e:
+                    logger.warning(f"Failed to navigate to {page_url}: {e}")
+
+            # Extract token from cookies - check both main site and API server domain
+            web_token = None
+
+            # First, check cookies on the current page (main site)
+            cookies = driver.get_cookies()
+            logger.info(f"Found {len(cookies)} cookies on main site")
+            logger.info(f"Cookie names: {[c['name'] for c in cookies]}")
+
+            for cookie in cookies:
+                if cookie['name'] == 'webToken':
+                    web_token = cookie['value']
+                    logger.info("✓ Found webToken in main site cookies!")
+                    break
+
+            # If not found, navigate to the API server domain to check cookies there
+            if not web_token:
+                logger.info("Token not found on main site, checking API server domain...")
+                try:
+                    # Navigate to the API server domain
+                    driver.get("https://webtopserver.smartschool.co.il/")
+                    wait_for_cookie(driver, 'webToken', timeout=2)
+
+                    # Get cookies from API server domain
+                    api_cookies = driver.get_cookies()
+                    logger.info(f"Found {len(api_cookies)} cookies on API server")
+                    logger.info(f"API server cookie names: {[c['name'] for c in api_cookies]}")
+
+                    for cookie in api_cookies:
+                        logger.debug(f"API Cookie: {cookie['name']} = {cookie.get('value', '')[:50]}...")
+                        if cookie['name'] == 'webToken':
+                            web_token = cookie['value']
+                            logger.info("✓ Found webToken in API server cookies!")
+                            break
 
-                # If found, navigate back to main site
-                if web_token:
-                    driver.get("https://webtop.smartschool.co.il/dashboard")
-                    time.sleep(1)
+                    # If found, navigate back to main site
+                    if web_token:
+                        driver.get("https://webtop.smartschool.co.il/dashboard")
 
-            except Exception as e:
-                logger.warning(f"Failed to check API server cookies: {e}")
+                except Exception as e:
+                    logger.warning(f"Failed to check API server cookies: {e}")
 
         # Try localStorage if not in cookies
         if not web_token:
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Import the JSON homework state into another state backend
+
+The source is the per-student homework_state/ directory, or a single
+homework_state.json from older versions.
+
+The monitor seeds a new SQLite database on its own the first time it starts
+with STATE_BACKEND=sqlite; use this tool to import into an existing database
+or to check the result before switching.
+
+Usage:
+    python migrate_state.py                                   # config/homework_state(.json) -> config/homework_state.db
+    python migrate_state.py --source old_state.json --backend sqlite
+"""
+
+import argparse
+from pathlib import Path
+
+from state_store import JsonStateStore, open_state_store, migrate_json_state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import homework_state.json into another state backend")
+    parser.add_argument('--source', type=Path, default=Path("config/homework_state.json"),
+                        help="JSON state file (default: config/homework_state.json)")
+    parser.add_argument('--backend', default='sqlite', help="target backend (default: sqlite)")
+    args = parser.parse_args()
+
+    if not JsonStateStore(args.source).exists():
+        print(f"❌ State not found: {args.source} (or its per-student directory)")
+        return
+
+    store = open_state_store(args.source, backend=args.backend)
+    if isinstance(store, JsonStateStore):
+        print("❌ Target backend is the JSON file itself, nothing to do")
+        return
+
+    count = migrate_json_state(args.source, store)
+
+    # Read back and compare
+    imported = store.load()
+    original = JsonStateStore(args.source).load()
+    store.close()
+
+    if imported == original:
+        print(f"✅ Imported {count} homework items for {len(original)} students into {store.path}")
+    else:
+        print(f"⚠️  Imported {count} homework items into {store.path}, but the result differs from the source")
+
+
+if __name__ == "__main__":
+    main()
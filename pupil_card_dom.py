@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Structured extraction of lesson cards from the pupil card page
+
+Instead of pulling the whole page as text and guessing its structure in
+Python, PUPIL_CARD_SCRIPT runs inside the browser with one page.evaluate()
+call. It finds every homework block, climbs to the lesson card around it and
+returns a compact array of {subject, teacher, lesson, homework, date}, where
+date is the date of the nearest day header before the card.
+
+A day header is a short element holding nothing but a weekday name and a
+date ("ראשון 12.10", "יום שני, 13/10/2025"); the date may sit in an element
+of its own inside it. Other short dates, like a page number "4.2" or a
+score "3/5" in a card, are not headers.
+"""
+
+import re
+from datetime import date as date_cls, datetime
+
+from homework_text_parser import SUBJECTS, HOMEWORK_MARKER, NOT_ENTERED
+
+PUPIL_CARD_SCRIPT = r"""
+({subjects, marker, notEntered, weekdays}) => {
+    const teacherRe = /^[א-ת]+'?[א-ת]* [א-ת]+$/;
+    const lessonRe = /שיעור (\d+)/;
+    const lessonCountRe = /שיעור \d+/g;
+    const date = '(\\d{1,2}[./]\\d{1,2}(?:[./]\\d{2,4})?)';
+    const weekday = `(?:יום\\s+)?(?:${weekdays.join('|')})`;
+    const headerRe = new RegExp(`^${weekday}[\\s,]*${date}$|^${date}[\\s,]*${weekday}$`);
+    const markers = (text) => text.split(marker).length - 1;
+    const lessons = (text) => (text.match(lessonCountRe) || []).length;
+
+    // The date of the day header a leaf belongs to: the leaf, or a short
+    // element around it, is exactly a weekday and a date
+    const headerDate = (leaf) => {
+        for (let node = leaf; node && node !== document.body; node = node.parentElement) {
+            const text = node.textContent.trim().replace(/\s+/g, ' ');
+            if (text.length > 40) return null;
+            const match = text.match(headerRe);
+            if (match) return match[1] || match[2];
+        }
+        return null;
+    };
+
+    // A card is the largest ancestor holding a single homework block and lesson
+    const cardOf = (leaf) => {
+        let card = leaf;
+        while (card.parentElement && card.parentElement !== document.body) {
+            const text = card.parentElement.textContent;
+            if (markers(text) > 1 || lessons(text) > 1) break;
+            card = card.parentElement;
+        }
+        return card;
+    };
+
+    const cards = [];
+    const seen = new Set();
+    let currentDate = null;
+
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT);
+    for (let el = walker.nextNode(); el; el = walker.nextNode()) {
+        if (el.childElementCount !== 0) continue;
+        const text = el.textContent.trim();
+        if (!text) continue;
+
+        if (!text.includes(marker)) {
+            const headerDay = headerDate(el);
+            if (headerDay) currentDate = headerDay;
+            continue;
+        }
+
+        const card = cardOf(el);
+        if (seen.has(card)) continue;
+        seen.add(card);
+
+        const lines = card.innerText.split('\n').map(l => l.trim()).filter(Boolean);
+        let subject = null, teacher = null, lesson = null, homework = '';
+        lines.forEach((line, i) => {
+            if (subject === null && subjects.some(s => line.startsWith(s))) subject = line;
+            if (teacher === null && teacherRe.test(line)) teacher = line;
+            const lessonMatch = lesson === null && line.match(lessonRe);
+            if (lessonMatch) lesson = Number(lessonMatch[1]);
+            if (line.includes(marker)) {
+                const colon = line.indexOf(':');
+                homework = colon >= 0 ? line.slice(colon + 1).trim() : (lines[i + 1] || '');
+            }
+        });
+
+        if (subject && homework && homework !== notEntered) {
+            cards.push({subject, teacher, lesson, homework, date: currentDate});
+        }
+    }
+    return cards;
+}
+"""
+
+WEEKDAYS = ('ראשון', 'שני', 'שלישי', 'רביעי', 'חמישי', 'שישי', 'שבת')
+DATE_PATTERN = re.compile(r'(\d{1,2})[./](\d{1,2})(?:[./](\d{2,4}))?')
+
+
+def script_arguments():
+    """Argument object passed to PUPIL_CARD_SCRIPT"""
+    return {'subjects': list(SUBJECTS), 'marker': HOMEWORK_MARKER, 'notEntered': NOT_ENTERED,
+            'weekdays': list(WEEKDAYS)}
+
+
+def resolve_card_date(text, today=None):
+    """
+    Turn a day header date ("12.10", "12/10/2025") into YYYY-MM-DD
+
+    Headers without a year get the year that puts the date closest to today,
+    so a week spanning New Year resolves correctly. Returns None if the text
+    holds no valid date.
+    """
+    today = today or date_cls.today()
+    match = DATE_PATTERN.search(text or '')
+    if not match:
+        return None
+
+    day, month, year = match.groups()
+    try:
+        if year:
+            year = int(year)
+            if year < 100:
+                year += 2000
+            return date_cls(year, int(month), int(day)).isoformat()
+
+        candidates = []
+        for year in (today.year - 1, today.year, today.year + 1):
+            try:
+                candidates.append(date_cls(year, int(month), int(day)))
+            except ValueError:
+                pass
+        if not candidates:
+            return None
+        return min(candidates, key=lambda d: abs((d - today).days)).isoformat()
+    except ValueError:
+        return None
+
+
+def cards_to_homework_items(cards, today=None):
+    """Convert the array returned by PUPIL_CARD_SCRIPT to homework items"""
+    today = today or datetime.now().date()
+    fallback_date = today.isoformat()
+
+    items = []
+    for card in cards:
+        item = {
+            'date': resolve_card_date(card.get('date'), today) or fallback_date,
+            'subject': card['subject'],
+            'teacher': card.get('teacher') or 'Unknown',
+            'homework': card['homework'],
+            'description': ''
+        }
+        if card.get('lesson') is not None:
+            item['lesson'] = card['lesson']
+        items.append(item)
+    return items
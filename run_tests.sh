@@ -6,7 +6,7 @@ echo ""
 
 echo "📊 TEST 1: View Current Status"
 echo "-------------------------------"
-python view_homework.py 2>/dev/null | grep -E "Student|homework items|Token valid"
+python view_homework.py 2>/dev/null | grep -E "Student|items, page|Token valid"
 echo ""
 
 echo "🔄 TEST 2: Quick Check (No New Homework)"
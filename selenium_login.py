@@ -6,40 +6,38 @@ Handles reCAPTCHA by waiting for user to solve it
 
 import time
 import json
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from loguru import logger
+from chrome_pool import ChromeDriverPool
+from browser_waits import wait_for_page_ready, wait_for_element, wait_for_login, login_signal
+from network_capture import LoginResponseCapture
 
 
 class SmartSchoolSeleniumLogin:
     """Selenium-based login handler for SmartSchool"""
 
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, pool=None):
         """
         Initialize Selenium browser
 
         Args:
             headless: Run browser in headless mode (no window).
                       Set to False for first login to solve captcha.
+            pool: Optional ChromeDriverPool to borrow a warm browser from.
+                  Without one, a private single-browser pool is used.
         """
         self.headless = headless
+        self.pool = pool
+        self.owns_pool = pool is None
         self.driver = None
 
     def setup_driver(self):
-        """Setup Chrome driver with options"""
+        """Take a Chrome driver from the pool"""
         try:
-            options = uc.ChromeOptions()
+            if self.pool is None:
+                self.pool = ChromeDriverPool(size=1, headless=self.headless)
 
-            if self.headless:
-                options.add_argument('--headless')
-
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--window-size=1920,1080')
-
-            self.driver = uc.Chrome(options=options, use_subprocess=True)
+            self.driver = self.pool.checkout()
             logger.info("Chrome driver initialized successfully")
             return True
         except Exception as e:
@@ -71,13 +69,16 @@ class SmartSchoolSeleniumLogin:
             logger.info("Loaded login page")
 
             # Wait for page to load
-            time.sleep(3)
+            wait_for_page_ready(self.driver, timeout=10)
 
             # Find and fill username field
             logger.info("Looking for username field...")
-            username_field = WebDriverWait(self.driver, 30).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='text'], input[name='username'], input[id*='user']"))
+            username_field, _ = wait_for_element(
+                self.driver, "input[type='text'], input[name='username'], input[id*='user']", timeout=30
             )
+            if not username_field:
+                logger.error("Username field not found on login page")
+                return None
             username_field.clear()
             username_field.send_keys(username)
             logger.info("Username entered")
@@ -88,6 +89,10 @@ class SmartSchoolSeleniumLogin:
             password_field.send_keys(password)
             logger.info("Password entered")
 
+            # Listen for the login response before submitting
+            capture = LoginResponseCapture(self.driver)
+            capture.start()
+
             # Find and click login button
             login_button = self.driver.find_element(By.CSS_SELECTOR, "button[type='submit'], button[id*='login'], input[type='submit']")
             login_button.click()
@@ -97,28 +102,34 @@ class SmartSchoolSeleniumLogin:
             logger.warning("⚠️  PLEASE SOLVE THE CAPTCHA IN THE BROWSER WINDOW!")
             logger.warning("    Waiting up to 5 minutes for login to complete...")
 
-            # Wait for successful login (URL change or token in cookies)
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                # Check if URL changed (logged in)
-                current_url = self.driver.current_url
-                if 'login' not in current_url.lower():
-                    logger.info("Login successful - URL changed")
-                    break
-
-                # Check for webToken cookie
-                cookies = self.driver.get_cookies()
-                web_token = None
-                for cookie in cookies:
-                    if cookie['name'] == 'webToken':
-                        web_token = cookie['value']
-                        logger.info("Found webToken cookie")
-                        break
-
-                if web_token:
-                    break
-
-                time.sleep(2)
+            # The login response carries the token and the user data; a URL change
+            # or token cookie ends the wait too, in case the capture misses the response
+            web_token, login_data = capture.wait(timeout=timeout, until_token=True,
+                                                 until=lambda: login_signal(self.driver, host=None))
+            if web_token:
+                logger.info(f"Captured webToken from login response: {web_token[:50]}...")
+                student_params = None
+                if isinstance(login_data, dict):
+                    # User details are usually wrapped in a 'data' object
+                    user_data = login_data.get('data') if isinstance(login_data.get('data'), dict) else login_data
+                    student_params = self.extract_params_from_data(user_data)
+                if not student_params:
+                    student_params = self.get_student_params()
+
+                return {
+                    'token': web_token,
+                    'student_params': student_params
+                }
+
+            # Successful login without a captured token (URL change or token in cookies)
+            if capture.available:
+                signal, _ = capture.until_result or (None, None)
+            else:
+                signal, _ = wait_for_login(self.driver, timeout=timeout, host=None)
+            if signal == 'url':
+                logger.info("Login successful - URL changed")
+            elif signal == 'cookie':
+                logger.info("Found webToken cookie")
             else:
                 logger.error("Login timeout - captcha not solved or login failed")
                 return None
@@ -164,7 +175,7 @@ class SmartSchoolSeleniumLogin:
         """
         try:
             # Wait for page to load
-            time.sleep(5)
+            wait_for_page_ready(self.driver, timeout=10)
 
             # Method 1: Check localStorage
             try:
@@ -208,7 +219,7 @@ class SmartSchoolSeleniumLogin:
 
                 # Navigate to a page that will trigger the homework API
                 self.driver.get("https://webtop.smartschool.co.il/")
-                time.sleep(5)
+                wait_for_page_ready(self.driver, timeout=10)
 
                 # Check for API calls in performance logs
                 # This is simplified - in production you'd need to properly intercept
@@ -245,9 +256,14 @@ class SmartSchoolSeleniumLogin:
         return params if params else None
 
     def close(self):
-        """Close the browser"""
+        """Return the browser to the pool, closing a private pool"""
         if self.driver:
-            self.driver.quit()
+            self.pool.checkin(self.driver)
+            self.driver = None
+
+        if self.owns_pool and self.pool:
+            self.pool.close()
+            self.pool = None
             logger.info("Browser closed")
 
 
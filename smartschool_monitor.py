@@ -1,6 +1,5 @@
 import os
 import json
-import re
 import requests
 import schedule
 import time
@@ -11,6 +10,9 @@ import apprise
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import hashlib
+from login_outcomes import LoginOutcomeCache
+from login_page_scanner import scan_login_page, scan_login_response
+from durable_io import read_durable, write_durable, durable_exists, CorruptFileError
 
 # Try to use curl_cffi for better browser impersonation (like webtop_client.py)
 try:
@@ -29,8 +31,11 @@ class SmartSchoolMonitor:
     def __init__(self):
         self.config_path = Path("/app/config/config.yaml") if Path("/app/config").exists() else Path("./config/config.yaml")
         self.state_file = Path("/app/config/homework_state.json") if Path("/app/config").exists() else Path("./config/homework_state.json")
+        self.outcomes_file = Path("/app/config/login_outcomes.json") if Path("/app/config").exists() else Path("./config/login_outcomes.json")
         self.students = []
         self.notifiers = []
+        self.login_outcomes = LoginOutcomeCache(self.outcomes_file)
+        self._login_failure_reason = None
         self.load_config()
         self.setup_notifiers()
         self.load_state()
@@ -70,11 +75,14 @@ class SmartSchoolMonitor:
 
     def load_state(self):
         """Load previous homework state"""
-        if self.state_file.exists():
+        if durable_exists(self.state_file):
             try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    self.homework_state = json.load(f)
+                self.homework_state = read_durable(self.state_file, json.loads)
                 logger.info("Loaded previous homework state")
+            except CorruptFileError as e:
+                # Starting empty would report every tracked homework as new again
+                logger.critical(f"Homework state is damaged and no good generation is left: {e}")
+                raise
             except Exception as e:
                 logger.error(f"Failed to load state: {e}")
                 self.homework_state = {}
@@ -84,8 +92,7 @@ class SmartSchoolMonitor:
     def save_state(self):
         """Save homework state to file"""
         try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.homework_state, f, ensure_ascii=False, indent=2)
+            write_durable(self.state_file, json.dumps(self.homework_state, ensure_ascii=False, indent=2))
         except Exception as e:
             logger.error(f"Failed to save state: {e}")
 
@@ -116,15 +123,36 @@ class SmartSchoolMonitor:
         return session
 
     def login(self, session, username, password):
-        """Login to SmartSchool - tries web portal first, then mobile API fallback"""
-        # Try web portal login first
-        result = self._login_web_portal(session, username, password)
-        if result[0] and result[1]:
-            return result
-
-        # Fall back to mobile API login
-        logger.info("Web portal login failed, trying mobile API...")
-        return self._login_mobile(session, username, password)
+        """
+        Login to SmartSchool - tries web portal first, then mobile API fallback
+
+        Backends that recently failed for this account (CAPTCHA, blocked,
+        errors) are skipped until their backoff expires.
+        """
+        backends = [
+            ('web', self._login_web_portal),
+            ('mobile', self._login_mobile),
+        ]
+
+        result = (None, None, None)
+        for backend, login_method in backends:
+            remaining = self.login_outcomes.backoff_remaining(username, backend)
+            if remaining:
+                reason = self.login_outcomes.failure_reason(username, backend)
+                logger.info(f"Skipping {backend} login for {username} ({reason}), retry in {remaining / 60:.0f} min")
+                continue
+
+            self._login_failure_reason = 'rejected'
+            result = login_method(session, username, password)
+            if result[0] and result[1]:
+                self.login_outcomes.record_success(username, backend)
+                return result
+
+            self.login_outcomes.record_failure(username, backend, self._login_failure_reason)
+            if backend == 'web':
+                logger.info("Web portal login failed, trying mobile API...")
+
+        return result
 
     def _login_web_portal(self, session, username, password):
         """Login via webtopserver API (like webtop_client.py)"""
@@ -204,6 +232,7 @@ class SmartSchoolMonitor:
 
                     # Cookie exists but no user ID/success - might be blocked
                     logger.warning("Got webToken cookie but no valid user ID - may be blocked")
+                    self._login_failure_reason = 'half_authenticated'
 
                 # Check response for success without cookie
                 try:
@@ -219,6 +248,7 @@ class SmartSchoolMonitor:
 
         except Exception as e:
             logger.error(f"Web portal login error: {e}")
+            self._login_failure_reason = 'error'
             return None, None, None
 
     def _login_mobile(self, session, username, password):
@@ -228,18 +258,23 @@ class SmartSchoolMonitor:
             api_endpoint = "https://www.webtop.co.il/mobilev2/api/"
 
             # Step 1: Fetch login page to get cookies and security tokens
-            response = session.get(f"{mobile_url}default.aspx")
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch mobile login page: {response.status_code}")
-                return None, None, None
+            # The page is scanned while it streams in and left unread once both fields are found
+            response = session.get(f"{mobile_url}default.aspx", stream=True)
+            try:
+                if response.status_code != 200:
+                    logger.error(f"Failed to fetch mobile login page: {response.status_code}")
+                    self._login_failure_reason = 'error'
+                    return None, None, None
 
-            html = response.text
+                page = scan_login_response(response)
+            finally:
+                response.close()
 
             # Extract platform
-            platform = self._extract_platform(html) or "web"
+            platform = page.platform or "web"
 
             # Extract security token
-            security_id, security_value = self._extract_security_data(html)
+            security_id, security_value = page.security
 
             # Step 2: Build and send login request
             login_url = f"{api_endpoint}?platform={platform}"
@@ -276,6 +311,7 @@ class SmartSchoolMonitor:
 
                     if data.get("refresh"):
                         logger.error("Mobile login requires CAPTCHA")
+                        self._login_failure_reason = 'captcha'
                         return None, None, None
 
                     token = data.get("token") or data.get("Token")
@@ -306,45 +342,16 @@ class SmartSchoolMonitor:
 
         except Exception as e:
             logger.error(f"Mobile login error: {e}")
+            self._login_failure_reason = 'error'
             return None, None, None
 
     def _extract_platform(self, html):
         """Extract platform identifier from login page"""
-        match = re.search(r'<input[^>]*id=["\']platform["\'][^>]*value=["\']([^"\']+)["\']', html, re.IGNORECASE)
-        if match:
-            return match.group(1)
-        match = re.search(r'<input[^>]*value=["\']([^"\']+)["\'][^>]*id=["\']platform["\']', html, re.IGNORECASE)
-        if match:
-            return match.group(1)
-        return None
+        return scan_login_page(html).platform
 
     def _extract_security_data(self, html):
         """Extract security token from captchaWrapper"""
-        captcha_wrapper_match = re.search(
-            r'<div[^>]*id=["\']captchaWrapper["\'][^>]*>(.*?)</div>',
-            html,
-            re.IGNORECASE | re.DOTALL
-        )
-
-        if captcha_wrapper_match:
-            wrapper_content = captcha_wrapper_match.group(1)
-            hidden_match = re.search(
-                r'<input[^>]*type=["\']hidden["\'][^>]*id=["\']([^"\']+)["\'][^>]*value=["\']([^"\']*)["\']',
-                wrapper_content,
-                re.IGNORECASE
-            )
-            if hidden_match:
-                return hidden_match.group(1), hidden_match.group(2)
-
-            hidden_match = re.search(
-                r'<input[^>]*id=["\']([^"\']+)["\'][^>]*value=["\']([^"\']*)["\']',
-                wrapper_content,
-                re.IGNORECASE
-            )
-            if hidden_match:
-                return hidden_match.group(1), hidden_match.group(2)
-
-        return None, None
+        return scan_login_page(html).security
 
     def get_homework(self, session, web_token, user_id=None):
         """Fetch homework from SmartSchool API - tries web API first, then mobile fallback"""
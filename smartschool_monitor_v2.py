@@ -1,5 +1,9 @@
 import os
 import json
+import atexit
+import signal
+import sys
+import threading
 import requests
 import schedule
 import time
@@ -9,9 +13,18 @@ from loguru import logger
 import apprise
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from urllib.parse import unquote
+from urllib.parse import unquote, urlparse
 import hashlib
-import re
+from homework_text_parser import parse_homework_text
+from homework_columns import HomeworkBatch
+from homework_model import HomeworkItem, item_key
+from homework_diff import diff_homework
+from homework_normalize import normalize_text
+from state_store import open_state_store, open_state, StudentStateCache
+from history_archive import HistoryArchive
+from state_retention import RetentionJob
+from durable_io import read_durable, write_durable, durable_exists, CorruptFileError
+from pupil_card_dom import PUPIL_CARD_SCRIPT, script_arguments, cards_to_homework_items
 
 # Playwright for browser-based scraping (fallback when API is blocked)
 try:
@@ -34,6 +47,20 @@ log_dir = Path("/app/logs") if Path("/app").exists() else Path("./logs")
 log_dir.mkdir(exist_ok=True)
 logger.add(f"{log_dir}/smartschool-monitor.log", rotation="500 MB", retention="7 days")
 
+# Request-routing profiles for Playwright scrapes.
+# block_types: Playwright resource types that are aborted
+# allowed_hosts: only these hosts (and their subdomains) are loaded, empty = any host
+SCRAPE_PROFILES = {
+    'full': {
+        'block_types': set(),
+        'allowed_hosts': (),
+    },
+    'lean': {
+        'block_types': {'image', 'font', 'media', 'stylesheet'},
+        'allowed_hosts': ('smartschool.co.il',),
+    },
+}
+
 class SmartSchoolMonitor:
     def __init__(self):
         self.config_path = Path("/app/config/config.yaml") if Path("/app/config").exists() else Path("./config/config.yaml")
@@ -42,10 +69,19 @@ class SmartSchoolMonitor:
         self.students = []
         self.notifiers = []
         self.mqtt_client = None
+        self.last_scrape_stats = None
+        # Last homework payload published per student, to skip unchanged MQTT updates
+        self.mqtt_published = {}
         self.load_config()
         self.setup_notifiers()
         self.setup_mqtt()
+        # Held while the state changes; the retention job edits it in the background
+        self.state_lock = threading.RLock()
+        self.token_lock = threading.Lock()
+        self.state_store = open_state_store(self.state_file)
         self.load_state()
+        self.setup_history()
+        self.retention = RetentionJob(self)
 
     def load_config(self):
         """Load configuration from YAML file"""
@@ -163,8 +199,7 @@ class SmartSchoolMonitor:
             last_check_config = {
                 "name": f"SmartSchool {student_name} Last Check",
                 "unique_id": f"smartschool_{device_id}_last_check",
-                "state_topic": f"smartschool/{device_id}/state",
-                "value_template": "{{ value_json.last_check }}",
+                "state_topic": f"smartschool/{device_id}/last_check",
                 "icon": "mdi:clock-check",
                 "device_class": "timestamp",
                 "device": device_info
@@ -193,14 +228,16 @@ class SmartSchoolMonitor:
 
             # Filter to today's homework
             today = datetime.now().strftime('%Y-%m-%d')
-            today_homework = [hw for hw in homework_list if hw.get('date', '')[:10] == today]
+            if not isinstance(homework_list, HomeworkBatch):
+                homework_list = HomeworkBatch.from_items(homework_list)
+            today_homework = homework_list.on_date(today).rows()
 
             # Format homework details
             if today_homework:
                 details = f"Today's homework for {student_name}:\n\n"
                 for idx, hw in enumerate(today_homework, 1):
                     subject = hw.get('subject', 'Unknown')
-                    homework = hw.get('homework', '')
+                    homework = normalize_text(hw.get('homework', ''))
                     teacher = hw.get('teacher', '')
                     details += f"{idx}. {subject} - {teacher}\n"
                     details += f"   {homework[:200]}\n"
@@ -210,18 +247,28 @@ class SmartSchoolMonitor:
             else:
                 details = f"No homework for today ({today})"
 
-            # Publish state
-            state = {
+            # The check time goes to its own topic, so the homework state is
+            # only republished when it actually changed
+            self.mqtt_client.publish(
+                f"smartschool/{device_id}/last_check",
+                datetime.now().isoformat(),
+                retain=True
+            )
+
+            state = json.dumps({
                 "count": len(today_homework),
-                "details": details,
-                "last_check": datetime.now().isoformat()
-            }
+                "details": details
+            })
+            if self.mqtt_published.get(student_name) == state:
+                logger.debug(f"MQTT state for {student_name} unchanged, not republished")
+                return
 
             self.mqtt_client.publish(
                 f"smartschool/{device_id}/state",
-                json.dumps(state),
+                state,
                 retain=True
             )
+            self.mqtt_published[student_name] = state
 
             logger.info(f"Published MQTT state for {student_name}: {len(today_homework)} homework items")
 
@@ -230,34 +277,80 @@ class SmartSchoolMonitor:
 
     def load_state(self):
         """Load previous homework state"""
-        if self.state_file.exists():
-            try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    self.homework_state = json.load(f)
+        try:
+            self.homework_state = open_state(self.state_store)
+            if isinstance(self.homework_state, StudentStateCache):
+                logger.info(f"Homework state is loaded per student on demand "
+                            f"(up to {self.homework_state.capacity} in memory)")
+            elif self.homework_state:
                 logger.info("Loaded previous homework state")
-            except Exception as e:
-                logger.error(f"Failed to load state: {e}")
-                self.homework_state = {}
-        else:
+        except CorruptFileError as e:
+            # Starting empty would report every tracked homework as new again
+            logger.critical(f"Homework state is damaged and no good generation is left: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to load state: {e}")
             self.homework_state = {}
 
-    def save_state(self):
-        """Save homework state to file"""
+    def setup_history(self):
+        """Open the long-term history archive (HISTORY_ARCHIVE=false disables it)"""
+        self.history = None
+        if os.getenv('HISTORY_ARCHIVE', 'true').lower() != 'true':
+            return
+        self.history = HistoryArchive(self.state_file.parent / "history")
+        if not self.history.exists() and self.homework_state:
+            # Start the archive with what is already tracked
+            try:
+                count = self.history.seed(self.homework_state)
+                logger.info(f"Seeded homework history with {count} tracked items")
+            except Exception as e:
+                logger.error(f"Failed to seed homework history: {e}")
+
+    def archive_history(self, student_name, diff, detected_at):
+        """Record a check's changes in the history archive"""
+        if self.history is None or not diff.changed:
+            return
+        try:
+            self.history.record(student_name, diff, detected_at)
+        except Exception as e:
+            logger.error(f"Failed to archive homework history: {e}")
+
+    def save_state(self, students=None, force=False):
+        """Mark students as changed (None = all) and flush if the flush interval allows"""
+        self.state_store.mark_dirty(students)
+        self.flush_state(force)
+
+    def flush_state(self, force=False):
+        """Write the students changed since the last flush (coalesced to STATE_FLUSH_INTERVAL)"""
         try:
-            self.state_file.parent.mkdir(exist_ok=True, parents=True)
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.homework_state, f, ensure_ascii=False, indent=2)
+            with self.state_lock:
+                if self.state_store.flush(self.homework_state, force):
+                    logger.debug("Saved state")
+                    if isinstance(self.homework_state, StudentStateCache):
+                        self.homework_state.trim()
         except Exception as e:
             logger.error(f"Failed to save state: {e}")
 
+    def shutdown(self):
+        """Flush pending state and close the store; safe to call more than once"""
+        if getattr(self, '_shut_down', False):
+            return
+        self._shut_down = True
+        self.retention.stop()
+        self.flush_state(force=True)
+        try:
+            self.state_store.close()
+        except Exception as e:
+            logger.error(f"Failed to close state store: {e}")
+        logger.info("State flushed")
+
     def load_token_cache(self, username):
         """Load cached token for a user"""
-        if not self.token_file.exists():
+        if not durable_exists(self.token_file):
             return None
 
         try:
-            with open(self.token_file, 'r') as f:
-                cache = json.load(f)
+            cache = read_durable(self.token_file, json.loads, allow_external=True)
 
             user_cache = cache.get(username)
             if not user_cache:
@@ -292,20 +385,21 @@ class SmartSchoolMonitor:
     def save_token_cache(self, username, token, student_params):
         """Save token to cache"""
         try:
-            cache = {}
-            if self.token_file.exists():
-                with open(self.token_file, 'r') as f:
-                    cache = json.load(f)
-
-            cache[username] = {
-                'token': token,
-                'student_params': student_params,
-                'timestamp': datetime.now().isoformat()
-            }
-
-            self.token_file.parent.mkdir(exist_ok=True, parents=True)
-            with open(self.token_file, 'w') as f:
-                json.dump(cache, f, indent=2)
+            with self.token_lock:
+                cache = {}
+                if durable_exists(self.token_file):
+                    try:
+                        cache = read_durable(self.token_file, json.loads, allow_external=True)
+                    except CorruptFileError as e:
+                        logger.warning(f"Token cache unreadable, starting a new one: {e}")
+
+                cache[username] = {
+                    'token': token,
+                    'student_params': student_params,
+                    'timestamp': datetime.now().isoformat()
+                }
+
+                write_durable(self.token_file, json.dumps(cache, indent=2))
 
             logger.info(f"Saved token cache for {username}")
 
@@ -388,34 +482,8 @@ class SmartSchoolMonitor:
             return None
 
     def extract_homework_items(self, homework_data):
-        """Extract actual homework from the schedule data"""
-        homework_items = []
-
-        if not homework_data:
-            return homework_items
-
-        for day in homework_data:
-            date = day.get('date', '')
-            hours_data = day.get('hoursData', [])
-
-            for hour in hours_data:
-                schedule = hour.get('scheduale', [])
-
-                for item in schedule:
-                    homework_text = item.get('homeWork') or ''
-                    if homework_text:
-                        homework_text = homework_text.strip()
-
-                    if homework_text:  # Only include if there's actual homework
-                        homework_items.append({
-                            'date': date,
-                            'subject': item.get('subject_name') or 'Unknown',
-                            'teacher': item.get('teacher') or 'Unknown',
-                            'homework': homework_text,
-                            'description': item.get('descClass') or ''
-                        })
-
-        return homework_items
+        """Extract actual homework from the schedule data as a columnar HomeworkBatch"""
+        return HomeworkBatch.from_payload(homework_data)
 
     def get_homework_playwright(self, token):
         """
@@ -429,6 +497,26 @@ class SmartSchoolMonitor:
         try:
             logger.info("Using Playwright browser to scrape homework...")
 
+            profile = self.get_scrape_profile()
+            stats = {'requests': 0, 'blocked': 0, 'bytes': 0}
+
+            def route_request(route, request):
+                """Abort non-essential resource types and third-party hosts"""
+                if self._should_block_request(request, profile):
+                    stats['blocked'] += 1
+                    route.abort()
+                else:
+                    route.continue_()
+
+            def count_bytes(request):
+                """Add transferred bytes of a finished request to the stats"""
+                stats['requests'] += 1
+                try:
+                    sizes = request.sizes()
+                    stats['bytes'] += sizes.get('responseHeadersSize', 0) + sizes.get('responseBodySize', 0)
+                except Exception:
+                    pass
+
             with sync_playwright() as p:
                 browser = p.chromium.launch(headless=True)
                 context = browser.new_context(
@@ -436,6 +524,9 @@ class SmartSchoolMonitor:
                     locale='he-IL',
                 )
 
+                if profile['block_types'] or profile['allowed_hosts']:
+                    context.route("**/*", route_request)
+
                 # Set the webToken cookie
                 context.add_cookies([{
                     'name': 'webToken',
@@ -445,94 +536,111 @@ class SmartSchoolMonitor:
                 }])
 
                 page = context.new_page()
+                page.on("requestfinished", count_bytes)
 
                 # Navigate to the pupil card page
                 logger.info("Navigating to pupil card page...")
+                start_time = time.time()
                 page.goto('https://webtop.smartschool.co.il/pupilcard', timeout=30000)
 
-                # Wait for content to load
-                time.sleep(5)
+                # Wait for the app to finish loading its data
+                try:
+                    page.wait_for_load_state('networkidle', timeout=15000)
+                except Exception as e:
+                    logger.warning(f"Pupil card did not go network-idle: {e}")
+                ready_time = time.time() - start_time
 
-                # Get page text content
-                body_text = page.inner_text('body')
+                # Extract the lesson cards in the browser
+                try:
+                    cards = page.evaluate(PUPIL_CARD_SCRIPT, script_arguments())
+                except Exception as e:
+                    logger.warning(f"Structured pupil card extraction failed: {e}")
+                    cards = None
+
+                # Only pull the whole page text if the cards weren't found
+                body_text = None if cards else page.inner_text('body')
 
                 browser.close()
 
+                self.last_scrape_stats = {
+                    'profile': profile['name'],
+                    'ready_seconds': round(ready_time, 3),
+                    'requests': stats['requests'],
+                    'blocked': stats['blocked'],
+                    'bytes': stats['bytes'],
+                }
+                logger.info(
+                    f"Scrape stats ({profile['name']} profile): page ready in {ready_time:.2f}s, "
+                    f"{stats['bytes'] / 1024:.1f} KB over {stats['requests']} requests, "
+                    f"{stats['blocked']} requests blocked"
+                )
+
+                if cards:
+                    homework_items = cards_to_homework_items(cards)
+                    logger.info(f"Extracted {len(homework_items)} homework items from lesson cards")
+                    return homework_items
+
                 # Parse the homework from page text
+                logger.info("No lesson cards found, falling back to page text")
                 return self.parse_homework_from_text(body_text)
 
         except Exception as e:
             logger.error(f"Playwright scraping failed: {e}")
             return None
 
+    def get_scrape_profile(self):
+        """
+        Build the request-routing profile for Playwright scrapes.
+
+        SCRAPE_PROFILE selects a base profile (lean or full), SCRAPE_BLOCK_RESOURCES
+        and SCRAPE_ALLOWED_HOSTS override its resource types and host allow-list.
+        """
+        name = os.getenv('SCRAPE_PROFILE', 'lean').strip().lower()
+        if name not in SCRAPE_PROFILES:
+            logger.warning(f"Unknown SCRAPE_PROFILE '{name}', using 'lean'")
+            name = 'lean'
+
+        base = SCRAPE_PROFILES[name]
+        block_types = set(base['block_types'])
+        allowed_hosts = tuple(base['allowed_hosts'])
+
+        block_str = os.getenv('SCRAPE_BLOCK_RESOURCES')
+        if block_str is not None:
+            block_types = {t.strip().lower() for t in block_str.split(',') if t.strip()}
+
+        hosts_str = os.getenv('SCRAPE_ALLOWED_HOSTS')
+        if hosts_str is not None:
+            allowed_hosts = tuple(h.strip().lower() for h in hosts_str.split(',') if h.strip())
+
+        return {'name': name, 'block_types': block_types, 'allowed_hosts': allowed_hosts}
+
+    def _should_block_request(self, request, profile):
+        """Check if a Playwright request falls outside the scrape profile"""
+        if request.resource_type in profile['block_types']:
+            return True
+
+        if profile['allowed_hosts']:
+            host = (urlparse(request.url).hostname or '').lower()
+            # data: and blob: URLs have no host and never leave the browser
+            if host and not any(host == h or host.endswith('.' + h) for h in profile['allowed_hosts']):
+                return True
+
+        return False
+
     def parse_homework_from_text(self, text):
         """Parse homework items from page text content"""
-        homework_items = []
         today = datetime.now().strftime('%Y-%m-%d')
-
-        # Split by "שיעור" (lesson) to find lesson blocks
-        # Pattern: subject followed by lesson number, teacher, and homework
-        lines = text.split('\n')
-
-        current_subject = None
-        current_teacher = None
-        in_homework = False
-        homework_text = ""
-
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-
-            # Check for subject headers (common subjects)
-            subjects = ['מתמטיקה', 'חשבון', 'גיאומטריה', 'עברית', 'שפה', 'אנגלית',
-                       'מדע', 'מדעים', 'היסטוריה', 'גאוגרפיה', 'תנ"ך', 'ספרות',
-                       'מדע וטכנולוגיה', 'חינוך גופני', 'אמנות', 'מוזיקה']
-
-            for subj in subjects:
-                if line.startswith(subj) or line == subj:
-                    current_subject = line
-                    break
-
-            # Look for "שיעור X" pattern
-            if re.match(r'שיעור \d+', line):
-                pass  # Just a lesson number marker
-
-            # Check for teacher name (usually comes after lesson number)
-            # Hebrew names pattern
-            if re.match(r'^[א-ת]+(\')?[א-ת]* [א-ת]+$', line):
-                current_teacher = line
-
-            # Look for homework marker
-            if 'שיעורי בית:' in line or 'שיעורי בית' in line:
-                in_homework = True
-                # Extract homework after the colon
-                if ':' in line:
-                    hw = line.split(':', 1)[1].strip()
-                    if hw and hw != 'לא הוזן':
-                        homework_text = hw
-
-            # If we found homework, add it
-            if homework_text and current_subject:
-                homework_items.append({
-                    'date': today,
-                    'subject': current_subject,
-                    'teacher': current_teacher or 'Unknown',
-                    'homework': homework_text,
-                    'description': ''
-                })
-                homework_text = ""
-                in_homework = False
-
-            i += 1
+        homework_items = parse_homework_text(text, today)
 
         logger.info(f"Parsed {len(homework_items)} homework items from page")
         return homework_items
 
     def hash_homework(self, homework_item):
         """Create a hash of homework item to detect changes"""
+        if isinstance(homework_item, HomeworkItem):
+            return homework_item.key
         try:
-            hw_str = json.dumps(homework_item, sort_keys=True, ensure_ascii=False)
-            return hashlib.md5(hw_str.encode()).hexdigest()
+            return item_key(homework_item)
         except:
             return None
 
@@ -591,39 +699,35 @@ class SmartSchoolMonitor:
 
                 if homework_items:
                     logger.info(f"Got {len(homework_items)} homework items from Playwright")
+                    homework_items = HomeworkBatch.from_items(homework_items)
                 else:
                     logger.warning(f"No homework data for {student_name} from any source")
                     return
 
-            # Initialize state for this student if needed
-            if student_name not in self.homework_state:
-                self.homework_state[student_name] = {}
-
-            # Check for new homework
-            new_homework = []
-            current_hashes = {}
-
-            for item in homework_items:
-                item_hash = self.hash_homework(item)
-                if not item_hash:
-                    continue
-
-                current_hashes[item_hash] = item
-
-                # Check if this is new homework
-                if item_hash not in self.homework_state[student_name]:
-                    new_homework.append(item)
-                    self.homework_state[student_name][item_hash] = {
-                        'detected_at': datetime.now().isoformat(),
-                        'item': item
-                    }
-                    logger.info(f"New homework detected: {item['subject']}")
-
-            # Remove old homework from state
-            self.homework_state[student_name] = {
-                k: v for k, v in self.homework_state[student_name].items()
-                if k in current_hashes
-            }
+            with self.state_lock:
+                # Initialize state for this student if needed
+                if student_name not in self.homework_state:
+                    self.homework_state[student_name] = {}
+
+                # Diff against the tracked homework: new, edited and removed items
+                detected_at = datetime.now().isoformat()
+                diff = diff_homework(
+                    self.homework_state[student_name],
+                    homework_items.items(),
+                    detected_at,
+                    covered_days=homework_items.days,
+                )
+                state_changed = diff.state != self.homework_state[student_name]
+                self.homework_state[student_name] = diff.state
+
+            for item in diff.added:
+                logger.info(f"New homework detected: {item.subject}")
+            for _, item in diff.modified:
+                logger.info(f"Homework changed: {item.subject}")
+            for tracked in diff.removed:
+                logger.info(f"Homework removed: {tracked.item.subject}")
+            logger.info(f"Homework diff for {student_name}: {diff.summary()}")
+            self.archive_history(student_name, diff, detected_at)
 
             # Publish MQTT discovery (first time) and state (always)
             # This creates/updates Home Assistant entities
@@ -633,17 +737,20 @@ class SmartSchoolMonitor:
             self.publish_mqtt_state(student_name, homework_items)
             logger.debug("MQTT publishing done")
 
-            # Send notifications if new homework found
-            if new_homework:
-                logger.info(f"Sending notification for {len(new_homework)} new items...")
-                self.send_notification(student_name, new_homework)
+            # Send notifications if homework was added, changed or removed
+            if diff.changed:
+                logger.info(f"Sending notification for {diff.summary()}...")
+                self.send_notification(student_name, diff)
                 logger.info("Notification sent")
             else:
-                logger.info("No new homework, skipping notification")
+                logger.info("No homework changes, skipping notification")
 
             # Save state
-            logger.debug("Saving state...")
-            self.save_state()
+            if state_changed:
+                logger.debug("Saving state...")
+                self.save_state([student_name])
+            else:
+                logger.debug("State unchanged, nothing to save")
             logger.info(f"Check complete for {student_name}")
 
         except Exception as e:
@@ -651,8 +758,24 @@ class SmartSchoolMonitor:
             import traceback
             traceback.print_exc()
 
-    def send_notification(self, student_name, homework_list):
-        """Send notification via webhook or Apprise"""
+    def _format_homework(self, idx, hw, previous=None):
+        """One homework entry of a notification; previous: the item before an edit"""
+        subject = hw.subject or 'Unknown'
+        homework = hw.homework or ''
+        teacher = hw.teacher or ''
+
+        lesson = f", lesson {hw.lesson}" if hw.lesson is not None else ''
+        text = f"{idx}. {subject} ({hw.day}{lesson})\n"
+        text += f"   👨‍🏫 {teacher}\n"
+        if previous is not None and (previous.homework or '') != homework:
+            text += f"   ❌ {(previous.homework or '')[:200]}\n"
+        text += f"   📝 {homework[:200]}\n"  # Limit length
+        if len(homework) > 200:
+            text += f"   ...\n"
+        return text + "\n"
+
+    def send_notification(self, student_name, diff):
+        """Send notification via webhook or Apprise (diff: HomeworkDiff)"""
         try:
             if not hasattr(self, 'apobj') or len(self.apobj) == 0:
                 logger.warning("No notifiers configured")
@@ -660,27 +783,31 @@ class SmartSchoolMonitor:
 
             # Filter to only today's homework
             today = datetime.now().strftime('%Y-%m-%d')
-            today_homework = [hw for hw in homework_list if hw.get('date', '')[:10] == today]
+            changes = diff.on_day(today)
+            added, modified = changes.added, changes.modified
+            removed = [old.item for old in changes.removed]
 
-            if not today_homework:
-                logger.info(f"No homework for today ({today}), skipping notification")
+            if not changes.changed:
+                logger.info(f"No homework changes for today ({today}), skipping notification")
                 return
 
             # Format homework message
-            message = f"📚 New homework for {student_name} (Today: {today}):\n\n"
+            message = f"📚 Homework updates for {student_name} (Today: {today}):\n\n"
+
+            if added:
+                message += "🆕 New:\n"
+                for idx, hw in enumerate(added, 1):
+                    message += self._format_homework(idx, hw)
 
-            for idx, hw in enumerate(today_homework, 1):
-                date_str = hw.get('date', '')[:10]  # Just the date part
-                subject = hw.get('subject', 'Unknown')
-                homework = hw.get('homework', '')
-                teacher = hw.get('teacher', '')
+            if modified:
+                message += "✏️ Changed:\n"
+                for idx, (old, hw) in enumerate(modified, 1):
+                    message += self._format_homework(idx, hw, previous=old.item)
 
-                message += f"{idx}. {subject} ({date_str})\n"
-                message += f"   👨‍🏫 {teacher}\n"
-                message += f"   📝 {homework[:200]}\n"  # Limit length
-                if len(homework) > 200:
-                    message += f"   ...\n"
-                message += "\n"
+            if removed:
+                message += "🗑️ Removed:\n"
+                for idx, hw in enumerate(removed, 1):
+                    message += self._format_homework(idx, hw)
 
             title = f"SmartSchool Homework - {student_name}"
 
@@ -778,11 +905,19 @@ class SmartSchoolMonitor:
             # Small delay between checks
             time.sleep(2)
 
+        # Write whatever the coalescing held back
+        self.flush_state(force=True)
+
     def start(self):
         """Start the monitor"""
         logger.info("Starting SmartSchool Homework Monitor v2 (Manual Token Mode)")
 
+        # Flush the state on exit; docker stop sends SIGTERM
+        atexit.register(self.shutdown)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
         self.schedule_checks()
+        self.retention.start()
 
         # Run first check immediately
         self.run_all_checks()
@@ -791,9 +926,11 @@ class SmartSchoolMonitor:
         while True:
             try:
                 schedule.run_pending()
+                self.flush_state()
                 time.sleep(60)
             except KeyboardInterrupt:
                 logger.info("Monitor stopped by user")
+                self.shutdown()
                 break
             except Exception as e:
                 logger.error(f"Scheduler error: {e}")
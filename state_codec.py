@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Binary homework state snapshots
+
+The JSON state repeats every field name, subject, teacher and date for
+every item, and loading it recomputes every identity key. The binary
+format (STATE_SNAPSHOT_FORMAT=binary) stores the same state as
+
+    header   b'HWST', format version, compression (zlib)
+    payload  string count, student count, item count
+             character lengths of the strings       (uint32 array)
+             student names                          (int32 string indexes)
+             10 item columns, one after the other   (int32 string indexes)
+             the strings, UTF-8, back to back
+
+Every distinct string is stored once. Items keep their identity key, so
+loading doesn't hash anything unless the key scheme recorded in the
+snapshot differs from the current one (another HOMEWORK_NORMALIZATION).
+
+Readers detect the format from the header; JSON state files are read as
+before, so switching formats needs no migration.
+"""
+
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate, chain, repeat
+from operator import attrgetter
+
+from loguru import logger
+
+from homework_model import HomeworkItem, TrackedHomework, KEY_SCHEME, rekey_student_state, stale_key_count, \
+    state_from_json, state_to_json
+
+MAGIC = b'HWST'
+VERSION = 1
+COMPRESSION_ZLIB = 1
+# Level 1 already gets the state to a tenth of the JSON; higher levels mostly cost time
+COMPRESSION_LEVEL = 1
+HEADER = struct.Struct('<4sBB')
+COUNTS = struct.Struct('<III')
+FORMATS = ('json', 'binary')
+
+NONE = -1
+# Item columns
+STUDENT, KEY, DATE, SUBJECT, TEACHER, HOMEWORK, DESCRIPTION, LESSON, EXTRA, DETECTED_AT = range(10)
+COLUMNS = 10
+
+
+def snapshot_format():
+    """Format new snapshots are written in (STATE_SNAPSHOT_FORMAT)"""
+    value = os.getenv('STATE_SNAPSHOT_FORMAT', 'json').strip().lower()
+    if value not in FORMATS:
+        logger.warning(f"Unknown STATE_SNAPSHOT_FORMAT '{value}', using json")
+        return 'json'
+    return value
+
+
+def is_binary(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def encode_state(state):
+    """{student: {key: TrackedHomework}} -> binary snapshot"""
+    columns = [[] for _ in range(COLUMNS)]
+    for student, entries in state.items():
+        tracked = list(entries.values())
+        items = list(map(_item_of, tracked))
+        columns[STUDENT].extend([student] * len(items))
+        columns[KEY].extend(entries)
+        for column, name in ((DATE, 'date'), (SUBJECT, 'subject'), (TEACHER, 'teacher'),
+                             (HOMEWORK, 'homework'), (DESCRIPTION, 'description'), (LESSON, 'lesson')):
+            columns[column].extend(map(attrgetter(name), items))
+        columns[EXTRA].extend(json.dumps(item.extra, ensure_ascii=False) if item.extra else None for item in items)
+        columns[DETECTED_AT].extend(map(_detected_at_of, tracked))
+
+    # Anything but a lesson number is kept as a JSON string, stored below NONE
+    odd_lessons = [json.dumps(lesson) for lesson in columns[LESSON] if not _plain_lesson(lesson)]
+
+    # String table: every distinct value once, in order of first use
+    table = dict.fromkeys(chain((KEY_SCHEME,), state, odd_lessons,
+                                *(columns[column] for column in range(COLUMNS) if column != LESSON)))
+    table.pop(None, None)
+    positions = {value: position for position, value in enumerate(table)}
+    positions[None] = NONE
+
+    lessons = [lesson if _plain_lesson(lesson) else NONE - 1 - positions[json.dumps(lesson)]
+               for lesson in columns[LESSON]] if odd_lessons else columns[LESSON]
+    lessons = [NONE if lesson is None else lesson for lesson in lessons]
+
+    values = array('i')
+    for column in range(COLUMNS):
+        values.extend(lessons if column == LESSON else map(positions.__getitem__, columns[column]))
+
+    payload = b''.join((
+        COUNTS.pack(len(table), len(state), len(columns[KEY])),
+        _little_endian(array('I', map(len, table))).tobytes(),
+        _little_endian(array('i', map(positions.__getitem__, state))).tobytes(),
+        _little_endian(values).tobytes(),
+        ''.join(table).encode('utf-8'),
+    ))
+    return HEADER.pack(MAGIC, VERSION, COMPRESSION_ZLIB) + zlib.compress(payload, COMPRESSION_LEVEL)
+
+
+def _plain_lesson(lesson):
+    return lesson is None or (type(lesson) is int and 0 <= lesson < 2 ** 31)
+
+
+def _item_of(tracked):
+    return tracked.item
+
+
+def _detected_at_of(tracked):
+    return tracked.detected_at
+
+
+def decode_state(data):
+    """Binary snapshot -> ({student: {key: TrackedHomework}}, number of entries re-keyed)"""
+    magic, version, compression = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a binary state snapshot")
+    if version != VERSION or compression != COMPRESSION_ZLIB:
+        raise ValueError(f"unsupported state snapshot version {version}, compression {compression}")
+
+    payload = zlib.decompress(memoryview(data)[HEADER.size:])
+    string_count, student_count, item_count = COUNTS.unpack_from(payload)
+    position = COUNTS.size
+
+    def read_array(typecode, count):
+        nonlocal position
+        values = array(typecode)
+        values.frombytes(payload[position:position + count * values.itemsize])
+        position += count * values.itemsize
+        return _little_endian(values)
+
+    lengths = read_array('I', string_count)
+    students = read_array('i', student_count)
+    values = read_array('i', item_count * COLUMNS)
+
+    text = payload[position:].decode('utf-8')
+    if sum(lengths) != len(text):
+        raise ValueError("damaged state snapshot (string table)")
+    strings = [text[end - length:end] for end, length in zip(accumulate(lengths), lengths)]
+    strings.append(None)  # index NONE (-1)
+
+    def column(name):
+        return values[name * item_count:(name + 1) * item_count]
+
+    def strings_of(name):
+        return list(map(strings.__getitem__, column(name)))
+
+    # Keys computed another way are recomputed from the fields
+    rekey = strings[0] != KEY_SCHEME
+
+    lessons = [None if lesson == NONE else lesson if lesson > NONE else json.loads(strings[NONE - 1 - lesson])
+               for lesson in column(LESSON)]
+    extras = [json.loads(extra) if extra is not None else None for extra in strings_of(EXTRA)]
+    keys = strings_of(KEY)
+    items = map(HomeworkItem, strings_of(DATE), strings_of(SUBJECT), strings_of(TEACHER), strings_of(HOMEWORK),
+                strings_of(DESCRIPTION), lessons, extras, repeat(None) if rekey else keys)
+    tracked = map(TrackedHomework, items, strings_of(DETECTED_AT))
+
+    state = {strings[student]: {} for student in students}
+    entries = None
+    current = None
+    for student, key, entry in zip(column(STUDENT), keys, tracked):
+        # Items are grouped by student
+        if student != current:
+            current, entries = student, state[strings[student]]
+        entries[key] = entry
+
+    rekeyed = 0
+    if rekey:
+        for student, entries in state.items():
+            state[student], count = rekey_student_state(entries)
+            rekeyed += count
+    return state, rekeyed
+
+
+def dumps_state(state, fmt=None):
+    """Serialize {student: {key: TrackedHomework}} in fmt (default: STATE_SNAPSHOT_FORMAT)"""
+    if (fmt or snapshot_format()) == 'binary':
+        return encode_state(state)
+    return json.dumps(state_to_json(state), ensure_ascii=False).encode('utf-8')
+
+
+def loads_state(data):
+    """Binary or JSON snapshot -> ({student: {key: TrackedHomework}}, number of entries re-keyed)"""
+    if is_binary(data):
+        return decode_state(data)
+    raw = json.loads(data)
+    state = state_from_json(raw)
+    return state, sum(stale_key_count(raw[student], entries) for student, entries in state.items())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Journaled state backend (STATE_BACKEND=journal)
+
+The state lives in two files next to homework_state.json:
+
+    homework_state.snapshot.json   the whole state at the last compaction
+    homework_state.journal         one JSON line per change since then
+
+A save appends the changed items as "put", "remove" and "drop" lines followed
+by a "commit" line carrying the SHA-256 of the batch, in one write, and
+fsyncs the journal. Replay only applies batches whose commit line is there
+and matches, so a crash mid-append loses at most the save that was being
+written; the torn tail is cut off on the next start. The snapshot is written
+with durable_io, as JSON or as a binary snapshot (STATE_SNAPSHOT_FORMAT, see
+state_codec); the name stays homework_state.snapshot.json either way.
+
+When the journal grows past STATE_JOURNAL_MAX_OPS operations a background
+thread folds it into a new snapshot. Replaying operations the snapshot
+already contains is harmless (every line carries the full entry), which is
+what makes compaction safe without stopping saves.
+
+Compaction replaces the journal file, so a process still appending to the
+old one would lose its saves: only one process may open the journal for
+writing, which it holds homework_state.journal.lock for. Tools that only
+read the state (view_homework.py, export_homework.py) open the store
+read-only: they never repair, re-key or compact anything, and re-read if a
+compaction in the monitor replaced the files while they were reading.
+"""
+
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, the single-writer rule isn't enforced
+    fcntl = None
+
+from loguru import logger
+
+from durable_io import atomic_write, checksum, read_durable, write_durable, durable_exists, CorruptFileError
+
+from homework_model import TrackedHomework, rekey_student_state
+from state_codec import dumps_state, loads_state, snapshot_format
+from state_store import StateStore
+
+DEFAULT_MAX_OPS = 2000
+READ_ATTEMPTS = 5
+
+
+class JournalStateStore(StateStore):
+    """Snapshot plus append-only journal"""
+
+    def __init__(self, path, max_ops=None, flush_interval=None, read_only=False):
+        super().__init__(path, flush_interval, read_only)
+        self.snapshot_path = self.path.with_suffix('.snapshot.json')
+        self.journal_path = self.path.with_suffix('.journal')
+        self.lock_path = self.path.with_suffix('.journal.lock')
+        if max_ops is None:
+            max_ops = int(os.getenv('STATE_JOURNAL_MAX_OPS', str(DEFAULT_MAX_OPS)))
+        self.max_ops = max_ops
+        self.snapshot_format = snapshot_format()
+        self.journal_ops = 0
+        # Held while appending and while the persisted copy changes
+        self._lock = threading.RLock()
+        self._journal = None
+        self._writer_lock = None
+        self._compact_lock = threading.Lock()
+        self._compact_requested = threading.Event()
+        self._stopping = False
+        self._compactor = None
+
+    # Loading
+
+    def _load(self):
+        if self.read_only:
+            return self._read_stable()[0]
+
+        # The writer lock first: nobody may append while the tail is checked
+        self._lock_writer()
+        state, rekeyed, applied, valid_bytes = self._read()
+        self.journal_ops = applied
+
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, 'ab')
+        if self._journal.tell() != valid_bytes:
+            logger.warning(f"Discarding {self._journal.tell() - valid_bytes} bytes of unfinished journal writes")
+            self._journal.truncate(valid_bytes)
+            self._journal.seek(valid_bytes)
+
+        if rekeyed:
+            logger.info(f"Re-keyed {rekeyed} homework state entries")
+            # Old keys are still in the files; fold them away now
+            self._persisted = {student: dict(entries) for student, entries in state.items()}
+            self.compact()
+
+        self._start_compactor()
+        return state
+
+    def _read(self):
+        """Snapshot plus the committed journal: (state, entries re-keyed, journal ops, bytes of committed journal)"""
+        state, rekeyed = {}, 0
+        if durable_exists(self.snapshot_path):
+            state, rekeyed = read_durable(self.snapshot_path, loads_state)
+
+        applied, valid_bytes, touched = self._replay(state)
+
+        # Journal entries are stored under the key they were saved with
+        for student in touched:
+            if student in state:
+                state[student], count = rekey_student_state(state[student])
+                rekeyed += count
+        return state, rekeyed, applied, valid_bytes
+
+    def _read_stable(self):
+        """_read() for a reader: read again if a compaction replaced the files meanwhile"""
+        for attempt in range(READ_ATTEMPTS):
+            before = self._generation()
+            try:
+                result = self._read()
+            except CorruptFileError:
+                # The snapshot was read while it was being replaced
+                if attempt == READ_ATTEMPTS - 1 or self._generation() == before:
+                    raise
+                continue
+            if self._generation() == before:
+                return result
+        return result
+
+    def _read_all(self):
+        return self._read_stable()[0]
+
+    def _generation(self):
+        """Identity of the snapshot and journal files; compaction replaces both"""
+        identity = []
+        for path in (self.snapshot_path, self.journal_path):
+            try:
+                identity.append(path.stat().st_ino)
+            except FileNotFoundError:
+                identity.append(None)
+        return tuple(identity)
+
+    def _lock_writer(self):
+        """Take the single-writer lock of the journal, held until close()"""
+        if self._writer_lock is not None or fcntl is None:
+            return
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        lock_file = open(self.lock_path, 'ab')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"{self.journal_path} is open for writing by another process "
+                               f"(open it read-only to view it)")
+        self._writer_lock = lock_file
+
+    def _replay(self, state):
+        """Apply committed journal batches to the state, returns (ops, bytes of committed journal, students)"""
+        if not self.journal_path.exists():
+            return 0, 0, set()
+
+        applied = 0
+        valid_bytes = 0
+        position = 0
+        batch = []
+        batch_bytes = []
+        touched = set()
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                position += len(line)
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    break  # torn write, nothing after it was committed
+                if op.get('op') != 'commit':
+                    batch.append(op)
+                    batch_bytes.append(line)
+                    continue
+                if op.get('sha256') != checksum(b''.join(batch_bytes)):
+                    logger.warning("State journal batch with a bad checksum, ignoring the rest of the journal")
+                    break
+
+                for change in batch:
+                    self._apply(state, change)
+                    touched.add(change.get('student'))
+                applied += len(batch)
+                batch = []
+                batch_bytes = []
+                valid_bytes = position
+
+        return applied, valid_bytes, touched
+
+    @staticmethod
+    def _apply(state, change):
+        op, student = change.get('op'), change.get('student')
+        if op == 'put':
+            state.setdefault(student, {})[change['key']] = TrackedHomework.from_state(change['entry'])
+        elif op == 'remove':
+            state.get(student, {}).pop(change['key'], None)
+        elif op == 'student':
+            state.setdefault(student, {})
+        elif op == 'drop':
+            state.pop(student, None)
+
+    # Saving
+
+    def save(self, state, students=None):
+        # The compactor must never see a journal position without the matching persisted copy
+        with self._lock:
+            return super().save(state, students)
+
+    def _save(self, state, changes, dropped):
+        lines = []
+        for student, (upserts, removed) in changes.items():
+            if student not in self._persisted:
+                lines.append({'op': 'student', 'student': student})
+            for key, tracked in upserts.items():
+                lines.append({'op': 'put', 'student': student, 'key': key, 'entry': tracked.to_state()})
+            for key in removed:
+                lines.append({'op': 'remove', 'student': student, 'key': key})
+        for student in dropped:
+            lines.append({'op': 'drop', 'student': student})
+
+        data = ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines).encode('utf-8')
+        data += json.dumps({'op': 'commit', 'sha256': checksum(data)}).encode('utf-8') + b'\n'
+
+        with self._lock:
+            if self._journal is None:
+                self._lock_writer()
+                self.path.parent.mkdir(exist_ok=True, parents=True)
+                self._journal = open(self.journal_path, 'ab')
+            self._journal.write(data)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self.journal_ops += len(lines)
+
+        if self.journal_ops >= self.max_ops:
+            self._compact_requested.set()
+
+    # Compaction
+
+    def _start_compactor(self):
+        if self._compactor is None:
+            self._compactor = threading.Thread(target=self._compact_loop, name="state-compactor", daemon=True)
+            self._compactor.start()
+
+    def _compact_loop(self):
+        while True:
+            self._compact_requested.wait()
+            self._compact_requested.clear()
+            if self._stopping:
+                return
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"State journal compaction failed: {e}")
+
+    def compact(self):
+        """Fold the journal into a new snapshot"""
+        if self.read_only:
+            return
+        self._lock_writer()
+        with self._compact_lock:
+            self._compact()
+
+    def _compact(self):
+        with self._lock:
+            # The persisted copy is exactly snapshot + journal; take it and the
+            # journal position together
+            persisted = {student: dict(entries) for student, entries in self._persisted.items()}
+            offset = self._journal.tell() if self._journal else 0
+            ops = self.journal_ops
+
+        # Serializing the snapshot is the slow part; saves keep appending meanwhile
+        write_durable(self.snapshot_path, dumps_state(persisted, self.snapshot_format))
+
+        with self._lock:
+            # Keep what was appended while the snapshot was written
+            tail = b''
+            if self._journal:
+                self._journal.flush()
+                with open(self.journal_path, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+                self._journal.close()
+
+            atomic_write(self.journal_path, tail)
+            self._journal = open(self.journal_path, 'ab')
+            self.journal_ops -= ops
+
+        logger.info(f"Compacted state journal ({ops} operations) into {self.snapshot_path.name}")
+
+    def close(self):
+        self._stopping = True
+        self._compact_requested.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=5)
+            self._compactor = None
+        if self._journal is not None:
+            if self.journal_ops:
+                self.compact()
+            with self._lock:
+                self._journal.close()
+                self._journal = None
+        if self._writer_lock is not None:
+            self._writer_lock.close()
+            self._writer_lock = None
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+SQLite backend for the homework state (STATE_BACKEND=sqlite)
+
+Tables:
+    students        one row per student name
+    homework_items  the tracked items of every student, keyed by
+                    (student, item key), indexed by (student, day) and by day
+    detections      history of items appearing in and disappearing from the
+                    state, indexed by (student, detected_at) and (student, day);
+                    trimmed to STATE_RETENTION_DAYS (state_retention)
+
+The database runs in WAL mode with synchronous=FULL, so a committed save
+survives a crash, and readers (view_homework.py) never block a
+check. Saves only upsert the rows that changed since the last save and
+delete the ones that are gone, in one transaction.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from loguru import logger
+
+from homework_model import HomeworkItem, TrackedHomework
+from homework_query import QueryResult
+from state_store import StateStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS homework_items (
+    student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    day TEXT,
+    date TEXT,
+    subject TEXT,
+    teacher TEXT,
+    homework TEXT,
+    description TEXT,
+    lesson INTEGER,
+    extra TEXT,
+    detected_at TEXT,
+    PRIMARY KEY (student_id, key)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS homework_items_student_day ON homework_items (student_id, day);
+CREATE INDEX IF NOT EXISTS homework_items_day ON homework_items (day);
+
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    event TEXT NOT NULL,
+    day TEXT,
+    subject TEXT,
+    detected_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS detections_student_time ON detections (student_id, detected_at);
+CREATE INDEX IF NOT EXISTS detections_student_day ON detections (student_id, day);
+"""
+
+UPSERT_ITEM = """
+INSERT INTO homework_items
+    (student_id, key, day, date, subject, teacher, homework, description, lesson, extra, detected_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (student_id, key) DO UPDATE SET
+    day = excluded.day, date = excluded.date, subject = excluded.subject, teacher = excluded.teacher,
+    homework = excluded.homework, description = excluded.description, lesson = excluded.lesson,
+    extra = excluded.extra, detected_at = excluded.detected_at
+"""
+
+
+SELECT_ITEMS = (
+    "SELECT student_id, key, date, subject, teacher, homework, description, lesson, extra, detected_at"
+    " FROM homework_items"
+)
+
+
+def _like(text):
+    """LIKE pattern matching text anywhere"""
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _item_row(student_id, key, tracked):
+    item = tracked.item
+    extra = json.dumps(item.extra, ensure_ascii=False, sort_keys=True) if item.extra else None
+    return (student_id, key, item.day, item.date, item.subject, item.teacher, item.homework,
+            item.description, item.lesson, extra, tracked.detected_at)
+
+
+class SQLiteStateStore(StateStore):
+    """Homework state in a SQLite database"""
+
+    lazy = True
+
+    def __init__(self, path, flush_interval=None, read_only=False):
+        super().__init__(path, flush_interval, read_only)
+        self._lock = threading.Lock()
+        self._student_ids = {}
+        if read_only:
+            # The database is left exactly as the monitor wrote it
+            self.db = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            return
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+
+    def _student_id(self, name):
+        student_id = self._student_ids.get(name)
+        if student_id is None:
+            self.db.execute("INSERT OR IGNORE INTO students (name) VALUES (?)", (name,))
+            student_id = self.db.execute("SELECT id FROM students WHERE name = ?", (name,)).fetchone()[0]
+            self._student_ids[name] = student_id
+        return student_id
+
+    def _load(self):
+        with self._lock:
+            self._student_ids = dict(
+                (name, student_id) for student_id, name in self.db.execute("SELECT id, name FROM students")
+            )
+            state = {name: {} for name in self._student_ids}
+            names = {student_id: name for name, student_id in self._student_ids.items()}
+            self._read_items(self.db.execute(SELECT_ITEMS), state, names)
+            return state
+
+    def _students(self):
+        with self._lock:
+            return [name for name, in self.db.execute("SELECT name FROM students")]
+
+    def iter_students(self):
+        for student in self._students():
+            yield student, self._load_student(student)
+
+    def _has_student(self, student):
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM students WHERE name = ?", (student,)).fetchone() is not None
+
+    def _load_student(self, student):
+        with self._lock:
+            row = self.db.execute("SELECT id FROM students WHERE name = ?", (student,)).fetchone()
+            if row is None:
+                return None
+            student_id = row[0]
+            self._student_ids[student] = student_id
+            state = {student: {}}
+            self._read_items(self.db.execute(SELECT_ITEMS + " WHERE student_id = ?", (student_id,)),
+                             state, {student_id: student})
+            return state[student]
+
+    def query(self, query):
+        """Answer a HomeworkQuery with one indexed SQL query for the page (plus one to count)"""
+        conditions, parameters = [], []
+        if query.student is not None:
+            conditions.append("s.name = ?")
+            parameters.append(query.student)
+        if query.start:
+            conditions.append("i.day >= ?")
+            parameters.append(query.start)
+        if query.end:
+            conditions.append("i.day <= ?")
+            parameters.append(query.end)
+        if query.subject:
+            conditions.append("i.subject LIKE ? ESCAPE '\\'")
+            parameters.append(_like(query.subject))
+        if query.teacher:
+            conditions.append("i.teacher LIKE ? ESCAPE '\\'")
+            parameters.append(_like(query.teacher))
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        source = " FROM homework_items i JOIN students s ON s.id = i.student_id" + where
+
+        with self._lock:
+            total = self.db.execute("SELECT COUNT(*)" + source, parameters).fetchone()[0]
+            rows = self.db.execute(
+                "SELECT s.name, i.key, i.date, i.subject, i.teacher, i.homework, i.description, i.lesson, i.extra,"
+                " i.detected_at" + source +
+                " ORDER BY i.day, s.name, coalesce(i.lesson, -1), coalesce(i.subject, '') LIMIT ? OFFSET ?",
+                parameters + [query.limit, query.offset]
+            ).fetchall()
+
+        page = []
+        for name, key, date, subject, teacher, homework, description, lesson, extra, detected_at in rows:
+            item = HomeworkItem(date, subject, teacher, homework, description, lesson,
+                                extra=json.loads(extra) if extra else None, key=key)
+            page.append((name, TrackedHomework(item, detected_at)))
+        return QueryResult(total, page)
+
+    def _read_items(self, rows, state, names):
+        """Add homework_items rows to state, re-keying rows stored under outdated keys"""
+        stale = []
+        for student_id, key, date, subject, teacher, homework, description, lesson, extra, detected_at in rows:
+            item = HomeworkItem(date, subject, teacher, homework, description, lesson,
+                                extra=json.loads(extra) if extra else None)
+            entries = state[names[student_id]]
+            tracked = TrackedHomework(item, detected_at)
+            if item.key != key:
+                # Stored under an older key function (e.g. other normalization)
+                stale.append((student_id, key, tracked))
+            existing = entries.get(item.key)
+            if existing is None or (detected_at or '') < (existing.detected_at or ''):
+                entries[item.key] = tracked
+
+        if stale and not self.read_only:
+            self._rekey(stale, state, names)
+
+    def _rekey(self, stale, state, names):
+        """Move rows stored under outdated keys to their current key"""
+        with self.db:
+            self.db.executemany(
+                "DELETE FROM homework_items WHERE student_id = ? AND key = ?",
+                [(student_id, key) for student_id, key, _ in stale]
+            )
+            self.db.executemany(UPSERT_ITEM, [
+                _item_row(student_id, tracked.item.key, state[names[student_id]][tracked.item.key])
+                for student_id, _, tracked in stale
+            ])
+        logger.info(f"Re-keyed {len(stale)} homework state entries")
+
+    def _save(self, state, changes, dropped):
+        now = datetime.now().isoformat()
+        with self._lock:
+            try:
+                self._write(changes, dropped, now)
+            except Exception:
+                # The transaction was rolled back, ids cached inside it may not exist
+                self._student_ids = {}
+                raise
+
+    def _write(self, changes, dropped, now):
+        with self.db:
+            for student, (upserts, removed) in changes.items():
+                student_id = self._student_id(student)
+                persisted = self._persisted.get(student, {})
+
+                self.db.executemany(UPSERT_ITEM, [
+                    _item_row(student_id, key, tracked) for key, tracked in upserts.items()
+                ])
+
+                events = [
+                    (student_id, key, 'added', tracked.item.day, tracked.item.subject, tracked.detected_at or now)
+                    for key, tracked in upserts.items() if key not in persisted
+                ]
+                events += [
+                    (student_id, key, 'removed', persisted[key].item.day, persisted[key].item.subject, now)
+                    for key in removed
+                ]
+                self.db.executemany(
+                    "INSERT INTO detections (student_id, key, event, day, subject, detected_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    events
+                )
+                self.db.executemany(
+                    "DELETE FROM homework_items WHERE student_id = ? AND key = ?",
+                    [(student_id, key) for key in removed]
+                )
+
+            for student in dropped:
+                self.db.execute("DELETE FROM students WHERE name = ?", (student,))
+                self._student_ids.pop(student, None)
+
+    def prune_history(self, before):
+        if self.read_only:
+            return 0
+        with self._lock, self.db:
+            return self.db.execute("DELETE FROM detections WHERE detected_at < ?", (before,)).rowcount
+
+    def compact(self):
+        # Move the WAL into the database and truncate it; freed pages are reused by later saves.
+        # optimize may write statistics, so it goes first
+        if self.read_only:
+            return
+        with self._lock:
+            self.db.execute("PRAGMA optimize")
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -10,6 +10,8 @@ from pathlib import Path
 from datetime import datetime
 from loguru import logger
 from smartschool_monitor_v2 import SmartSchoolMonitor
+from homework_index import DayIndex
+from state_store import open_state_store
 
 if __name__ == "__main__":
     print("="*70)
@@ -31,33 +33,23 @@ if __name__ == "__main__":
     monitor.run_all_checks()
 
     print("\n3. Checking results...")
-    state_file = Path("config/homework_state.json")
-    if state_file.exists():
-        with open(state_file, 'r', encoding='utf-8') as f:
-            state = json.load(f)
-
+    store = open_state_store(Path("config/homework_state.json"), read_only=True)
+    state = store.load()
+    store.close()
+    if state:
         for student, homework_dict in state.items():
             print(f"\n📚 {student}: {len(homework_dict)} homework items detected\n")
 
-            # Group homework by date
-            by_date = {}
-            for hw_hash, hw_data in homework_dict.items():
-                item = hw_data['item']
-                date = item['date'][:10]  # Just the date part
-                if date not in by_date:
-                    by_date[date] = []
-                by_date[date].append(item)
-
             # Display homework organized by date
             today = datetime.now().strftime('%Y-%m-%d')
-            for date in sorted(by_date.keys()):
+            for date, entries in DayIndex(homework_dict.values()):
                 is_today = (date == today)
                 date_label = f"📅 {date}" + (" ⭐ TODAY - WILL NOTIFY" if is_today else " (not today, no notification)")
                 print(f"   {date_label}")
-                for idx, item in enumerate(by_date[date], 1):
-                    subject = item.get('subject', 'Unknown')
-                    teacher = item.get('teacher', 'Unknown')
-                    homework = item.get('homework', '')
+                for idx, tracked in enumerate(entries, 1):
+                    subject = tracked.item.subject or 'Unknown'
+                    teacher = tracked.item.teacher or 'Unknown'
+                    homework = tracked.item.homework or ''
 
                     print(f"      {idx}. {subject} - {teacher}")
 
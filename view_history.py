@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+View archived homework history
+
+Usage:
+    python view_history.py --month 2026-03
+    python view_history.py --start 2026-03-01 --end 2026-03-15 --student "Student Name"
+"""
+
+import argparse
+import calendar
+from pathlib import Path
+
+from homework_index import DayIndex
+from history_archive import HistoryArchive
+
+
+def view_history():
+    parser = argparse.ArgumentParser(description="View archived homework history")
+    parser.add_argument('--month', help="YYYY-MM")
+    parser.add_argument('--start', help="first day, YYYY-MM-DD")
+    parser.add_argument('--end', help="last day, YYYY-MM-DD")
+    parser.add_argument('--student', help="only this student")
+    parser.add_argument('--archive', type=Path, default=Path("config/history"), help="archive directory")
+    args = parser.parse_args()
+
+    start, end = args.start, args.end
+    if args.month:
+        year, month = int(args.month[:4]), int(args.month[5:7])
+        start = f"{args.month}-01"
+        end = f"{args.month}-{calendar.monthrange(year, month)[1]:02d}"
+
+    archive = HistoryArchive(args.archive)
+    if not archive.exists():
+        print(f"❌ No homework history found in {args.archive}. Run the monitor first!")
+        return
+
+    versions = archive.items(start, end, args.student)
+
+    print("\n" + "="*70)
+    print(f"📜 HOMEWORK HISTORY {start or '...'} - {end or '...'}")
+    print("="*70)
+
+    by_student = {}
+    for archived in versions:
+        by_student.setdefault(archived.student, []).append(archived)
+
+    for student, entries in by_student.items():
+        print(f"\n👤 Student: {student}")
+        print(f"   Homework versions: {len(entries)}")
+        print()
+
+        for date, day_entries in DayIndex(entries, lambda archived: archived.item.day):
+            print(f"   📅 {date}")
+            for archived in day_entries:
+                item = archived.item
+                status = ''
+                if archived.replaced:
+                    status = f" ✏️ edited {archived.removed_at[:16]}"
+                elif archived.removed_at:
+                    status = f" 🗑️ removed {archived.removed_at[:16]}"
+                print(f"      • {item.subject} ({item.teacher}){status}")
+                homework = item.homework or ''
+                if len(homework) > 80:
+                    homework = homework[:80] + "..."
+                print(f"        {homework}")
+            print()
+
+    if not by_student:
+        print("\n   No homework in this period")
+
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    view_history()
@@ -1,58 +1,151 @@
 #!/usr/bin/env python3
 """
-View currently tracked homework in a nice format
+View tracked homework, filtered and paged
+
+Reads the state store through indexed queries (StateStore.query), so only
+the requested page is ever in memory; with STATE_BACKEND=sqlite a query is
+answered by the database's indexes. The journal backend and an old single
+homework_state.json are read whole for every query.
+
+The state only holds current homework (the fetched window, minus what
+STATE_RETENTION_DAYS expired). --history searches the history archive
+instead: every version of every item ever detected, including removed ones.
+
+The store is opened read-only, so it's safe while the monitor runs, and
+the backend is detected from the files next to --state (STATE_BACKEND
+doesn't need to be set).
+
+Usage:
+    python view_homework.py
+    python view_homework.py --student "Student Name" --from 2026-10-01 --to 2026-10-31
+    python view_homework.py --subject math --teacher cohen --page 2 --limit 20
+    python view_homework.py --from today --json
+    python view_homework.py --history --from 2025-09-01 --to 2026-06-30 --subject math
 """
 
+import argparse
 import json
+from datetime import datetime, date
 from pathlib import Path
-from datetime import datetime
+
+from durable_io import read_durable, durable_exists
+from history_archive import HistoryArchive
+from homework_index import DayIndex
+from homework_query import HomeworkQuery, DEFAULT_LIMIT
+from state_store import open_state_store
+
+
+def parse_day(value):
+    """YYYY-MM-DD, or 'today'"""
+    if value == 'today':
+        return date.today().isoformat()
+    return date.fromisoformat(value).isoformat()
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="View tracked homework",
+        epilog="Without --history only current homework is searched. Only one page is kept in "
+               "memory; the journal backend and an old single homework_state.json are read whole "
+               "for every query, --history reads the archived months in the day range.",
+    )
+    parser.add_argument('--student', help="only this student")
+    parser.add_argument('--from', dest='start', type=parse_day, help="first day (YYYY-MM-DD or 'today')")
+    parser.add_argument('--to', dest='end', type=parse_day, help="last day (YYYY-MM-DD or 'today')")
+    parser.add_argument('--subject', help="subject contains this text")
+    parser.add_argument('--teacher', help="teacher contains this text")
+    parser.add_argument('--page', type=positive_int, default=1, help="page number (default: 1)")
+    parser.add_argument('--limit', type=positive_int, default=DEFAULT_LIMIT,
+                        help=f"items per page (default: {DEFAULT_LIMIT})")
+    parser.add_argument('--history', action='store_true',
+                        help="search the history archive (removed and expired homework too)")
+    parser.add_argument('--json', action='store_true', help="print the page as JSON")
+    parser.add_argument('--state', type=Path, default=Path("config/homework_state.json"),
+                        help="state location (default: config/homework_state.json)")
+    return parser.parse_args()
+
 
 def view_homework():
-    state_file = Path("config/homework_state.json")
+    args = parse_args()
+    query = HomeworkQuery(args.student, args.start, args.end, args.subject, args.teacher,
+                          offset=(args.page - 1) * args.limit, limit=args.limit)
+
+    if args.history:
+        archive = HistoryArchive(args.state.with_name("history"))
+        if not archive.exists():
+            print("❌ No history archive yet. It is written by the monitor while HISTORY_ARCHIVE is on.")
+            return
+        result = archive.query(query)
+    else:
+        store = open_state_store(args.state, read_only=True)
+        result = store.query(query)
+        store.close()
 
-    if not state_file.exists():
-        print("❌ No homework state file found. Run the monitor first!")
+    pages = max((result.total + args.limit - 1) // args.limit, 1)
+
+    if args.json:
+        print(json.dumps({
+            'total': result.total,
+            'page': args.page,
+            'pages': pages,
+            'items': [
+                {'student': student, 'key': tracked.item.key, 'detected_at': tracked.detected_at,
+                 **({'removed_at': tracked.removed_at, 'replaced': tracked.replaced} if args.history else {}),
+                 **tracked.item.to_dict()}
+                for student, tracked in result.rows
+            ],
+        }, ensure_ascii=False, indent=2))
         return
 
-    with open(state_file, 'r', encoding='utf-8') as f:
-        state = json.load(f)
+    if not result.total:
+        print("❌ No homework found. Run the monitor first, or widen the filters!")
+        return
 
     print("\n" + "="*70)
-    print("📚 CURRENT HOMEWORK TRACKER")
+    print("📚 HOMEWORK HISTORY" if args.history else "📚 CURRENT HOMEWORK TRACKER")
+    print(f"   {result.total} items, page {args.page} of {pages}")
     print("="*70)
 
-    for student, homework_dict in state.items():
+    by_student = {}
+    for student, tracked in result.rows:
+        by_student.setdefault(student, []).append(tracked)
+
+    for student, entries in by_student.items():
         print(f"\n👤 Student: {student}")
-        print(f"   Total homework items: {len(homework_dict)}")
         print()
 
-        # Group by date
-        by_date = {}
-        for hw_hash, hw_data in homework_dict.items():
-            item = hw_data['item']
-            date = item['date'][:10]  # Just the date part
-            if date not in by_date:
-                by_date[date] = []
-            by_date[date].append(item)
-
         # Display by date
-        for date in sorted(by_date.keys()):
-            print(f"   📅 {date}")
-            for item in by_date[date]:
-                print(f"      • {item['subject']} ({item['teacher']})")
-                homework = item['homework']
+        for day, day_entries in DayIndex(entries):
+            print(f"   📅 {day}")
+            for tracked in day_entries:
+                item = tracked.item
+                removed = getattr(tracked, 'removed_at', None)
+                if removed:
+                    status = "edited" if tracked.replaced else "removed"
+                    print(f"      • {item.subject} ({item.teacher}) [{status} {removed[:10]}]")
+                else:
+                    print(f"      • {item.subject} ({item.teacher})")
+                homework = item.homework or ''
                 if len(homework) > 80:
                     homework = homework[:80] + "..."
                 print(f"        {homework}")
             print()
 
     print("="*70)
+    if args.page < pages:
+        print(f"   More: --page {args.page + 1}")
 
     # Show token status
-    token_file = Path("config/token_cache.json")
-    if token_file.exists():
-        with open(token_file, 'r') as f:
-            cache = json.load(f)
+    token_file = args.state.with_name("token_cache.json")
+    if durable_exists(token_file):
+        cache = read_durable(token_file, json.loads, allow_external=True)
 
         print("\n🔑 TOKEN STATUS")
         for username, data in cache.items():